@@ -1,3 +1,3 @@
-__all__ = ["gen", "ext", "cal"]
+__all__ = ["gen", "ext", "cal", "run"]
 from pyemread import *
 
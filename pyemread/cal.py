@@ -25,8 +25,11 @@ and then use pr.cal to call functions in cal.
 import os as _os
 import sys as _sys
 import fnmatch as _fnmatch
+import bisect as _bisect
+import gzip as _gzip
 import pandas as _pd
 import numpy as _np
+from pyemread import ext as _ext
 
 
 # make the system default codeing as "utf-8"
@@ -46,11 +49,7 @@ def _getRegDF(regfileDic, trial_type):
     return:
         RegDF : region file data frame
     """
-    regfileName = trial_type + '.region.csv'
-    if not (regfileName in regfileDic.keys()):
-        raise ValueError("invalid trial_type!")
-    RegDF = _pd.read_csv(regfileDic[regfileName], sep=',')
-    return RegDF
+    return _ext._getRegDF(regfileDic, trial_type)     # read through the region cache shared with ext
 
 
 def _crtCSV_dic(sit, direct, subjID, csvfiletype):
@@ -153,7 +152,19 @@ def _modEM(EMDF, addCharSp):
                 EMDF.loc[curEM,'mod_x2'] += addDist    # current region is a line ending, add rightside!
 
 
-def _chk_fp_fix(FixDF, EMDF, curFix, curEM):
+def _chrPos(EM, curEM, x_pos):
+    """
+    get the offset in characters of x_pos in a word region from the first
+    character of the region (range of 0 to reglen-1)
+    arguments:
+        EM    : region data and results (arrays, see _cal_EM)
+        curEM : the word region in the result data frame
+        x_pos : x position of a fixation
+    """
+    return _np.ceil((x_pos - EM['mod_x1'][curEM])/_np.float(EM['mod_x2'][curEM] - EM['mod_x1'][curEM]) * EM['reglen'][curEM]) - 1
+
+
+def _chk_fp_fix(Fix, EM, curFix, curEM):
     """
     calculate fist-pass fixation measures:
         fpurt    : first-pass fixation time. It is the sum of the 
@@ -178,32 +189,34 @@ def _chk_fp_fix(FixDF, EMDF, curFix, curEM):
                    first-pass fixation in the word region, 'spilover' is 
                    'NaN' 
     arguments:
-        FixDF  : fixation data of the trial
-        EMDF   : result data frame
-        curFix : current fixation in the region
+        Fix    : fixation data of the trial (arrays, see _cal_EM)
+        EM     : region data and results (arrays, see _cal_EM)
+        curFix : first fixation in the region
         curEM  : current region in the result data frame      
     returns:
         stFix, endFix : starting and ending fixation indices of the first reading
     """
-    EMDF.loc[curEM,'fpurt'] += FixDF.loc[curFix,'duration']  # fpurt: first pass fixation time
-    EMDF.loc[curEM,'fpcount'] += 1 # fpcount: number of first pass fixation
-    EMDF.loc[curEM,'ffos'] = _np.ceil((FixDF.loc[curFix,'x_pos'] - EMDF.loc[curEM,'mod_x1'])/_np.float(EMDF.loc[curEM,'mod_x2'] - EMDF.loc[curEM,'mod_x1']) * EMDF.loc[curEM,'reglen']) - 1   # ffos: offset of the first first-pass fixation in a region from the first letter of the region, in characters (range of 0 to reglen-1)
-    EMDF.loc[curEM,'ffixurt'] += FixDF.loc[curFix,'duration']   # ffixurt: first first-pass fixation duration for each region.
+    line_no, x_pos, duration, valid = Fix['line_no'], Fix['x_pos'], Fix['duration'], Fix['valid']
+    numFix = len(duration)
+    EM['fpurt'][curEM] += duration[curFix]  # fpurt: first pass fixation time
+    EM['fpcount'][curEM] += 1 # fpcount: number of first pass fixation
+    EM['ffos'][curEM] = _chrPos(EM, curEM, x_pos[curFix])   # ffos: offset of the first first-pass fixation in a region from the first letter of the region, in characters (range of 0 to reglen-1)
+    EM['ffixurt'][curEM] += duration[curFix]   # ffixurt: first first-pass fixation duration for each region.
     # locate the starting and ending indices of the first pass fixation in the current region                    
     stFix, endFix = curFix, curFix + 1
-    while endFix < len(FixDF)-1 and _np.isnan(FixDF.loc[endFix,'line_no']): endFix += 1
+    while endFix < numFix-1 and _np.isnan(line_no[endFix]): endFix += 1
     # keep searching until leaving that word and use that as the ending index 
-    while endFix < len(FixDF)-1 and FixDF.loc[endFix,'valid'] == 'yes' and FixDF.loc[endFix,'line_no'] == EMDF.loc[curEM,'line_no'] and EMDF.loc[curEM,'mod_x1'] <= FixDF.loc[endFix,'x_pos'] and FixDF.loc[endFix,'x_pos'] <= EMDF.loc[curEM,'mod_x2']:
-        EMDF.loc[curEM,'fpurt'] += FixDF.loc[endFix,'duration']  # add fpurt: first pass fixation time
-        EMDF.loc[curEM,'fpcount'] += 1  # add fpcount: number of first pass fixation
+    while endFix < numFix-1 and valid[endFix] and line_no[endFix] == EM['line_no'][curEM] and EM['mod_x1'][curEM] <= x_pos[endFix] and x_pos[endFix] <= EM['mod_x2'][curEM]:
+        EM['fpurt'][curEM] += duration[endFix]  # add fpurt: first pass fixation time
+        EM['fpcount'][curEM] += 1  # add fpcount: number of first pass fixation
         endFix += 1
-        while endFix < len(FixDF)-1 and _np.isnan(FixDF.loc[endFix,'line_no']): endFix += 1
-    if endFix < len(FixDF) and FixDF.loc[endFix,'valid'] == 'yes' and not _np.isnan(FixDF.loc[endFix,'line_no']):
-        EMDF.loc[curEM,'spilover'] += FixDF.loc[endFix,'duration']  # add spilover: Duration of the first fixation beyond a region/word.   
+        while endFix < numFix-1 and _np.isnan(line_no[endFix]): endFix += 1
+    if endFix < numFix and valid[endFix] and not _np.isnan(line_no[endFix]):
+        EM['spilover'][curEM] += duration[endFix]  # add spilover: Duration of the first fixation beyond a region/word.   
     return stFix, endFix
 
 
-def _chk_fp_reg(FixDF, EMDF, stFix, endFix, curEM):
+def _chk_fp_reg(Fix, EM, stFix, endFix, curEM):
     """
     calculate first-pass regression measures:
         fpregres : whether there is a first-pass regression starting from
@@ -223,61 +236,45 @@ def _chk_fp_reg(FixDF, EMDF, stFix, endFix, curEM):
                    is no first-pass fixation in the word region, 
                    'fpregchr' is 'NaN'
     arguments:
-        FixDF         : fixation data of the trial
-        EMDF          : result data frame
+        Fix           : fixation data of the trial (arrays, see _cal_EM)
+        EM            : region data and results (arrays, see _cal_EM)
         stFix, endFix : starting and ending fixation indices of the first
                         reading
         curEM         : current region in the result data frame              
     """
-    if FixDF.loc[endFix,'line_no'] == EMDF.loc[curEM,'line_no']:
-        # the fixation after the first pass reading is within the same line of the current word
-        if FixDF.loc[endFix,'x_pos'] < EMDF.loc[curEM,'mod_x1']:
-            # a regression fixation
-            EMDF.loc[curEM,'fpregres'] = 1
-            # search the region where regression fixation falls into
-            for cur in range(len(EMDF)):
-                if FixDF.loc[endFix,'region_no'] == EMDF.loc[cur,'region']:
-                    EMDF.loc[curEM,'fpregreg'] = EMDF.loc[cur,'region']
-                    if cur == 0: EMDF.loc[curEM,'fpregchr'] = _np.ceil((FixDF.loc[endFix,'x_pos'] - EMDF.loc[cur,'mod_x1'])/_np.float(EMDF.loc[cur,'mod_x2'] - EMDF.loc[cur,'mod_x1']) * EMDF.loc[cur,'reglen']) - 1
-                    else: EMDF.loc[curEM,'fpregchr'] = sum(EMDF.reglen[0:cur-1]) + _np.ceil((FixDF.loc[endFix,'x_pos'] - EMDF.loc[cur,'mod_x1'])/_np.float(EMDF.loc[cur,'mod_x2'] - EMDF.loc[cur,'mod_x1']) * EMDF.loc[cur,'reglen']) - 1
-                    break
-        else:
-            # a forward fixation
-            EMDF.loc[curEM,'fpregres'] = 0; EMDF.loc[curEM,'fpregreg'] = 0; EMDF.loc[curEM,'fpregchr'] = sum(EMDF.reglen)                    
+    if endFix < len(Fix['line_no']):
+        line_no, x_pos, region_no = Fix['line_no'][endFix], Fix['x_pos'][endFix], Fix['region_no'][endFix]
     else:
-        # the fixation after the first pass reading is not in the same line of the current word
-        if FixDF.loc[endFix,'line_no'] < EMDF.loc[curEM,'line_no']:
-            # a regression fixation
-            EMDF.loc[curEM,'fpregres'] = 1
-            # search the region where regression fixation falls into
-            for cur in range(len(EMDF)):
-                if FixDF.loc[endFix,'region_no'] == EMDF.loc[cur,'region']:
-                    EMDF.loc[curEM,'fpregreg'] = EMDF.loc[cur,'region']
-                    if cur == 0: EMDF.loc[curEM,'fpregchr'] = _np.ceil((FixDF.loc[endFix,'x_pos'] - EMDF.loc[cur,'mod_x1'])/_np.float(EMDF.loc[cur,'mod_x2'] - EMDF.loc[cur,'mod_x1']) * EMDF.loc[cur,'reglen']) - 1
-                    else: EMDF.loc[curEM,'fpregchr'] = sum(EMDF.reglen[0:cur-1]) + _np.ceil((FixDF.loc[endFix,'x_pos'] - EMDF.loc[cur,'mod_x1'])/_np.float(EMDF.loc[cur,'mod_x2'] - EMDF.loc[cur,'mod_x1']) * EMDF.loc[cur,'reglen']) - 1
-                    break
-        else:
-            # a forward fixation
-            EMDF.loc[curEM,'fpregres'] = 0; EMDF.loc[curEM,'fpregreg'] = 0; EMDF.loc[curEM,'fpregchr'] = sum(EMDF.reglen)
+        line_no, x_pos, region_no = _np.nan, _np.nan, _np.nan   # no fixation after the first pass reading
+    # the fixation after the first pass reading is a regression fixation if it is before the current word, in the same line or in an earlier line
+    if (line_no == EM['line_no'][curEM] and x_pos < EM['mod_x1'][curEM]) or line_no < EM['line_no'][curEM]:
+        EM['fpregres'][curEM] = 1
+        # look up the region where regression fixation falls into
+        cur = EM['regRow'].get(region_no)
+        if cur is not None:
+            EM['fpregreg'][curEM] = EM['region'][cur]
+            # offset counts regions 0..cur-2 (not 0..cur-1 as rpregchr does), kept on purpose as in earlier versions
+            EM['fpregchr'][curEM] = EM['chrOffset'][max(cur-1, 0)] + _chrPos(EM, cur, x_pos)
+    else:
+        # a forward fixation
+        EM['fpregres'][curEM] = 0; EM['fpregreg'][curEM] = 0; EM['fpregchr'][curEM] = EM['chrOffset'][-1]
 
   
-def _getReg(FixDF, curFix, EMDF):
+def _getReg(Fix, curFix, EM):
     """
-    search EMF to locate which region that FixDF.loc[curFix] falls into
+    locate which region that fixation curFix falls into, using the index
+    of (line_no, region) of EMF
     arguments:
-        FixDF  : fixation data of the trial
+        Fix    : fixation data of the trial (arrays, see _cal_EM)
         curFix : current fixation index
-        EMDF   : result data frame containing all region information
-    return: index in EMF    
+        EM     : region data and results (arrays, see _cal_EM)
+    return: index in EMF (0 if no or more than one region matches)
     """
-    if _np.isnan(FixDF.line_no[curFix]) or _np.isnan(FixDF.region_no[curFix]): return 0
-    else:
-        indlist = EMDF[(EMDF['line_no']==FixDF.line_no[curFix]) & (EMDF['region']==FixDF.region_no[curFix])].index.tolist()
-        if len(indlist) == 1: return indlist[0]
-        else: return 0
+    if _np.isnan(Fix['line_no'][curFix]) or _np.isnan(Fix['region_no'][curFix]): return 0
+    else: return EM['lineRegRow'].get((Fix['line_no'][curFix], Fix['region_no'][curFix]), 0)
 
 
-def _chk_rp_reg(FixDF, EMDF, stFix, endFix, curEM):
+def _chk_rp_reg(Fix, EM, stFix, endFix, curEM):
     """
     calculate regression path measures:
         rpurt    : sum of durations of all fixations in the regression 
@@ -309,66 +306,51 @@ def _chk_rp_reg(FixDF, EMDF, stFix, endFix, curEM):
                    there is no first-pass fixation in the word region, 
                    'rpregreg' is 'NaN'
     arguments:
-        FixDF         : fixation data of the trial
-        EMDF          : result data frame
+        Fix           : fixation data of the trial (arrays, see _cal_EM)
+        EM            : region data and results (arrays, see _cal_EM)
         stFix, endFix : starting and ending fixation indices of the first
                         reading
         curEM         : current region in the result data frame            
     """
-    if EMDF.loc[curEM,'fpregres'] == 0:
-        # there is no regression, so no regression path
-        EMDF.loc[curEM,'rpurt'] = EMDF.loc[curEM,'fpurt']; EMDF.loc[curEM,'rpcount'] = 0; EMDF.loc[curEM,'rpregreg'] = 0; EMDF.loc[curEM,'rpregchr'] = sum(EMDF.reglen) 
+    line_no, x_pos, region_no, duration, valid = Fix['line_no'], Fix['x_pos'], Fix['region_no'], Fix['duration'], Fix['valid']
+    numFix = len(duration)
+    if EM['fpregres'][curEM] == 0 or curEM == 0:
+        # there is no regression, so no regression path; the first region (word) is treated as the same as no regression
+        EM['rpurt'][curEM] = EM['fpurt'][curEM]; EM['rpcount'][curEM] = 0; EM['rpregreg'][curEM] = 0; EM['rpregchr'][curEM] = EM['chrOffset'][-1]
     else:
         # there is a regression, find the regression path
-        if curEM == 0:
-            # the first region (word), treat it as the same as no regression
-            EMDF.loc[curEM,'rpurt'] = EMDF.loc[curEM,'fpurt']; EMDF.loc[curEM,'rpcount'] = 0; EMDF.loc[curEM,'rpregreg'] = 0; EMDF.loc[curEM,'rpregchr'] = sum(EMDF.reglen) 
-        elif curEM == len(EMDF) - 1:
-            # the last region (word)            
-            EMDF.loc[curEM,'rpurt'] = EMDF.loc[curEM,'fpurt'] + FixDF.loc[endFix,'duration']
-            EMDF.loc[curEM,'rpcount'] += 1
-            curFix = endFix + 1
-            leftmostRegInd = _getReg(FixDF, endFix, EMDF)
-            leftmostReg = EMDF.region[leftmostRegInd]
-            leftmostCurFix = endFix            
-            while curFix < len(FixDF) and FixDF.loc[curFix,'valid'] == 'yes' and not _np.isnan(FixDF.loc[curFix,'line_no']):
-                # in the regression path                
-                EMDF.loc[curEM,'rpurt'] += FixDF.loc[curFix,'duration']
-                EMDF.loc[curEM,'rpcount'] += 1
-                newleftInd = _getReg(FixDF, curFix, EMDF)
-                newleft = EMDF.region[newleftInd]
-                if leftmostReg > newleft:
-                    leftmostRegInd = newleftInd
-                    leftmostReg = newleft
-                    leftmostCurFix = curFix                    
-                curFix += 1
-            EMDF.loc[curEM,'rpregreg'] = leftmostReg
-            if leftmostRegInd == 0: EMDF.loc[curEM,'rpregchr'] = _np.ceil((FixDF.loc[leftmostCurFix,'x_pos'] - EMDF.loc[leftmostRegInd,'mod_x1'])/_np.float(EMDF.loc[leftmostRegInd,'mod_x2'] - EMDF.loc[leftmostRegInd,'mod_x1']) * EMDF.loc[leftmostRegInd,'reglen']) - 1
-            else: EMDF.loc[curEM,'rpregchr'] = sum(EMDF.reglen[0:leftmostRegInd]) + _np.ceil((FixDF.loc[leftmostCurFix,'x_pos'] - EMDF.loc[leftmostRegInd,'mod_x1'])/_np.float(EMDF.loc[leftmostRegInd,'mod_x2'] - EMDF.loc[leftmostRegInd,'mod_x1']) * EMDF.loc[leftmostRegInd,'reglen']) - 1
+        if curEM == len(EM['region']) - 1:
+            # the last region (word): the path goes on until the valid fixations end
+            EM['rpurt'][curEM] = EM['fpurt'][curEM] + duration[endFix]
+            EM['rpcount'][curEM] += 1
+            newendFix = endFix + 1
+            while newendFix < numFix and valid[newendFix] and not _np.isnan(line_no[newendFix]): newendFix += 1
+            pathFix = range(endFix + 1, newendFix)
         else:
-            # the middle region (word)
-            EMDF.loc[curEM,'rpurt'] = EMDF.loc[curEM,'fpurt']
+            # the middle region (word): the path goes on until the fixations leave the regions up to the current one
+            EM['rpurt'][curEM] = EM['fpurt'][curEM]
             newendFix = endFix + 1
-            while newendFix < len(FixDF) and FixDF.loc[newendFix,'valid'] == 'yes' and not _np.isnan(FixDF.loc[newendFix,'line_no']) and not _np.isnan(FixDF.loc[newendFix,'region_no']) and FixDF.loc[newendFix,'region_no'] <= FixDF.loc[stFix,'region_no']: newendFix += 1           
-            leftmostRegInd = _getReg(FixDF, endFix, EMDF)
-            leftmostReg = EMDF.region[leftmostRegInd]
-            leftmostCurFix = endFix
-            for indFix in range(endFix, newendFix):
-                if not _np.isnan(FixDF.loc[indFix,'region_no']):               
-                    EMDF.loc[curEM,'rpurt'] += FixDF.loc[indFix,'duration']
-                    EMDF.loc[curEM,'rpcount'] += 1
-                    newleftInd = _getReg(FixDF, indFix, EMDF)
-                    newleft = EMDF.region[newleftInd]
-                    if leftmostReg > newleft:
-                        leftmostRegInd = newleftInd
-                        leftmostReg = newleft
-                        leftmostCurFix = indFix 
-            EMDF.loc[curEM,'rpregreg'] = leftmostReg
-            if leftmostRegInd == 0: EMDF.loc[curEM,'rpregchr'] = _np.ceil((FixDF.loc[leftmostCurFix,'x_pos'] - EMDF.loc[leftmostRegInd,'mod_x1'])/_np.float(EMDF.loc[leftmostRegInd,'mod_x2'] - EMDF.loc[leftmostRegInd,'mod_x1']) * EMDF.loc[leftmostRegInd,'reglen']) - 1
-            else: EMDF.loc[curEM,'rpregchr'] = sum(EMDF.reglen[0:leftmostRegInd]) + _np.ceil((FixDF.loc[leftmostCurFix,'x_pos'] - EMDF.loc[leftmostRegInd,'mod_x1'])/_np.float(EMDF.loc[leftmostRegInd,'mod_x2'] - EMDF.loc[leftmostRegInd,'mod_x1']) * EMDF.loc[leftmostRegInd,'reglen']) - 1
+            while newendFix < numFix and valid[newendFix] and not _np.isnan(line_no[newendFix]) and not _np.isnan(region_no[newendFix]) and region_no[newendFix] <= region_no[stFix]: newendFix += 1           
+            pathFix = [indFix for indFix in range(endFix, newendFix) if not _np.isnan(region_no[indFix])]
+        leftmostRegInd = _getReg(Fix, endFix, EM)
+        leftmostReg = EM['region'][leftmostRegInd]
+        leftmostCurFix = endFix
+        for curFix in pathFix:
+            # in the regression path                
+            EM['rpurt'][curEM] += duration[curFix]
+            EM['rpcount'][curEM] += 1
+            newleftInd = _getReg(Fix, curFix, EM)
+            newleft = EM['region'][newleftInd]
+            if leftmostReg > newleft:
+                leftmostRegInd = newleftInd
+                leftmostReg = newleft
+                leftmostCurFix = curFix                    
+        EM['rpregreg'][curEM] = leftmostReg
+        # offset counts regions 0..leftmostRegInd-1 (fpregchr and tffixos count one region less), kept on purpose as in earlier versions
+        EM['rpregchr'][curEM] = EM['chrOffset'][leftmostRegInd] + _chrPos(EM, leftmostRegInd, x_pos[leftmostCurFix])
             
 
-def _chk_sp_fix(FixDF, EMDF, endFix, curEM):
+def _chk_sp_fix(Fix, EM, regFix, endFix, curEM):
     """
     calculate second-pass fixation measures:
         spurt   : second-pass fixation time. It is the sum of durations of
@@ -378,51 +360,43 @@ def _chk_sp_fix(FixDF, EMDF, endFix, curEM):
         spcount : number of second-pass fixations. If there is no 
                   second-pass fixation, 'spcount' is 'NA'
     arguments:
-        FixDF  : fixation data of the trial
-        EMDF   : result data frame
+        Fix    : fixation data of the trial (arrays, see _cal_EM)
+        EM     : region data and results (arrays, see _cal_EM)
+        regFix : fixation indices falling into the current word region
         endFix : ending fixation index of the first reading
         curEM  : current region in the result data frame            
     """
-    for curFix in range(endFix, len(FixDF)):
-        if FixDF.loc[curFix,'region_no'] == EMDF.loc[curEM,'region']:
-            EMDF.loc[curEM,'spurt'] += FixDF.loc[curFix,'duration'] # add spurt: second pass fixation time
-            EMDF.loc[curEM,'spcount'] += 1  # add spcount: the number of second pass fixations            
+    for curFix in regFix[_bisect.bisect_left(regFix, endFix):]:
+        EM['spurt'][curEM] += Fix['duration'][curFix] # add spurt: second pass fixation time
+        EM['spcount'][curEM] += 1  # add spcount: the number of second pass fixations            
     
 
-def _chk_tffixos(EMDF):
+def _chk_tffixos(EMDF, chrOffset):
     """
     calculate tffixos: offset of the first fixation in trial in 
     letters from the beginning of the sentence
     arguments:
-        EMDF : result data frame
+        EMDF      : result data frame
+        chrOffset : cumulative character table of the regions (see 
+                    ext._chrOffset)
     """
-    tffixos = 0
-    for ind in range(len(EMDF)):
-        if not _np.isnan(EMDF.loc[ind,'ffos']):
-            if ind == 0: tffixos += EMDF.loc[ind,'ffos']
-            else: tffixos += sum(EMDF.reglen[0:ind-1]) + EMDF.loc[ind,'ffos']
-    
-    return tffixos           
+    ffos = EMDF.ffos.values.astype(float)
+    ind = _np.where(~_np.isnan(ffos))[0]
+    return sum(chrOffset[_np.maximum(ind-1, 0)] + ffos[ind])   # offsets count regions 0..ind-2 as fpregchr does, kept on purpose as in earlier versions
 
     
 def _chk_tregrcnt(SacDF):
     """
     calculate tregrecnt: total number of regressive saccades in trial
     arguments:
-        SacDF : saccade data of teh trial
-    """
-    totregr = 0
-    for ind in range(len(SacDF)):
-        crlinfo = str(SacDF.line_no[ind]).split('_')
-        if len(crlinfo) == 1:
-            if crlinfo != ['nan']:
-                # not crossline saccade
-                if SacDF.x1_pos[ind] > SacDF.x2_pos[ind]: totregr += 1
-        else:
-            # crossline saccade
-            if int(float(crlinfo[0])) > int(float(crlinfo[1])): totregr += 1
-                
-    return totregr            
+        SacDF : saccade data of teh trial, with typed line columns (see
+                ext._typedSacLine)
+    """
+    crossline = SacDF.crossline.values.astype(bool)
+    # saccade with line_no: moving leftward; crossline saccade: going back to an earlier line
+    regr = ~_np.isnan(SacDF.line_no.values.astype(float)) & (SacDF.x1_pos.values > SacDF.x2_pos.values)
+    regr[crossline] = SacDF.from_line.values[crossline] > SacDF.to_line.values[crossline]
+    return int(_np.sum(regr))
 
 
 def _cal_EM(RegDF, FixDF, SacDF, EMDF):
@@ -522,17 +496,34 @@ def _cal_EM(RegDF, FixDF, SacDF, EMDF):
     EMDF.fpregres = _np.nan; EMDF.fpregreg = _np.nan; EMDF.fpregchr = _np.nan   # for first regression measures
     EMDF.rpregres = _np.nan; EMDF.rpregreg = _np.nan; EMDF.rpregchr = _np.nan   # for regression path measures
     
+    # fixation and region columns are read once into arrays; results are kept in arrays and stored back into EMDF
+    Fix = {'line_no': FixDF.line_no.values.astype(float), 'x_pos': FixDF.x_pos.values.astype(float), 'region_no': FixDF.region_no.values.astype(float),
+           'duration': FixDF.duration.values, 'valid': (FixDF.valid == 'yes').values}
+    measures = ['fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
+    EM = dict((col, EMDF[col].values.copy()) for col in ['region', 'reglen', 'line_no', 'mod_x1', 'mod_x2'] + measures)
+    EM['chrOffset'] = _ext._chrOffset(RegDF)   # number of characters before each region, shared by subjects reading the same text
+    # index of word regions: (line_no, region) -> row (0 if not unique) for _getReg, and region -> its first row for _chk_fp_reg
+    EM['lineRegRow'], EM['regRow'] = {}, {}
+    for curEM in range(len(EMDF)):
+        key = (EM['line_no'][curEM], EM['region'][curEM])
+        EM['lineRegRow'][key] = 0 if key in EM['lineRegRow'] else curEM
+        EM['regRow'].setdefault(EM['region'][curEM], curEM)
+    
+    # walk the fixations once: the fixations falling into each word region, in order
+    regFix = {}
+    for curFix in range(len(Fix['region_no'])):
+        if not _np.isnan(Fix['region_no'][curFix]): regFix.setdefault(Fix['region_no'][curFix], []).append(curFix)
+    
     # region (each word) measures
     for curEM in range(len(EMDF)):
-        for curFix in range(len(FixDF)):
-            if FixDF.loc[curFix,'region_no'] == EMDF.loc[curEM,'region']:
-                # find a first pass fixation on the current word!                    
-                stFix, endFix = _chk_fp_fix(FixDF, EMDF, curFix, curEM) # calculate first pass fixation measures: fpurt, fpcount, ffos, ffixurt, spilover  
-                _chk_fp_reg(FixDF, EMDF, stFix, endFix, curEM) # calculate first pass regression measures: fpregres, fpregreg, fpregchr
-                _chk_rp_reg(FixDF, EMDF, stFix, endFix, curEM) # calculate regression path measures: rpurt, rpcount, rpregreg, rpregchr
-                _chk_sp_fix(FixDF, EMDF, endFix, curEM) # calculate second pass fixation measures: spurt, spcount                                       
-                # first pass reading of that word is finished, go to next word        
-                break
+        if EM['region'][curEM] in regFix:
+            # the first pass fixation on the current word!
+            curFix = regFix[EM['region'][curEM]][0]
+            stFix, endFix = _chk_fp_fix(Fix, EM, curFix, curEM) # calculate first pass fixation measures: fpurt, fpcount, ffos, ffixurt, spilover  
+            _chk_fp_reg(Fix, EM, stFix, endFix, curEM) # calculate first pass regression measures: fpregres, fpregreg, fpregchr
+            _chk_rp_reg(Fix, EM, stFix, endFix, curEM) # calculate regression path measures: rpurt, rpcount, rpregreg, rpregchr
+            _chk_sp_fix(Fix, EM, regFix[EM['region'][curEM]], endFix, curEM) # calculate second pass fixation measures: spurt, spcount                                       
+    for col in measures: EMDF[col] = EM[col]
                 
     # change fpurt == 0, fpcount == 0, ffixurt == 0, spilover == 0 with NA
     EMDF.loc[EMDF[EMDF.fpurt==0].index,'fpurt'] = _np.nan
@@ -545,14 +536,187 @@ def _cal_EM(RegDF, FixDF, SacDF, EMDF):
     EMDF.loc[EMDF[_np.isnan(EMDF.fpurt)].index,'rpcount'] = _np.nan          
     EMDF.loc[EMDF[_np.isnan(EMDF.fpurt)].index,'rpregreg'] = _np.nan
     # whole trial measures
-    EMDF.tffixos = _chk_tffixos(EMDF)  # tffixos: offset of the first fixation in trial in letters from the beginning of the sentence       
+    EMDF.tffixos = _chk_tffixos(EMDF, EM['chrOffset'])  # tffixos: offset of the first fixation in trial in letters from the beginning of the sentence       
     EMDF.ttfixurt = sum(x for x in EMDF.fpurt if not _np.isnan(x))     # tffixurt: duration of the first fixation in trial
     EMDF.tfixcnt = len(FixDF[FixDF.valid=='yes'])    # tfixcnt: total number of valid fixations in trial
     EMDF.tregrcnt = _chk_tregrcnt(SacDF)  # tregrcnt: total number of regressive saccades in trial
 
 
+def _calSubjEM(subjID, SacDF, FixDF, regfileDic, addCharSp):
+    """
+    calculate eye-movement measures of a subject's trials
+    arguments:
+        subjID     : subject ID
+        SacDF      : saccade data of the subject, with line numbers (from
+                     _Sac.csv or ext's cal_crlSacFix)
+        FixDF      : fixation data of the subject, with line and region
+                     numbers (from _Fix.csv or ext's cal_crlSacFix)
+        regfileDic : a dictionary of region file names and directories
+        addCharSp  : number of single character space added to EMF for
+                     catching overshoot fixations
+    return:
+        EMList : list of (trialID, eye, EMDF), EMDF being the eye-movement
+                 measures of the trial recorded by the eye
+    """
+    SacDF = _ext._typedSacLine(SacDF)   # saccade data written in the legacy format get numeric line columns
+    EMList = []
+    for trialID in range(len(regfileDic)):
+        RegDF = _getRegDF(regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0]) # get region file 
+        SacDFtemp = SacDF[SacDF.trial_id==trialID].reset_index()  # get saccade of the trial
+        FixDFtemp = FixDF[FixDF.trial_id==trialID].reset_index()  # get fixation of the trial
+        
+        if len(_np.unique(SacDFtemp.eye)) == 1:
+            # single eye data
+            if _np.unique(SacDFtemp.eye)[0] == 'L': print 'Cal EM measures: Subj: ' + subjID + ', Trial: ' + str(trialID) + ' Left Eye'
+            elif _np.unique(SacDFtemp.eye)[0] == 'R': print 'Cal EM measures: Subj: ' + subjID + ', Trial: ' + str(trialID) + ' Right Eye'
+            # create result data frame
+            EMDF = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
+            EMDF.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
+                            'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
+            # copy values from FixDF about the whole trial               
+            EMDF.subj = subjID; EMDF.trial_id = FixDFtemp.trial_id[0]; EMDF.trial_type = FixDFtemp.trial_type[0]
+            EMDF.trialstart = FixDFtemp.trialstart[0]; EMDF.trialend = FixDFtemp.trialend; EMDF.tdur = FixDFtemp.tdur[0]; EMDF.recstart = FixDFtemp.recstart[0]; EMDF.recend = FixDFtemp.recend[0]
+            EMDF.blinks = FixDFtemp.blinks[0]; EMDF.eye = FixDFtemp.eye[0]
+            # copy values from RegDF about region        
+            EMDF.region = RegDF.WordID; EMDF.reglen = RegDF.length; EMDF.word = RegDF.Word; EMDF.line_no = RegDF.line_no; EMDF.x1_pos = RegDF.x1_pos; EMDF.x2_pos = RegDF.x2_pos
+            _modEM(EMDF, addCharSp) # modify EMF's mod_x1 and mod_x2
+            _cal_EM(RegDF, FixDFtemp, SacDFtemp, EMDF)
+            # store results
+            if _np.unique(SacDFtemp.eye)[0] in ('L', 'R'): EMList.append((trialID, _np.unique(SacDFtemp.eye)[0], EMDF))
+        else:
+            # double eye data
+            SacDFtemp_L = SacDFtemp[SacDFtemp.eye=='L'].reset_index(); SacDFtemp_R = SacDFtemp[SacDFtemp.eye=='R'].reset_index()                 
+            FixDFtemp_L = FixDFtemp[FixDFtemp.eye=='L'].reset_index(); FixDFtemp_R = FixDFtemp[FixDFtemp.eye=='R'].reset_index()
+            
+            print "Cal EM measures: Subj: " + subjID + ", Trial: " + str(trialID) + ' Left Eye'
+            # create result data frame
+            EMDF_L = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
+            EMDF_L.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
+                              'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
+            # copy values from FixDF about the whole trial               
+            EMDF_L.subj = subjID; EMDF_L.trial_id = FixDFtemp_L.trial_id[0]; EMDF_L.trial_type = FixDFtemp_L.trial_type[0]
+            EMDF_L.trialstart = FixDFtemp_L.trialstart[0]; EMDF_L.trialend = FixDFtemp_L.trialend[0]; EMDF_L.tdur = FixDFtemp_L.tdur[0]; EMDF_L.recstart = FixDFtemp_L.recstart[0]; EMDF_L.recend = FixDFtemp_L.recend[0]
+            EMDF_L.blinks = FixDFtemp_L.blinks[0]; EMDF_L.eye = FixDFtemp_L.eye[0]
+            # copy values from RegDF about region        
+            EMDF_L.region = RegDF.WordID; EMDF_L.reglen = RegDF.length; EMDF_L.word = RegDF.Word; EMDF_L.line_no = RegDF.line_no; EMDF_L.x1_pos = RegDF.x1_pos; EMDF_L.x2_pos = RegDF.x2_pos
+            _modEM(EMDF_L, addCharSp) # modify EMF's mod_x1 and mod_x2
+            _cal_EM(RegDF, FixDFtemp_L, SacDFtemp_L, EMDF_L)
+            # store results
+            EMList.append((trialID, 'L', EMDF_L))
+        
+            print "Cal EM measures: Subj: " + subjID + ", Trial: " + str(trialID) + ' Right Eye'
+            # create result data frame
+            EMDF_R = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
+            EMDF_R.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
+                              'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
+            # copy values from FixDF about the whole trial               
+            EMDF_R.subj = subjID; EMDF_R.trial_id = FixDFtemp_R.trial_id[0]; EMDF_R.trial_type = FixDFtemp_R.trial_type[0]
+            EMDF_R.trialstart = FixDFtemp_R.trialstart[0]; EMDF_R.trialend = FixDFtemp_R.trialend[0]; EMDF_R.tdur = FixDFtemp_R.tdur[0]; EMDF_R.recstart = FixDFtemp_R.recstart[0]; EMDF_R.recend = FixDFtemp_R.recend[0]
+            EMDF_R.blinks = FixDFtemp_R.blinks[0]; EMDF_R.eye = FixDFtemp_R.eye[0]
+            # copy values from RegDF about region        
+            EMDF_R.region = RegDF.WordID; EMDF_R.reglen = RegDF.length; EMDF_R.word = RegDF.Word; EMDF_R.line_no = RegDF.line_no; EMDF_R.x1_pos = RegDF.x1_pos; EMDF_R.x2_pos = RegDF.x2_pos
+            _modEM(EMDF_R, addCharSp) # modify EMF's mod_x1 and mod_x2
+            _cal_EM(RegDF, FixDFtemp_R, SacDFtemp_R, EMDF_R)
+            # store results
+            EMList.append((trialID, 'R', EMDF_R))
+    return EMList
+
+
+_EMfileExt = {'csv': '.csv.gz', 'parquet': '.parquet'}     # long-format EM files: EMformat -> file extension
+
+
+def _chkEMformat(EMformat):
+    """
+    check the output format of eye-movement measures
+    """
+    if EMformat != 'trial' and EMformat not in _EMfileExt:
+        raise ValueError("EMformat must be 'trial', 'csv' or 'parquet'!")
+
+
+def _writeLongEM(fileName, EMformat, EMLists):
+    """
+    write eye-movement measures of one or more subjects into one long-format
+    file, rows of all trials and eyes being keyed by subj, trial_id and
+    eye; the file is written a subject at a time, so only one subject's
+    measures are kept in memory
+    arguments:
+        fileName : name of the output file
+        EMformat : 'csv': gzip compressed csv file; 'parquet': parquet file
+                   (pyarrow is needed)
+        EMLists  : iterable of EMList (see _calSubjEM), one for each 
+                   subject; can be a generator calculating subjects one by
+                   one
+    """
+    if EMformat == 'parquet':
+        try:
+            import pyarrow as _pa
+            import pyarrow.parquet as _pq
+        except ImportError:
+            raise ValueError("EMformat 'parquet' needs pyarrow!")
+    writer, schema = None, None
+    try:
+        for EMList in EMLists:
+            if len(EMList) == 0: continue
+            chunk = _pd.concat([EMDF for trialID, eye, EMDF in EMList], ignore_index=True)
+            if EMformat == 'csv':
+                header = writer is None
+                if header: writer = _gzip.open(fileName, 'wb')
+                chunk.to_csv(writer, index=False, header=header)
+            else:
+                # later subjects are cast to the columns types of the first one
+                table = _pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema; writer = _pq.ParquetWriter(fileName, schema)
+                writer.write_table(table)
+    finally:
+        if writer is not None: writer.close()
+
+
+def _readCalSubjEM(direct, subjID, regfileNameList, addCharSp):
+    """
+    read fixation and saccade data of subj and calculate eye-movement 
+    measures
+    arguments: see cal_write_EM
+    return:
+        EMList : see _calSubjEM; None if the required files are not there
+    """
+    # first, check whether the required files are there:
+    SacfileExist, SacfileDic = _crtCSV_dic(0, direct, subjID, '_Sac')
+    FixfileExist, FixfileDic = _crtCSV_dic(0, direct, subjID, '_Fix')    
+    regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
+    
+    # second, process the files
+    if SacfileExist and FixfileExist and regfileExist:
+        SacDF = _pd.read_csv(SacfileDic[subjID], sep=',', float_precision='round_trip')   # read saccade data
+        FixDF = _pd.read_csv(FixfileDic[subjID], sep=',', float_precision='round_trip')   # read fixation data
+        return _calSubjEM(subjID, SacDF, FixDF, regfileDic, addCharSp)
+
+
 # user functions for calculating eye-movement measures
-def cal_write_EM(direct, subjID, regfileNameList, addCharSp=1):
+def write_EM(direct, subjID, EMList, EMformat='trial'):
+    """
+    write eye-movement measures of a subject's trials
+    arguments:
+        direct   : directory for storing output files
+        subjID   : subject ID
+        EMList   : list of (trialID, eye, EMDF) from _calSubjEM
+        EMformat : 'trial': a csv file for each trial and eye; 'csv': a 
+                   long-format gzip compressed csv file of all trials; 
+                   'parquet': a long-format parquet file of all trials
+                   (pyarrow is needed); default = 'trial'
+    output:
+        subjID_EM_trial*_L.csv or subjID_EM_trial*_R.csv ('trial'), 
+        subjID_EM.csv.gz ('csv') or subjID_EM.parquet ('parquet')
+    """
+    _chkEMformat(EMformat)
+    if EMformat == 'trial':
+        for trialID, eye, EMDF in EMList:
+            nameEM = _os.path.join(direct, subjID, subjID + '_EM_trial' + str(trialID) + '_' + eye + '.csv'); EMDF.to_csv(nameEM, index=False)
+    else:
+        _writeLongEM(_os.path.join(direct, subjID, subjID + '_EM' + _EMfileExt[EMformat]), EMformat, [EMList])
+
+
+def cal_write_EM(direct, subjID, regfileNameList, addCharSp=1, EMformat='trial'):
     """
     read fixation and saccade data of subj and calculate eye-movement 
     measures
@@ -563,83 +727,22 @@ def cal_write_EM(direct, subjID, regfileNameList, addCharSp=1):
                              will help select corresponding region files)
         addCharSp          : number of single character space added to EMF
                              for catching overshoot fixations; default = 1
+        EMformat           : 'trial': a csv file for each trial and eye; 
+                             'csv': a long-format gzip compressed csv file
+                             (subjID_EM.csv.gz); 'parquet': a long-format 
+                             parquet file (subjID_EM.parquet, pyarrow is 
+                             needed); default = 'trial'
     output:
-        write each trial's results to csv files
+        write each trial's results to csv files, or all trials' results
+        to a long-format file
     """
-    # first, check whether the required files are there:
-    SacfileExist, SacfileDic = _crtCSV_dic(0, direct, subjID, '_Sac')
-    FixfileExist, FixfileDic = _crtCSV_dic(0, direct, subjID, '_Fix')    
-    regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
-    
-    # second, process the files
-    if SacfileExist and FixfileExist and regfileExist:
-        SacDF = _pd.read_csv(SacfileDic[subjID], sep=',')   # read saccade data
-        FixDF = _pd.read_csv(FixfileDic[subjID], sep=',')   # read fixation data
-        for trialID in range(len(regfileDic)):
-            RegDF = _getRegDF(regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0]) # get region file 
-            SacDFtemp = SacDF[SacDF.trial_id==trialID].reset_index()  # get saccade of the trial
-            FixDFtemp = FixDF[FixDF.trial_id==trialID].reset_index()  # get fixation of the trial
-            
-            if len(_np.unique(SacDFtemp.eye)) == 1:
-                # single eye data
-                if _np.unique(SacDFtemp.eye)[0] == 'L': print 'Cal EM measures: Subj: ' + subjID + ', Trial: ' + str(trialID) + ' Left Eye'
-                elif _np.unique(SacDFtemp.eye)[0] == 'R': print 'Cal EM measures: Subj: ' + subjID + ', Trial: ' + str(trialID) + ' Right Eye'
-                # create result data frame
-                EMDF = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
-                EMDF.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
-                                'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
-                # copy values from FixDF about the whole trial               
-                EMDF.subj = subjID; EMDF.trial_id = FixDFtemp.trial_id[0]; EMDF.trial_type = FixDFtemp.trial_type[0]
-                EMDF.trialstart = FixDFtemp.trialstart[0]; EMDF.trialend = FixDFtemp.trialend; EMDF.tdur = FixDFtemp.tdur[0]; EMDF.recstart = FixDFtemp.recstart[0]; EMDF.recend = FixDFtemp.recend[0]
-                EMDF.blinks = FixDFtemp.blinks[0]; EMDF.eye = FixDFtemp.eye[0]
-                # copy values from RegDF about region        
-                EMDF.region = RegDF.WordID; EMDF.reglen = RegDF.length; EMDF.word = RegDF.Word; EMDF.line_no = RegDF.line_no; EMDF.x1_pos = RegDF.x1_pos; EMDF.x2_pos = RegDF.x2_pos
-                _modEM(EMDF, addCharSp) # modify EMF's mod_x1 and mod_x2
-                _cal_EM(RegDF, FixDFtemp, SacDFtemp, EMDF)
-                # store results
-                if _np.unique(SacDFtemp.eye)[0] == 'L':
-                    nameEM = _os.path.join(direct, subjID, subjID + '_EM_trial' + str(trialID) + '_L.csv'); EMDF.to_csv(nameEM, index=False)
-                elif _np.unique(SacDFtemp.eye)[0] == 'R':
-                    nameEM = _os.path.join(direct, subjID, subjID + '_EM_trial' + str(trialID) + '_R.csv'); EMDF.to_csv(nameEM, index=False)   
-            else:
-                # double eye data
-                SacDFtemp_L = SacDFtemp[SacDFtemp.eye=='L'].reset_index(); SacDFtemp_R = SacDFtemp[SacDFtemp.eye=='R'].reset_index()                 
-                FixDFtemp_L = FixDFtemp[FixDFtemp.eye=='L'].reset_index(); FixDFtemp_R = FixDFtemp[FixDFtemp.eye=='R'].reset_index()
-                
-                print "Cal EM measures: Subj: " + subjID + ", Trial: " + str(trialID) + ' Left Eye'
-                # create result data frame
-                EMDF_L = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
-                EMDF_L.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
-                                  'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
-                # copy values from FixDF about the whole trial               
-                EMDF_L.subj = subjID; EMDF_L.trial_id = FixDFtemp_L.trial_id[0]; EMDF_L.trial_type = FixDFtemp_L.trial_type[0]
-                EMDF_L.trialstart = FixDFtemp_L.trialstart[0]; EMDF_L.trialend = FixDFtemp_L.trialend[0]; EMDF_L.tdur = FixDFtemp_L.tdur[0]; EMDF_L.recstart = FixDFtemp_L.recstart[0]; EMDF_L.recend = FixDFtemp_L.recend[0]
-                EMDF_L.blinks = FixDFtemp_L.blinks[0]; EMDF_L.eye = FixDFtemp_L.eye[0]
-                # copy values from RegDF about region        
-                EMDF_L.region = RegDF.WordID; EMDF_L.reglen = RegDF.length; EMDF_L.word = RegDF.Word; EMDF_L.line_no = RegDF.line_no; EMDF_L.x1_pos = RegDF.x1_pos; EMDF_L.x2_pos = RegDF.x2_pos
-                _modEM(EMDF_L, addCharSp) # modify EMF's mod_x1 and mod_x2
-                _cal_EM(RegDF, FixDFtemp_L, SacDFtemp_L, EMDF_L)
-                # store results
-                nameEM_L = _os.path.join(direct, subjID, subjID + '_EM_trial' + str(trialID) + '_L.csv'); EMDF_L.to_csv(nameEM_L, index=False)
-            
-                print "Cal EM measures: Subj: " + subjID + ", Trial: " + str(trialID) + ' Right Eye'
-                # create result data frame
-                EMDF_R = _pd.DataFrame(_np.zeros((len(RegDF), 36)))
-                EMDF_R.columns = ['subj', 'trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'tffixos', 'tffixurt', 'tfixcnt', 'tregrcnt', 'region', 'reglen', 'word', 'line_no', 'x1_pos', 'x2_pos', 'mod_x1', 'mod_x2',
-                                  'fpurt', 'fpcount', 'fpregres', 'fpregreg', 'fpregchr', 'ffos', 'ffixurt', 'spilover', 'rpurt', 'rpcount', 'rpregreg', 'rpregchr', 'spurt', 'spcount']
-                # copy values from FixDF about the whole trial               
-                EMDF_R.subj = subjID; EMDF_R.trial_id = FixDFtemp_R.trial_id[0]; EMDF_R.trial_type = FixDFtemp_R.trial_type[0]
-                EMDF_R.trialstart = FixDFtemp_R.trialstart[0]; EMDF_R.trialend = FixDFtemp_R.trialend[0]; EMDF_R.tdur = FixDFtemp_R.tdur[0]; EMDF_R.recstart = FixDFtemp_R.recstart[0]; EMDF_R.recend = FixDFtemp_R.recend[0]
-                EMDF_R.blinks = FixDFtemp_R.blinks[0]; EMDF_R.eye = FixDFtemp_R.eye[0]
-                # copy values from RegDF about region        
-                EMDF_R.region = RegDF.WordID; EMDF_R.reglen = RegDF.length; EMDF_R.word = RegDF.Word; EMDF_R.line_no = RegDF.line_no; EMDF_R.x1_pos = RegDF.x1_pos; EMDF_R.x2_pos = RegDF.x2_pos
-                _modEM(EMDF_R, addCharSp) # modify EMF's mod_x1 and mod_x2
-                _cal_EM(RegDF, FixDFtemp_R, SacDFtemp_R, EMDF_R)
-                # store results
-                nameEM_R = _os.path.join(direct, subjID, subjID + '_EM_trial' + str(trialID) + '_R.csv'); EMDF_R.to_csv(nameEM_R, index=False)
-
-
-def cal_write_EM_b(direct, regfileNameList, addCharSp=1):
+    _chkEMformat(EMformat)
+    EMList = _readCalSubjEM(direct, subjID, regfileNameList, addCharSp)
+    if EMList is not None:
+        write_EM(direct, subjID, EMList, EMformat)
+
+
+def cal_write_EM_b(direct, regfileNameList, addCharSp=1, EMformat='trial'):
     """
     batch calculating all subjects' EMF measures
     arguments:
@@ -648,15 +751,28 @@ def cal_write_EM_b(direct, regfileNameList, addCharSp=1):
                           select corresponding region files)
         addCharSp       : number of single character space added to EMF
                           for catching overshoot fixations; default = 1
+        EMformat        : 'trial': a csv file for each trial and eye of 
+                          each subject; 'csv': a long-format gzip 
+                          compressed csv file of all subjects (EM.csv.gz 
+                          in direct); 'parquet': a long-format parquet 
+                          file of all subjects (EM.parquet in direct, 
+                          pyarrow is needed); default = 'trial'
     output:
-        write each subject's each trial's results to csv files        
+        write each subject's each trial's results to csv files, or all
+        subjects' results to a long-format file; in the long-format file,
+        subjects are calculated and written one by one
     """
+    _chkEMformat(EMformat)
     SacfileExist, SacfileDic = _crtCSV_dic(1, direct, '', '_Sac')
     FixfileExist, FixfileDic = _crtCSV_dic(1, direct, '', '_Fix')    
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)    
     if SacfileExist and FixfileExist and regfileExist:
-        for subjID in SacfileDic.keys():
-            cal_write_EM(direct, subjID, regfileNameList)  
+        if EMformat == 'trial':
+            for subjID in sorted(SacfileDic):
+                cal_write_EM(direct, subjID, regfileNameList, addCharSp)
+        else:
+            EMLists = (_readCalSubjEM(direct, subjID, regfileNameList, addCharSp) for subjID in sorted(SacfileDic))
+            _writeLongEM(_os.path.join(direct, 'EM' + _EMfileExt[EMformat]), EMformat, (EMList for EMList in EMLists if EMList is not None))
 
 
 def mergeCSV(direct, regfileNameList, subjID):
@@ -676,15 +792,16 @@ def mergeCSV(direct, regfileNameList, subjID):
         print 'SubjID ', subjID
         mergeDF = _pd.DataFrame()
         
-        EMDF = _pd.read_csv(StampfileDic[subjID], sep=',')
+        EMDF = _ext._readStampCSV(StampfileDic[subjID])   # memory-mapped from the binary cache if it is valid
         EMDF['gaze_time'] = EMDF.time - EMDF.recstart; 
         EMDF['audio_time'] = _np.nan; EMDF['audio_label'] = _np.nan; EMDF['audio_region_no'] = _np.nan
 
         trialList = list(_np.unique(EMDF.trial_type))
+        mergeDFlist = []   # per-trial blocks, concatenated once after the loop
         for trial in trialList:
             print 'Processing Trial ', trial
             # get region file
-            RegDF = _pd.read_csv(regfileDic[trial+'.region.csv'])
+            RegDF = _ext._getRegDF(regfileDic, trial)
             # get ETime file    
             aufile = _os.path.join(direct, subjID, subjID + '-' + trial + '_ETime.csv')
             if not _os.path.isfile(aufile):
@@ -716,7 +833,8 @@ def mergeCSV(direct, regfileNameList, subjID):
                         if cur_region < 37:
                             cur_label = list(RegDF.Word[RegDF.WordID==cur_region])[0]
                     
-                mergeDF = mergeDF.append(EMDFtemp, ignore_index=True)
+                mergeDFlist.append(EMDFtemp)
+        mergeDF = _ext._concatDF(mergeDF, mergeDFlist)
             
         # store results file
         mergeDF = mergeDF.sort_values(by=['trial_id','time'], ascending=True)
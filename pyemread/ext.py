@@ -27,6 +27,13 @@ import os as _os
 import sys as _sys
 import fnmatch as _fnmatch
 import re as _re
+import mmap as _mmap
+import json as _json
+import hashlib as _hashlib
+import shutil as _shutil
+import tempfile as _tempfile
+import multiprocessing as _mp
+import traceback as _traceback
 import pandas as _pd
 import numpy as _np
 
@@ -38,37 +45,6 @@ reload(_sys); _sys.setdefaultencoding("utf-8")
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 # helper functions obtaining basic information from data files
-def _getHeader(lines):
-    """
-    get header information
-    argument:
-        lines : data lines
-    return:
-        script   : script file
-        sessdate : session date
-        srcfile  : source file
-    """
-    header = [] 
-    for line in lines:
-        line = line.rstrip()
-        if _re.search('^[*][*] ', line):
-            header.append(line)
-       
-    # get basic information from header lines       
-    for line in header:
-        if _re.search('RECORDED BY', line):
-            script = line.split(' ')[3]
-        if _re.search('DATE:', line):
-            sessdate = line.split(': ')[1]
-        if _re.search('CONVERTED FROM', line):
-            m = _re.search(' FROM (.+?) using', line)
-            if m:
-                #srcfile = _os.path.basename(m.group(1))
-                srcfile = m.group(1).split('\\')[-1]
-    
-    return script, sessdate, srcfile            
-
-
 def _getLineInfo(FixRep_cur):
     """
     get time information from FixReportLines
@@ -89,85 +65,281 @@ def _getLineInfo(FixRep_cur):
     return line_idx, line_time
 
 
-def _getTrialReg(lines):
+def _concatDF(DF, DFlist):
     """
-    get the region (line range) of each trial
-    argument:
-        lines : data lines
+    concatenate per-trial data blocks to a data frame in one go; this gives
+    the same result as appending them one by one (DF = DF.append(block, 
+    ignore_index=True)) but copies the accumulated data only once
+    arguments:
+        DF     : data frame to be extended (can be empty, e.g., only with 
+                 columns)
+        DFlist : list of data blocks, in order
     return:
-        T_idx   : trail start and ending lines
-        T_lines : trail start and ending line indices
+        DF : concatenated data frame
     """
-    trial_start = []; trial_start_lines = []
-    trial_end = []; trial_end_lines = []
-    cur = 0
+    if len(DFlist) == 0: return DF
+    return _pd.concat([DF] + DFlist, ignore_index=True)
+
+
+def _tokenizeASC(lines, datatype):
+    """
+    tokenize data lines of an ascii file in a single pass; each line is 
+    dispatched by its leading token (EFIX, ESACC, EBLINK, MSG, START, END
+    or sample) into the event buffers of the current trial
+    arguments:
+        lines    : data lines (an opened ascii file or any other iterable
+                   of lines)
+        datatype : 0, record fixation and saccade; 
+                   1, record time stamped data
+    return:
+        script   : script file
+        sessdate : session date
+        srcfile  : source file
+        trials   : list of per-trial dictionaries, storing trialID, 
+                   blinklines, fixlines, saclines, stamplines (fixlines 
+                   and saclines are only filled for datatype 0, 
+                   stamplines, kept as raw lines, only for datatype 1), 
+                   sampfreq, eyerec, 
+                   trial_type, trialstart, trialend, tdur, recstart and
+                   recend
+    """
+    script, sessdate, srcfile = None, None, None
+    trials = []; trial = None
+    numstart, numend = 0, 0
     for line in lines:
-        if _re.search('TRIALID', line):
-            trial_start.append(line); trial_start_lines.append(cur)
-        if _re.search('TRIAL_RESULT', line):
-            trial_end.append(line); trial_end_lines.append(cur)
-        cur += 1
-    
-    if len(trial_start) != len(trial_end):
+        token = line[:1]
+        if token.isdigit():
+            # time stamped sample, the most frequent line
+            if datatype == 1 and trial is not None: trial['stamplines'].append(line)
+        elif token == 'E':
+            if trial is None: continue
+            if line.startswith('EFIX'):
+                if datatype == 0: trial['fixlines'].append(line.split())
+            elif line.startswith('ESACC'):
+                if datatype == 0: trial['saclines'].append(line.split())
+            elif line.startswith('EBLINK'): trial['blinklines'].append(line.split())
+            elif line.startswith('END'): trial['trialend'] = int(line.split()[1])
+        elif token == 'M' and line.startswith('MSG'):
+            if 'TRIALID' in line:
+                numstart += 1
+                trial = {'trialID': int(line.split(' ')[-1]), 'blinklines': [], 'fixlines': [], 'saclines': [], 'stamplines': [], 'sampfreq': None, 'eyerec': None,
+                         'trial_type': _np.nan, 'trialstart': 0, 'trialend': 0, 'tdur': 0, 'recstart': 0, 'recend': 0}
+            elif 'TRIAL_RESULT' in line:
+                numend += 1
+                if trial is not None:
+                    trial['tdur'] = trial['trialend'] - trial['trialstart']
+                    trials.append(trial); trial = None
+            elif trial is not None:
+                if '!MODE RECORD' in line: trial['sampfreq'] = int(line.split()[5]); trial['eyerec'] = line.split()[-1]
+                if '!V TRIAL_VAR picture_name' in line: trial['trial_type'] = (line.split()[-1]).split('.')[0]
+                if 'ARECSTART' in line: trial['recstart'] = int(line.split()[1]) - int(line.split()[2])
+                if 'ARECSTOP' in line: trial['recend'] = int(line.split()[1]) - int(line.split()[2])
+        elif token == 'S':
+            if trial is not None and line.startswith('START'): trial['trialstart'] = int(line.split()[1])
+        elif token == '*' and line.startswith('** '):
+            # get basic information from header lines
+            line = line.rstrip()
+            if 'RECORDED BY' in line:
+                script = line.split(' ')[3]
+            if 'DATE:' in line:
+                sessdate = line.split(': ')[1]
+            if 'CONVERTED FROM' in line:
+                m = _re.search(' FROM (.+?) using', line)
+                if m:
+                    srcfile = m.group(1).split('\\')[-1]
+    
+    if numstart != numend:
         raise ValueError("Trial starting and ending mismatch!")
+    
+    return script, sessdate, srcfile, trials
+
+
+def _findMSGLines(mm, key):
+    """
+    find the byte spans of the MSG lines containing key in a memory-mapped
+    ascii file, without decoding the other lines
+    arguments:
+        mm  : memory-mapped ascii file
+        key : message key, e.g., 'TRIALID' or 'TRIAL_RESULT'
+    return:
+        spans : list of (linestart, lineend) byte offsets of matched lines;
+                lineend includes the line break
+    """
+    spans = []; size = len(mm)
+    pos = mm.find(key)
+    while pos >= 0:
+        linestart = mm.rfind('\n', 0, pos) + 1
+        lineend = mm.find('\n', pos)
+        lineend = size if lineend < 0 else lineend + 1
+        if mm[linestart:linestart+3] == 'MSG': spans.append((linestart, lineend))
+        pos = mm.find(key, lineend)
+    return spans
 
-    T_idx = _np.column_stack((trial_start, trial_end)); T_lines = _np.column_stack((trial_start_lines, trial_end_lines))
-    return T_idx, T_lines
+
+def _indexASC(mm):
+    """
+    build a byte-offset index of the TRIALID...TRIAL_RESULT span of each 
+    trial in a memory-mapped ascii file
+    arguments:
+        mm : memory-mapped ascii file
+    return:
+        headerend : byte offset of the first trial; header lines are before 
+                    it
+        T_index   : list of (trialID, trial_type, spanstart, spanend) of 
+                    each trial, spanstart and spanend are byte offsets of 
+                    the start of TRIALID line and the end of TRIAL_RESULT
+                    line
+    """
+    startspans, endspans = _findMSGLines(mm, 'TRIALID'), _findMSGLines(mm, 'TRIAL_RESULT')
+    if len(startspans) != len(endspans):
+        raise ValueError("Trial starting and ending mismatch!")
     
+    T_index = []
+    for (st, st_end), (ed_start, ed) in zip(startspans, endspans):
+        trialID = int(mm[st:st_end].rstrip().split(' ')[-1])
+        trial_type = _np.nan
+        pos = mm.rfind('!V TRIAL_VAR picture_name', st, ed)
+        if pos >= 0:
+            trial_type = (mm[pos:mm.find('\n', pos)].split()[-1]).split('.')[0]
+        T_index.append((trialID, trial_type, st, ed))
+    headerend = startspans[0][0] if len(startspans) > 0 else len(mm)
     
-def _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, datatype):
+    return headerend, T_index
+
+
+def _selTrials(T_index, trialList):
+    """
+    select trials in the index by trial IDs and/or trial types
+    arguments:
+        T_index   : trial index, see _indexASC
+        trialList : a trial ID (int), a trial type (str) or a list of them
+    return:
+        T_sel : selected entries of T_index, in file order
     """
-    get split blink, fixation, and saccade data lines, and sampling 
-    frequency and eye recorded
+    if not isinstance(trialList, (list, tuple, set)): trialList = [trialList]
+    trialIDs = [item for item in trialList if not isinstance(item, basestring)]
+    trialTypes = [item for item in trialList if isinstance(item, basestring)]
+    T_sel = [entry for entry in T_index if entry[0] in trialIDs or entry[1] in trialTypes]
+    if len(T_sel) == 0: print 'Warning! No trials matching ' + str(trialList) + '!'
+    return T_sel
+
+
+def _spanLines(mm, spans):
+    """
+    yield data lines of byte spans of a memory-mapped ascii file
+    arguments:
+        mm    : memory-mapped ascii file
+        spans : list of (spanstart, spanend) byte offsets
+    """
+    for st, ed in spans:
+        for line in mm[st:ed].splitlines(True):
+            yield line
+
+
+def _ASCsignature(ascfile):
+    """
+    get the signature of an ascii file for validating its sidecar index
     argument:
-        triallines : data lines of a trial
-        datatype   : 0, record fixation and saccade; 
-                     1, record time stamped data
+        ascfile : ascii file with directory
     return:
-        blinklines; fixlines; saclines; stamplines
-        sampfreq; eyerec
-    """
-    blinklines = []
-    if datatype == 0:
-        fixlines = []; saclines = []
-    elif datatype == 1:
-        stamplines = []
-    for line in triallines:
-        if datatype == 0:
-            if _re.search('^EBLINK', line): blinklines.append(line.split())
-            if _re.search('^EFIX', line): fixlines.append(line.split())
-            if _re.search('^ESACC', line): saclines.append(line.split())
-            if _re.search('!MODE RECORD', line):
-                sampfreq = int(line.split()[5]); eyerec = line.split()[-1]
-        elif datatype == 1:
-            if _re.search('^EBLINK', line): blinklines.append(line.split())
-            if _re.search('^[0-9]', line): stamplines.append(line.split())
-            if _re.search('!MODE RECORD', line):
-                sampfreq = int(line.split()[5]); eyerec = line.split()[-1]
-    if datatype == 0: return blinklines, fixlines, saclines, sampfreq, eyerec
-    elif datatype == 1: return blinklines, stamplines, sampfreq, eyerec        
- 
-   
-def _gettdur(triallines):
+        signature : dictionary of file size, modification time and md5 
+                    hash of the first and last 64 KB of the file
     """
-    get estimated trial duration
+    size = _os.path.getsize(ascfile); blocksize = 65536
+    hasher = _hashlib.md5()
+    f = open(ascfile, 'rb')
+    hasher.update(f.read(blocksize))
+    if size > blocksize:
+        f.seek(max(blocksize, size - blocksize)); hasher.update(f.read(blocksize))
+    f.close()
+    return {'size': size, 'mtime': _os.path.getmtime(ascfile), 'hash': hasher.hexdigest()}
+
+
+def _buildASCidx(ascfile):
+    """
+    build the sidecar index of an ascii file
     argument:
-        triallines : data lines of a trial
+        ascfile : ascii file with directory
     return:
-        trialstart : starting time of the trial
-        trialend   : ending time of the trial
-        tdur       : estimated trial duration 
-        
+        ASCidx : dictionary storing signature, header information (script, 
+                 sessdate, srcfile), byte offset of the first trial 
+                 (headerend) and a list of per-trial dictionaries, storing 
+                 trialID, trial_type, byte span (spanstart, spanend), 
+                 sampfreq, eyerec, trialstart, trialend, tdur, recstart, 
+                 recend and numbers of fixations, saccades, blinks and 
+                 samples
+    """
+    f = open(ascfile, 'r'); print "Index ASC: ", f.name
+    mm = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+    headerend, T_index = _indexASC(mm)
+    script, sessdate, srcfile, _ = _tokenizeASC(mm[0:headerend].splitlines(True), 0)
+    ASCidx = {'signature': _ASCsignature(ascfile), 'script': script, 'sessdate': sessdate, 'srcfile': srcfile, 'headerend': headerend, 'trials': []}
+    for trialID, trial_type, spanstart, spanend in T_index:
+        lines = mm[spanstart:spanend].splitlines(True)
+        evtlines = [line for line in lines if not line[:1].isdigit()]   # skip samples, only count them
+        trial = _tokenizeASC(evtlines, 0)[3][0]
+        ASCidx['trials'].append({'trialID': trialID, 'trial_type': trial_type, 'spanstart': spanstart, 'spanend': spanend, 
+                                 'sampfreq': trial['sampfreq'], 'eyerec': trial['eyerec'], 'trialstart': trial['trialstart'], 'trialend': trial['trialend'], 
+                                 'tdur': trial['tdur'], 'recstart': trial['recstart'], 'recend': trial['recend'], 
+                                 'fixations': len(trial['fixlines']), 'saccades': len(trial['saclines']), 'blinks': len(trial['blinklines']), 'samples': len(lines) - len(evtlines)})
+    mm.close(); f.close()
+    return ASCidx
+
+
+def _loadASCidx(ascfile):
+    """
+    load the sidecar index (<subj>.ascidx, next to <subj>.asc) of an ascii 
+    file; the index is rebuilt and rewritten if it is missing or if the size,
+    modification time or hash of the ascii file has changed
+    argument:
+        ascfile : ascii file with directory
+    return:
+        ASCidx : sidecar index, see _buildASCidx
+    """
+    idxfile = _os.path.splitext(ascfile)[0] + '.ascidx'
+    if _os.path.isfile(idxfile):
+        try:
+            f = open(idxfile, 'r'); ASCidx = _json.load(f); f.close()
+            if ASCidx['signature'] == _ASCsignature(ascfile): return ASCidx
+        except (ValueError, KeyError):
+            print 'Warning! ' + idxfile + ' is corrupted and will be rebuilt!'
+    
+    ASCidx = _buildASCidx(ascfile)
+    try:
+        f = open(idxfile, 'w'); _json.dump(ASCidx, f); f.close()
+    except IOError:
+        print 'Warning! Cannot write ' + idxfile + '!'
+    return ASCidx
+
+
+def _readASC(ascfile, datatype, trialList=None):
+    """
+    read an ascii file once and tokenize it into per-trial event buffers;
+    if trialList is given, the file is memory-mapped and only the header 
+    and the byte spans of the selected trials, looked up in the sidecar
+    index, are tokenized
+    arguments:
+        ascfile   : ascii file with directory
+        datatype  : 0, record fixation and saccade; 
+                    1, record time stamped data
+        trialList : trial IDs (int) and/or trial types (str) to read; 
+                    default = None, read all trials
+    return:
+        script, sessdate, srcfile, trials : see _tokenizeASC
     """
-    trial_type, trialstart, trialend, tdur, recstart, recend = _np.nan, 0, 0, 0, 0, 0
-    for line in triallines:
-        if _re.search('!V TRIAL_VAR picture_name', line): trial_type = (line.split()[-1]).split('.')[0]
-        if _re.search('^START', line): trialstart = int(line.split()[1])
-        if _re.search('^END', line): trialend = int(line.split()[1])
-        if _re.search('ARECSTART', line): recstart = int(line.split()[1]) - int(line.split()[2])
-        if _re.search('ARECSTOP', line): recend = int(line.split()[1]) - int(line.split()[2])
-    tdur = trialend - trialstart        
-    return trial_type, trialstart, trialend, tdur, recstart, recend        
+    f = open(ascfile, 'r'); print "Read ASC: ", f.name
+    if trialList is None:
+        script, sessdate, srcfile, trials = _tokenizeASC(f, datatype)
+    else:
+        ASCidx = _loadASCidx(ascfile)   # trial spans from the sidecar index
+        headerend = ASCidx['headerend']
+        T_index = [(trial['trialID'], trial['trial_type'], trial['spanstart'], trial['spanend']) for trial in ASCidx['trials']]
+        mm = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+        spans = [(0, headerend)] + [(st, ed) for _, _, st, ed in _selTrials(T_index, trialList)]
+        script, sessdate, srcfile, trials = _tokenizeASC(_spanLines(mm, spans), datatype)
+        mm.close()
+    f.close()
+    return script, sessdate, srcfile, trials
 
 
 def _getErrorFree(ETRANDF, subjID, trial_type):
@@ -177,21 +349,197 @@ def _getErrorFree(ETRANDF, subjID, trial_type):
     return int(ETRANDF.loc[ETRANDF.SubjectID == 'a' + subjID, ETRANDF.columns == 'etRan_' + trial_type + 'ErrorFree'].iloc[0,0])
 
 
-def _getRegDF(regfileDic, trial_type):
+# region files are shared by all subjects, so each one is read and prepared
+# only once in a process; ext, cal and gen all go through this cache
+_regCache = {}      # (region file, mtime, addCharSp) -> dictionary of region data
+_regAtlas = None    # meta of the region atlas published to this (worker) process, see _writeRegAtlas
+
+
+def _loadRegion(regfile, addCharSp=None):
+    """
+    get a region file's data from the region cache, reading it if it is
+    not cached yet or has changed since cached
+    arguments:
+        regfile   : region file name with directory
+        addCharSp : if given, mod_x1 and mod_x2 are added to RegDF (see 
+                    _modRegDF), and the cross line information and the 
+                    per-line interval index are prepared as well
+    return:
+        entry : dictionary of region data: 'RegDF', and 'CrossLineInfo' 
+                and 'regIdx' if addCharSp is given; RegDF is shared, so
+                it must not be changed by the caller
+    """
+    regfile = _os.path.abspath(regfile); mtime = _os.path.getmtime(regfile)
+    key = (regfile, mtime, addCharSp)
+    if key not in _regCache:
+        # drop entries of an older version of this region file
+        for oldkey in [item for item in _regCache.keys() if item[0] == regfile and item[1] != mtime]:
+            del _regCache[oldkey]
+        RegDF = _readRegAtlas(regfile, mtime, addCharSp)     # prepared region from the atlas, if published
+        if RegDF is None:
+            RegDF = _pd.read_csv(regfile, sep=',')
+            if addCharSp is not None: _modRegDF(RegDF, addCharSp)
+        entry = {'RegDF': RegDF}
+        if addCharSp is not None:
+            entry['CrossLineInfo'] = _getCrossLineInfo(RegDF); entry['regIdx'] = _regIndex(RegDF)
+        _regCache[key] = entry
+    return _regCache[key]
+
+
+def _cachedRegion(RegDF):
+    """
+    find the region cache entry holding RegDF
+    arguments:
+        RegDF : region file data frame
+    return:
+        entry : dictionary of region data, None if RegDF is not cached
+    """
+    for entry in _regCache.values():
+        if entry['RegDF'] is RegDF:
+            return entry
+    return None
+
+
+def _shareRegions(regfileDic, addCharSp):
+    """
+    prepare all region files of a study with addCharSp once for pool 
+    workers: they are loaded into the region cache of this process, which
+    forked workers (posix) inherit as it is; workers started as new 
+    processes (Windows) get them from a region atlas instead
+    arguments:
+        regfileDic : a dictionary of region file names and directories
+        addCharSp  : number of single character space added to EMF for
+                     catching overshoot fixations
+    return:
+        atlasdir : temporary atlas folder, to be removed when the pool is 
+                   done; None if workers are forked or the atlas cannot 
+                   be written
+    """
+    for regfileName in regfileDic.keys(): _loadRegion(regfileDic[regfileName], addCharSp)
+    if _sys.platform != 'win32': return None    # forked workers share the cache of this process
+    return _writeRegAtlas(regfileDic, addCharSp)
+
+
+def _writeRegAtlas(regfileDic, addCharSp):
+    """
+    write all region files of a study, prepared with addCharSp, into one 
+    memory-mappable table for pool workers: one .npy file per column 
+    (regions of all trial_types one after another, mod_x1 and mod_x2 
+    included) plus a meta file (column names, string columns, and for each
+    trial_type its region file, mtime, rows in the table and dtypes), 
+    stored in a temporary folder
+    arguments:
+        regfileDic : a dictionary of region file names and directories
+        addCharSp  : number of single character space added to EMF for
+                     catching overshoot fixations
+    return:
+        atlasdir : atlas folder; None if the region files cannot be put 
+                   in one table (workers then read the region files)
+    """
+    meta = {'addCharSp': addCharSp, 'columns': None, 'strcols': [], 'nullcols': [], 'trials': {}}
+    RegDFlist = []; start = 0
+    for regfileName in sorted(regfileDic.keys()):
+        regfile = _os.path.abspath(regfileDic[regfileName])
+        RegDF = _loadRegion(regfile, addCharSp)['RegDF']
+        if meta['columns'] is None: meta['columns'] = list(RegDF.columns)
+        elif meta['columns'] != list(RegDF.columns): return None
+        meta['trials'][regfileName[:-len('.region.csv')]] = {'regfile': regfile, 'mtime': _os.path.getmtime(regfile), 'start': start, 'end': start + len(RegDF),
+                                                             'dtypes': [str(RegDF[col].dtype) for col in RegDF.columns]}
+        RegDFlist.append(RegDF); start += len(RegDF)
+    if len(RegDFlist) == 0: return None
+    arrays = {}
+    for col in meta['columns']:
+        values = _np.concatenate([RegDF[col].values for RegDF in RegDFlist])
+        if values.dtype == object:
+            nulls = _pd.isnull(values)
+            if not all(isinstance(value, basestring) for value in values[~nulls]): return None   # mixed column
+            values = _np.where(nulls, '', values).astype(str)
+            meta['strcols'].append(col)
+            if nulls.any(): meta['nullcols'].append(col); arrays[col + '.null'] = nulls
+        arrays[col] = values
+    atlasdir = None
+    try:
+        atlasdir = _tempfile.mkdtemp(suffix='.regatlas')
+        for name in arrays: _np.save(_os.path.join(atlasdir, name + '.npy'), arrays[name])
+        f = open(_os.path.join(atlasdir, 'meta.json'), 'w'); _json.dump(meta, f); f.close()
+    except (IOError, OSError):
+        print 'Warning! Cannot write the region atlas!'
+        if atlasdir is not None: _shutil.rmtree(atlasdir, True)
+        return None
+    return atlasdir
+
+
+def _openRegAtlas(atlasdir):
+    """
+    open a region atlas: its meta is read and its columns are memory-mapped
+    arguments:
+        atlasdir : atlas folder written by _writeRegAtlas
+    return:
+        atlas : meta of the atlas, with 'arrays' (memory-mapped columns) 
+                and 'regfiles' (region file -> trial_type); None if the 
+                atlas cannot be opened
+    """
+    try:
+        f = open(_os.path.join(atlasdir, 'meta.json'), 'r'); atlas = _json.load(f); f.close()
+        atlas['arrays'] = {}
+        for col in atlas['columns']:
+            atlas['arrays'][col] = _np.load(_os.path.join(atlasdir, col + '.npy'), mmap_mode='r')
+            if col in atlas['nullcols']: atlas['arrays'][col + '.null'] = _np.load(_os.path.join(atlasdir, col + '.null.npy'), mmap_mode='r')
+    except (IOError, OSError, ValueError):
+        print 'Warning! Cannot open ' + atlasdir + '!'
+        return None
+    atlas['regfiles'] = dict((trial['regfile'], trial_type) for trial_type, trial in atlas['trials'].items())
+    return atlas
+
+
+def _readRegAtlas(regfile, mtime, addCharSp):
+    """
+    get a prepared region file data frame from the region atlas published
+    to this process; the frame is built from (a copy of) the memory-mapped
+    columns, which saves reading and preparing the region file
+    arguments:
+        regfile   : region file name with (absolute) directory
+        mtime     : modification time of regfile
+        addCharSp : number of single character space added to EMF for
+                    catching overshoot fixations
+    return:
+        RegDF : region file data frame with mod_x1 and mod_x2; None if the
+                atlas is not published or does not have this version of
+                regfile prepared with addCharSp
+    """
+    if _regAtlas is None or addCharSp is None or addCharSp != _regAtlas['addCharSp'] or regfile not in _regAtlas['regfiles']:
+        return None
+    trial = _regAtlas['trials'][_regAtlas['regfiles'][regfile]]
+    if trial['mtime'] != mtime: return None
+    start, end = trial['start'], trial['end']
+    data = {}
+    for col, dtype in zip(_regAtlas['columns'], trial['dtypes']):
+        values = _regAtlas['arrays'][col][start:end]
+        if col in _regAtlas['strcols']:
+            values = _np.array(values, dtype=object)
+            if col in _regAtlas['nullcols']: values[_regAtlas['arrays'][col + '.null'][start:end]] = _np.nan
+        else:
+            values = values.astype(dtype)
+        data[col] = values
+    return _pd.DataFrame(data, columns=_regAtlas['columns'])
+
+
+def _getRegDF(regfileDic, trial_type, addCharSp=None):
     """
     get the region file data frame from regfileNameList based on trialID
     arguments:
         regfileDic : a dictionary of region file
                      names and directories
         trial_type : current trial ID
+        addCharSp  : if given, RegDF has mod_x1 and mod_x2 (see _modRegDF)
     return:
-        RegDF : region file data frame
+        RegDF : region file data frame (shared through the region cache, 
+                do not change it)
     """
     regfileName = trial_type + '.region.csv'
     if not (regfileName in regfileDic.keys()):
         raise ValueError("invalid trial_type!")
-    RegDF = _pd.read_csv(regfileDic[regfileName], sep=',')
-    return RegDF
+    return _loadRegion(regfileDic[regfileName], addCharSp)['RegDF']
 
 
 # helper functions geting crossline information based on region files, 
@@ -206,22 +554,93 @@ def _getCrossLineInfo(RegDF):
                         previous line and center of the first word of the
                         next line 
     """
+    entry = _cachedRegion(RegDF)
+    if entry is not None and 'CrossLineInfo' in entry:
+        return entry['CrossLineInfo']
+    line_no = RegDF.line_no.values
+    x_center = (RegDF.x1_pos.values + RegDF.x2_pos.values)/2.0; y_center = (RegDF.y1_pos.values + RegDF.y2_pos.values)/2.0
     CrossLineInfo = []
-    for ind in range(len(RegDF)-1):
-        if RegDF.line_no[ind]+1 == RegDF.line_no[ind+1]:
-            # line crossing! record
-            dic = {}
-            # center of the last word of the previous line
-            dic['p'] = RegDF.loc[ind,'line_no'];
-            dic['p_x'] = (RegDF.loc[ind,'x1_pos'] + RegDF.loc[ind,'x2_pos'])/2.0; dic['p_y'] = (RegDF.loc[ind,'y1_pos'] + RegDF.loc[ind,'y2_pos'])/2.0
-            # center of the first word of the next line
-            dic['n'] = RegDF.loc[ind+1,'line_no'];
-            dic['n_x'] = (RegDF.loc[ind+1,'x1_pos'] + RegDF.loc[ind+1,'x2_pos'])/2.0; dic['n_y'] = (RegDF.loc[ind+1,'y1_pos'] + RegDF.loc[ind+1,'y2_pos'])/2.0
-            CrossLineInfo.append(dic)
+    for ind in _np.where(line_no[:-1] + 1 == line_no[1:])[0]:
+        # line crossing! record center of the last word of the previous line and center of the first word of the next line
+        CrossLineInfo.append({'p': line_no[ind], 'p_x': x_center[ind], 'p_y': y_center[ind], 
+                              'n': line_no[ind+1], 'n_x': x_center[ind+1], 'n_y': y_center[ind+1]})
     
     return CrossLineInfo 
 
 
+def _regIndex(RegDF):
+    """
+    build an interval index of regions on each line
+    arguments:
+        RegDF : region file data frame (with mod_x1 and mod_x2)
+    return:
+        regIdx : dictionary: line_no -> (mod_x1, mod_x2, rows, monotonic);
+                 regions of the line are sorted by mod_x1, rows are their
+                 rows in RegDF, and monotonic tells whether mod_x2 is 
+                 sorted as well
+    """
+    entry = _cachedRegion(RegDF)
+    if entry is not None and 'regIdx' in entry:
+        return entry['regIdx']
+    regIdx = {}
+    line_no = RegDF.line_no.values; x1 = RegDF.mod_x1.values.astype(float); x2 = RegDF.mod_x2.values.astype(float)
+    for line in _np.unique(line_no):
+        rows = _np.where(line_no == line)[0]
+        rows = rows[_np.argsort(x1[rows], kind='mergesort')]
+        regIdx[line] = (x1[rows], x2[rows], rows, bool(_np.all(_np.diff(x2[rows]) >= 0)))
+    return regIdx
+
+
+def _chrOffset(RegDF):
+    """
+    get the cumulative character table of regions; it is computed once for
+    each region file in the region cache
+    arguments:
+        RegDF : region file data frame (with length)
+    return:
+        chrOffset : array of number of characters before each region: 
+                    chrOffset[ind] = sum of length of regions 0 to ind-1, 
+                    chrOffset[-1] = total number of characters of the text
+    """
+    entry = _cachedRegion(RegDF)
+    if entry is not None and 'chrOffset' in entry:
+        return entry['chrOffset']
+    chrOffset = _np.concatenate(([0], _np.cumsum(RegDF.length.values)))
+    if entry is not None: entry['chrOffset'] = chrOffset
+    return chrOffset
+
+
+def _findRegion(regIdx, line_no, x):
+    """
+    find the region of each position; a position gets a region only if 
+    exactly one region on its line covers it
+    arguments:
+        regIdx  : interval index of regions from _regIndex
+        line_no : line of each position
+        x       : x position of each position
+    return:
+        rows : row in RegDF of the region of each position; -1 if no 
+               region or more than one regions cover it
+    """
+    rows = _np.full(len(x), -1, dtype=int)
+    for line, (x1, x2, regrows, monotonic) in regIdx.items():
+        sel = _np.where(line_no == line)[0]
+        if len(sel) == 0:
+            continue
+        xs = x[sel]
+        if monotonic:
+            # covering regions are the ones starting before and ending after x, a contiguous run
+            hi = _np.searchsorted(x1, xs, side='right'); lo = _np.searchsorted(x2, xs, side='left')
+            one = hi - lo == 1
+            rows[sel[one]] = regrows[lo[one]]
+        else:
+            # overlapping regions, check each of them
+            cover = (x1[_np.newaxis,:] <= xs[:,_np.newaxis]) & (x2[_np.newaxis,:] >= xs[:,_np.newaxis])
+            one = cover.sum(axis=1) == 1
+            rows[sel[one]] = regrows[_np.argmax(cover[one], axis=1)]
+    return rows
+
+
 # helper functions for lumping short fixations (< 50ms)
 def _lumpTwoFix(Df, ind1, ind2, direc, addtime):
     """
@@ -403,6 +822,131 @@ def _lumpFix(Df, endindex, short_index, addtime, ln, zn):
     return Df
     
     
+def _lumpFixArr(Df, endindex, short_index, addtime, ln, zn):
+    """
+    lump fixation on numpy arrays; same rules (ln, zn, and the tie-breaking
+    between previous and next fixations) and results as _lumpFix, but 
+    start_time, end_time, duration, x_pos, y_pos and pup_size are handled 
+    as float arrays and dropped fixations are marked in a boolean mask
+    arguments:
+        Df          : fixation data for lumping 
+        short_index : list of index of fixation having short duration
+        addtime     : adjusting time for duration, calculated based on
+                      sampling frequency
+        ln          : in lumping, maximum duration of a fixation to 
+                      "lump"; default = 50. Fixation <= this value is 
+                      subject to lumping with adjacent and near enough 
+                      (determined by zN) fixations
+        zn          : in lumping, maximum distance (in pixels) between 
+                      two fixations for "lumping"; default = 50, roughly
+                      1.5 character (12/8s)
+    return:
+        Df : fixation data after lumping and dropping, reindexed
+    """
+    start, end, dur = Df.start_time.values.astype(float), Df.end_time.values.astype(float), Df.duration.values.astype(float)
+    x, y, pup = Df.x_pos.values.astype(float), Df.y_pos.values.astype(float), Df.pup_size.values.astype(float)
+    drop = _np.zeros(len(Df), dtype=bool)
+    
+    def lumpTwo(ind1, ind2, direc):
+        # lump ind2 into ind1, direc = 1: next; -1: previous
+        if direc == 1: end[ind1] = end[ind2]
+        else: start[ind1] = start[ind2]
+        dur[ind1] = end[ind1] - start[ind1] + addtime
+        x[ind1] = (x[ind1] + x[ind2])/2.0; y[ind1] = (y[ind1] + y[ind2])/2.0; pup[ind1] = (pup[ind1] + pup[ind2])/2.0
+        drop[ind2] = True
+    
+    def lumpMore(ind, ind_list):
+        # lump ind with inds in ind_list (consecutive next ones)
+        end[ind] = end[ind_list[-1]]
+        dur[ind] = end[ind] - start[ind] + addtime
+        for item in ind_list:
+            x[ind] += x[item]; y[ind] += y[item]; pup[ind] += pup[item]
+        x[ind] /= float(len(ind_list)+1); y[ind] /= float(len(ind_list)+1); pup[ind] /= float(len(ind_list)+1)
+        drop[ind_list] = True
+    
+    def lumpPrevNext(ind, nextind):
+        # check both the previous (ind-1) and next (nextind) fixation, the nearer one is lumped first
+        dist_next, dist_prev = 0.0, 0.0
+        if nextind <= endindex and not drop[nextind] and abs(x[ind] - x[nextind]) <= zn:
+            dist_next = abs(x[ind] - x[nextind])
+        if not drop[ind-1] and abs(x[ind] - x[ind-1]) <= zn:
+            dist_prev = abs(x[ind] - x[ind-1])
+        if dist_next != 0.0 and dist_prev == 0.0:
+            lumpTwo(ind, nextind, 1)
+        elif dist_next == 0.0 and dist_prev != 0.0:
+            lumpTwo(ind, ind-1, -1)
+        elif dist_next != 0.0 and dist_prev != 0.0:
+            if dist_next < dist_prev:
+                lumpTwo(ind, nextind, 1)
+                if dur[ind] <= ln and abs(x[ind] - x[ind-1]) <= zn: lumpTwo(ind, ind-1, -1)
+            else:
+                lumpTwo(ind, ind-1, -1)
+                if dur[ind] <= ln and abs(x[ind] - x[nextind]) <= zn: lumpTwo(ind, nextind, 1)
+    
+    cur = 0
+    while cur < len(short_index):
+        ind = short_index[cur]
+        if ind == endindex and ind != 0:
+            # the last fixation, only check the previous one
+            if not drop[ind-1] and abs(x[ind] - x[ind-1]) <= zn: lumpTwo(ind, ind-1, -1)
+        else:
+            # collect the consecutive short fixations within zn distance
+            next_list = []; nxt = cur + 1
+            while nxt < len(short_index) and short_index[nxt] == short_index[nxt-1] + 1 and abs(x[short_index[nxt]] - x[ind]) <= zn:
+                next_list.append(short_index[nxt]); nxt += 1
+            if len(next_list) != 0:
+                lumpMore(ind, next_list)
+                if dur[ind] <= ln:
+                    if ind == 0:
+                        # the first fixation, only check the next one
+                        if next_list[-1] + 1 <= endindex and abs(x[ind] - x[next_list[-1]+1]) <= zn: lumpTwo(ind, next_list[-1]+1, 1)
+                    else: lumpPrevNext(ind, next_list[-1]+1)
+                cur += len(next_list)   # jump over these lumped ones
+            elif ind == 0:
+                if ind + 1 <= endindex and abs(x[ind] - x[ind+1]) <= zn: lumpTwo(ind, ind+1, 1)
+            else:
+                lumpPrevNext(ind, ind+1)    # ind+1 cannot be dropped yet, so its drop check in lumpPrevNext is harmless
+        # after lumping or not, if short_index[cur]'s duration is still less than ln, delete it; as in 
+        # _lumpFix, after a jump this checks the last lumped one of next_list, not ind
+        if dur[short_index[cur]] <= ln: drop[short_index[cur]] = True
+        cur += 1
+    
+    Df.start_time = start; Df.end_time = end; Df.duration = dur; Df.x_pos = x; Df.y_pos = y; Df.pup_size = pup
+    if drop.any():
+        # drop ind lumped to other inds, and reindex rows
+        Df = Df[~drop].reset_index(drop=True)
+    return Df
+    
+    
+def _runBounds(mask):
+    """
+    find runs of consecutive True values in a boolean array
+    arguments:
+        mask : boolean array
+    return:
+        starts : starting index of each run
+        ends   : ending index (inclusive) of each run
+    """
+    edges = _np.diff(_np.concatenate(([0], mask.astype(_np.int8), [0])))
+    return _np.where(edges == 1)[0], _np.where(edges == -1)[0] - 1
+
+
+def _bigJump(change, offset, default):
+    """
+    find the first position having the biggest positive change
+    arguments:
+        change  : array of value changes
+        offset  : line in data frame of change[0]
+        default : line returned if no change is positive
+    return:
+        line of the first biggest positive change, or default
+    """
+    change = _np.where(change > 0, change, 0)  # nan or non-positive changes never count
+    if len(change) == 0 or change.max() == 0:
+        return default
+    return offset + int(_np.argmax(change))
+
+
 def _mergeFixLines(startline, endline, Df):
     """
     merge continuous rightward and leftward fixations
@@ -410,23 +954,22 @@ def _mergeFixLines(startline, endline, Df):
         startline : search starting line
         endline   : search ending line
         Df        : fixation data frame
-    """
-    mergelines = []
-    ind = startline
-    while ind < endline - 1:
-        stl, edl = ind, ind + 1
-        if Df.loc[edl,'x_pos'] - Df.loc[stl,'x_pos'] > 0:
-            # rightward fixations
-            mergelines.append((stl, edl, Df.loc[edl,'x_pos'] - Df.loc[stl,'x_pos'], 0))  # rightward fixations
-        elif Df.loc[edl,'x_pos'] - Df.loc[stl,'x_pos'] <= 0:
-            # leftward fixations
-            # keep searching till it becomes a rightward fixations
-            nextl = edl + 1
-            while nextl < endline and Df.loc[nextl,'x_pos'] - Df.loc[edl,'x_pos'] <= 0:
-                edl = nextl; nextl += 1
-            mergelines.append((stl, edl, Df.loc[edl,'x_pos'] - Df.loc[stl,'x_pos'], 1))  # leftward fixations
-        ind = edl
-    return mergelines
+    return:
+        mergelines : list of turples (start, end, x distance, direction), 
+                     direction 0 is rightward, 1 is leftward
+    """
+    x = Df.x_pos.values.astype(float)
+    if endline - startline < 2:
+        return []
+    diff = x[startline+1:endline] - x[startline:endline-1]    # diff[k] is the move from fixation startline+k to startline+k+1
+    # each rightward move is a merged line by itself
+    right = _np.where(diff > 0)[0]
+    mergelines = [(startline + k, startline + k + 1, diff[k], 0) for k in right]
+    # each run of leftward (or still) moves is merged into one line
+    starts, ends = _runBounds(diff <= 0)
+    mergelines += [(startline + st, startline + ed + 1, x[startline+ed+1] - x[startline+st], 1) for st, ed in zip(starts, ends)]
+    mergelines.sort(key=lambda line: line[0])
+    return [(int(line[0]), int(line[1]), line[2], line[3]) for line in mergelines]
 
     
 def _getCrosslineFix(CrossLineInfo, startline, endline, Df, diff_ratio, frontrange_ratio):
@@ -451,41 +994,32 @@ def _getCrosslineFix(CrossLineInfo, startline, endline, Df, diff_ratio, frontran
     """
     # merge rightward fixations and leftward fixations
     lines = []; mergelines = _mergeFixLines(startline, endline, Df)    
+    x, y = Df.x_pos.values.astype(float), Df.y_pos.values.astype(float)
     curline, ind = 0, 0 # curline records the current mergeline Fix data, ind records the current CrossLineInfo
     while ind < len(CrossLineInfo):
         curCross = CrossLineInfo[ind]; FixDistThres = diff_ratio*(curCross['p_x'] - curCross['n_x'])    # set up the maximum fixation distance to be identified as a cross-line fixation
-        if mergelines[curline][3] == 0 and mergelines[curline][2] >= FixDistThres and Df.loc[mergelines[curline][0],'x_pos'] <= curCross['n_x'] + frontrange_ratio*(curCross['p_x'] - curCross['n_x']):
+        stl, edl = mergelines[curline][0], mergelines[curline][1]
+        if mergelines[curline][3] == 0 and mergelines[curline][2] >= FixDistThres and x[stl] <= curCross['n_x'] + frontrange_ratio*(curCross['p_x'] - curCross['n_x']):
             if ind != 0:
                 # rightward backward crossline fixation
                 # move curCross to the back
                 if ind > 0:
                     ind -= 1; curCross = CrossLineInfo[ind]; FixDistThres = diff_ratio*(curCross['p_x'] - curCross['n_x'])
                 # record backward cross-line fixation using previous curCross
-                lines.append((-1, curCross['n'], curCross['p'], mergelines[curline][1]))
+                lines.append((-1, curCross['n'], curCross['p'], edl))
         if mergelines[curline][3] == 1 and mergelines[curline][2] <= -FixDistThres:
             # leftward forward crossline fixation
             # further check which fixation is the start of the next line
             # two criteria: 
             # first, if there is one big jump in x value bigger than FixDistThres, use that fixation as the cross line fixation
-            FindOne = False            
-            stl1 = mergelines[curline][0]
-            for nextl in range(mergelines[curline][0]+1,mergelines[curline][1]+1):
-                if Df.loc[nextl,'x_pos'] - Df.loc[nextl-1,'x_pos'] <= -FixDistThres:
-                    stl1 = nextl; FindOne = True
-                    break
-            if FindOne:
-                lines.append((1, curCross['p'], curCross['n'], stl1))
+            diffX = x[stl+1:edl+1] - x[stl:edl]; jump = _np.where(diffX <= -FixDistThres)[0]
+            if len(jump) != 0:
+                lines.append((1, curCross['p'], curCross['n'], stl + 1 + int(jump[0])))
             else:
                 # second, 1) find the first fixation having the biggest x value change 
-                stl1 = mergelines[curline][0]; bigX = 0
-                for nextl in range(mergelines[curline][0]+1,mergelines[curline][1]+1):
-                    if Df.loc[nextl-1,'x_pos'] - Df.loc[nextl,'x_pos'] > bigX:
-                        bigX = Df.loc[nextl-1,'x_pos'] - Df.loc[nextl,'x_pos']; stl1 = nextl
+                stl1 = _bigJump(-diffX, stl + 1, stl)
                 # 2) find the fixation having the biggest y value change     
-                stl2 = mergelines[curline][0]; bigY = 0
-                for nextl in range(mergelines[curline][0]+1,mergelines[curline][1]+1):
-                    if Df.loc[nextl,'y_pos'] - Df.loc[nextl-1,'y_pos'] > bigY:
-                        bigY = Df.loc[nextl,'y_pos'] - Df.loc[nextl-1,'y_pos']; stl2 = nextl
+                stl2 = _bigJump(y[stl+1:edl+1] - y[stl:edl], stl + 1, stl)
                 # compare stline1 and stline2
                 lines.append((1, curCross['p'], curCross['n'], max(stl1,stl2)))
             # move curCross to the next
@@ -510,6 +1044,136 @@ def _getCrosslineFix(CrossLineInfo, startline, endline, Df, diff_ratio, frontran
     return lines, curline, question
 
 
+def _lineSegments(lines, curlow, endline, crossline=False):
+    """
+    turn cross-line points into line_no segments
+    arguments:
+        lines     : cross-line turples (direction, prevline, nextline, 
+                    index in data frame)
+        curlow    : first line in data frame to mark
+        endline   : line in data frame where marking stops
+        crossline : if True, the cross-line one is marked as 
+                    (prevline, nextline) (saccades, see _fillSacLine);
+                    otherwise, it starts the next line (fixations)
+    return:
+        segments : list of (start, end, value) turples in writing order
+    """
+    segments = []
+    for curline in lines:
+        segments.append((curlow, curline[3], curline[1]))
+        if crossline:
+            segments.append((curline[3], curline[3]+1, (curline[1], curline[2])))
+            curlow = curline[3]+1
+        else:
+            curlow = curline[3]
+    if endline > curlow:
+        segments.append((curlow, endline, lines[-1][2]))
+    return segments
+
+
+def _fillLineNo(Df, segments, column='line_no', order=None):
+    """
+    fill in line_no (or another column) of Df segment by segment on an 
+    array, and write it back once
+    arguments:
+        Df       : fixation, saccade or time-stamped data frame
+        segments : list of (start, end, value) turples in writing order;
+                   lines start to end-1 get value
+        column   : column to fill in; default = 'line_no'
+        order    : if given, start and end refer to positions in order, 
+                   the lines of Df in sorted time
+    """
+    values = Df[column].values.astype(object)
+    # as in element-wise writing, numbers go into a float column as float 
+    # till the first string turns it into an object column
+    upcast = Df[column].dtype.kind == 'f'; isobject = Df[column].dtype.kind == 'O'
+    for start, end, value in segments:
+        if isinstance(value, basestring):
+            upcast = False; isobject = True
+        elif upcast:
+            value = float(value)
+        if end > start:
+            if order is None:
+                values[start:end] = value
+            else:
+                values[order[start:end]] = value
+    if isobject:
+        Df[column] = values
+    else:
+        Df[column] = _pd.Series(values, index=Df.index).infer_objects()
+
+
+def _fillSacLine(SacDF, segments):
+    """
+    fill in line_no, from_line, to_line and crossline of SacDF segment by
+    segment on arrays, and write them back once; a crossline saccade has
+    no line_no (nan), its from_line and to_line are the lines it leaves
+    and enters; any other saccade has line_no == from_line == to_line
+    arguments:
+        SacDF    : saccade data of the trial
+        segments : list of (start, end, value) turples in writing order
+                   (see _lineSegments); value is a line or a (prevline, 
+                   nextline) turple
+    """
+    num = len(SacDF)
+    line_no, from_line, to_line = _np.full(num, _np.nan), _np.full(num, _np.nan), _np.full(num, _np.nan)
+    crossline = _np.zeros(num, dtype=bool)
+    for start, end, value in segments:
+        if end > start:
+            if isinstance(value, tuple):
+                line_no[start:end] = _np.nan; from_line[start:end], to_line[start:end] = value; crossline[start:end] = True
+            else:
+                line_no[start:end] = from_line[start:end] = to_line[start:end] = value; crossline[start:end] = False
+    SacDF['line_no'] = line_no; SacDF['from_line'] = from_line; SacDF['to_line'] = to_line; SacDF['crossline'] = crossline
+
+
+def _typedSacLine(SacDF):
+    """
+    get saccade data with numeric line_no, from_line and to_line and a 
+    boolean crossline; saccade data in the legacy format (crossline 
+    saccades marked as prevline_nextline in line_no, e.g., '3_4') are 
+    converted
+    argument:
+        SacDF : saccade data (from _Sac.csv or ext's cal_crlSacFix)
+    return:
+        SacDF : saccade data with typed line columns (a converted copy if
+                in the legacy format)
+    """
+    if 'crossline' in SacDF.columns: return SacDF
+    parts = _np.char.partition(SacDF.line_no.values.astype(str), '_')   # '3_4' -> ('3', '_', '4'); '3.0' or 'nan' -> ('3.0', '', '')
+    crossline = parts[:,1] == '_'
+    from_line = parts[:,0].astype(float); to_line = _np.where(crossline, parts[:,2], parts[:,0]).astype(float)
+    SacDF = SacDF.copy()
+    SacDF['line_no'] = _np.where(crossline, _np.nan, from_line); SacDF['from_line'] = from_line; SacDF['to_line'] = to_line; SacDF['crossline'] = crossline
+    return SacDF
+
+
+def _legacySacLine(SacDF):
+    """
+    get saccade data in the legacy format: crossline saccades are marked 
+    as prevline_nextline in line_no, e.g., '3_4', and from_line, to_line 
+    and crossline are dropped; as in earlier versions, line numbers of a
+    trial after its first crossline saccade are integers
+    argument:
+        SacDF : saccade data with typed line columns
+    return:
+        SacDF : saccade data in the legacy format (a copy)
+    """
+    if 'crossline' not in SacDF.columns: return SacDF.copy()
+    line_no = SacDF.line_no.values.astype(float); crossline = SacDF.crossline.values.astype(bool)
+    values = line_no
+    if crossline.any():
+        values = line_no.astype(object); trial = SacDF.trial_id.values
+        for trialID in _np.unique(trial[crossline]):
+            rows = _np.where(trial == trialID)[0]
+            later = rows[(rows > rows[crossline[rows]][0]) & ~crossline[rows] & ~_np.isnan(line_no[rows])]
+            values[later] = [int(line) for line in line_no[later]]
+        values[crossline] = ['%d_%d' % lines for lines in zip(SacDF.from_line.values[crossline], SacDF.to_line.values[crossline])]
+    SacDF = SacDF.drop(['from_line', 'to_line', 'crossline'], axis=1)
+    SacDF['line_no'] = values
+    return SacDF
+
+
 def _getFixLine(RegDF, crlSac, FixDF, classify_method, diff_ratio, frontrange_ratio, y_range):
     """
     add line information for each FixDF
@@ -557,34 +1221,26 @@ def _getFixLine(RegDF, crlSac, FixDF, classify_method, diff_ratio, frontrange_ra
                     curline = nextline; nextline = curline + 1
                 if nextline < len(FixDF):
                     endline = nextline                
-            # mark crossline saccade as prevline_nextline
-            curlow = 0    
-            for ind in range(len(lines)):
-                curline = lines[ind]
-                for line in range(curlow, curline[3]):
-                    FixDF.loc[line,'line_no'] = curline[1]
-                curlow = curline[3]
-            for line in range(curlow, endline):
-                FixDF.loc[line,'line_no'] = lines[-1][2]        
+            # mark line_no of fixations
+            _fillLineNo(FixDF, _lineSegments(lines, 0, endline))
         elif classify_method == 'SAC':
             # method 2: based on crosslineSac
-            lines = []            
+            lines, segments = [], []
+            endtime = FixDF.end_time.values
             curlow = 0
             for ind in range(len(crlSac)):
-                curup = curlow + 1
-                while FixDF.end_time[curup] <= crlSac.start_time[ind]:
-                    curup += 1
+                # first fixation after curlow ending later than the start of the crossline saccade
+                curup = max(curlow + 1, int(_np.searchsorted(endtime, crlSac.start_time[ind], side='right')))
                 start = crlSac.loc[ind,'startline']; end = crlSac.loc[ind,'endline']
                 if start < end:
                     direction = 1
                 else:
                     direction = -1
                 lines.append([direction, start, end, curup])    
-                for line in range(curlow, curup):
-                    FixDF.loc[line,'line_no'] = crlSac.loc[ind,'startline']
+                segments.append((curlow, curup, start))
                 curlow = curup
-            for line in range(curlow, len(FixDF)):
-                FixDF.loc[line,'line_no'] = crlSac.loc[ind,'endline']        
+            segments.append((curlow, len(FixDF), crlSac.loc[ind,'endline']))
+            _fillLineNo(FixDF, segments)
     else:
         # double eye data
         numLeft = len(FixDF[FixDF.eye == 'L']); numRight = len(FixDF[FixDF.eye == 'R']) 
@@ -601,15 +1257,6 @@ def _getFixLine(RegDF, crlSac, FixDF, classify_method, diff_ratio, frontrange_ra
                     curline_Left = nextline; nextline = curline_Left + 1
                 if nextline < numLeft:
                     endline_Left = nextline
-            # mark crossline saccade as prevline_nextline
-            curlow = 0    
-            for ind in range(len(lines_Left)):
-                curline = lines_Left[ind]
-                for line in range(curlow, curline[3]):
-                    FixDF.loc[line,'line_no'] = curline[1]
-                curlow = curline[3]
-            for line in range(curlow, endline_Left):
-                FixDF.loc[line,'line_no'] = lines_Left[-1][2]
             
             # second, right eye data
             lines_Right, curline_Right, ques2 = _getCrosslineFix(CrossLineInfo, numLeft, numLeft + numRight, FixDF, diff_ratio, frontrange_ratio)                
@@ -622,57 +1269,31 @@ def _getFixLine(RegDF, crlSac, FixDF, classify_method, diff_ratio, frontrange_ra
                     curline_Right = nextline; nextline = curline_Right + 1
                 if nextline < numLeft + numRight:
                     endline_Right = nextline                
-            # mark crossline saccade as prevline_nextline        
-            curlow = numLeft
-            for ind in range(len(lines_Right)):
-                curline = lines_Right[ind]
-                for line in range(curlow, curline[3]):
-                    FixDF.loc[line,'line_no'] = curline[1]
-                curlow = curline[3]
-            for line in range(curlow, endline_Right):
-                FixDF.loc[line,'line_no'] = lines_Right[-1][2]
+            # mark line_no of fixations of both eyes
+            _fillLineNo(FixDF, _lineSegments(lines_Left, 0, endline_Left) + _lineSegments(lines_Right, numLeft, endline_Right))
         
             lines = lines_Left + lines_Right
             if ques1 or ques2:
                 question = True
         elif classify_method == 'SAC':
             # method 2: based on crosslineSac
-            lines = []
-            curlow = 0
-            for ind in range(len(crlSac)):
-                if crlSac.eye[ind] == 'L':
-                    curup = curlow + 1
-                    while FixDF.eye[curup] == 'L' and FixDF.end_time[curup] <= crlSac.start_time[ind]:
-                        curup += 1
-                    start = crlSac.loc[ind,'startline']; end = crlSac.loc[ind,'endline']
-                    if start < end:
-                        direction = 1
-                    else:
-                        direction = -1
-                    lines.append([direction, start, end, curup])     
-                    for line in range(curlow, curup):
-                        FixDF.loc[line,'line_no'] = crlSac.loc[ind,'startline']
-                    curlow = curup
-            for line in range(curlow, numLeft):
-                FixDF.loc[line,'line_no'] = crlSac.loc[ind,'endline']
-
-            curlow = numLeft
-            for ind in range(len(crlSac)):
-                if crlSac.eye[ind] == 'R':
-                    curup = curlow + 1
-                    while FixDF.eye[curup] == 'R' and FixDF.end_time[curup] <= crlSac.start_time[ind]:
-                        curup += 1
-                    start = crlSac.loc[ind,'startline']; end = crlSac.loc[ind,'endline']
-                    if start < end:
-                        direction = 1
-                    else:
-                        direction = -1
-                    lines.append([direction, start, end, curup])       
-                    for line in range(curlow, curup):
-                        FixDF.loc[line,'line_no'] = crlSac.loc[ind,'startline']
-                    curlow = curup
-            for line in range(curlow, numLeft + numRight):
-                FixDF.loc[line,'line_no'] = crlSac.loc[ind,'endline']
+            lines, segments = [], []
+            endtime = FixDF.end_time.values
+            for eye, curlow, curend in (('L', 0, numLeft), ('R', numLeft, numLeft + numRight)):
+                for ind in range(len(crlSac)):
+                    if crlSac.eye[ind] == eye:
+                        # first fixation of this eye after curlow ending later than the start of the crossline saccade
+                        curup = max(curlow + 1, curlow + int(_np.searchsorted(endtime[curlow:curend], crlSac.start_time[ind], side='right')))
+                        start = crlSac.loc[ind,'startline']; end = crlSac.loc[ind,'endline']
+                        if start < end:
+                            direction = 1
+                        else:
+                            direction = -1
+                        lines.append([direction, start, end, curup])     
+                        segments.append((curlow, curup, start))
+                        curlow = curup
+                segments.append((curlow, curend, crlSac.loc[ind,'endline']))
+            _fillLineNo(FixDF, segments)
     
     return lines, question
     
@@ -725,6 +1346,40 @@ def _getcrlFix(RegDF, crlSac, FixDF, classify_method, diff_ratio, frontrange_rat
     return crlFix, question    
     
 
+def _parseSamples(stamplines, eyerec):
+    """
+    convert the raw sample lines of a trial into numpy arrays in one go, 
+    '.' (missing data) is mapped to NaN at parse time; trailing flag 
+    columns (e.g., '...') are ignored
+    arguments:
+        stamplines : raw time stamped lines of a trial
+        eyerec     : eye recorded ('R', 'L' or 'LR'); 3 value columns 
+                     (x, y, pupil size) for monocular and 6 for binocular
+                     recording
+    return:
+        time   : int64 array of time stamps
+        values : float array of value columns, one row per sample
+    """
+    valnum = 6 if eyerec == 'LR' else 3
+    if len(stamplines) == 0: return _np.zeros(0, dtype=_np.int64), _np.zeros((0, valnum))
+    tokens = _np.array(' '.join(stamplines).split())
+    colnum = len(stamplines[0].split())
+    try:
+        # all lines share the same layout: reshape the token stream directly
+        if colnum < 1 + valnum or len(tokens) != colnum*len(stamplines): raise ValueError
+        block = tokens.reshape(len(stamplines), colnum)
+        time = block[:,0].astype(_np.int64)
+        if len(time) > 1 and _np.any(_np.diff(time) <= 0): raise ValueError
+    except ValueError:
+        # ragged lines: align them one by one, padding missing columns with '.'
+        block = _np.array([(line.split() + ['.']*(1 + valnum))[:1 + valnum] for line in stamplines])
+        time = block[:,0].astype(_np.int64)
+    values = block[:,1:1 + valnum]
+    values = _np.where(values == '.', 'nan', values).astype(float)
+    
+    return time, values
+
+
 def _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, error_free=1):
     """
     get fixation data from trials
@@ -732,7 +1387,7 @@ def _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, sc
         ExpType    : type of experiments: 'RAN', 'RP'        
         trailID    : trail ID of the data
         blinklines : blink lines of a trial
-        stamplines : time stamped lines of a trial
+        stamplines : raw time stamped lines of a trial
         sampfreq   : sampling frequency (to calculate amending time for
                      duration)
         eyerec     : eye recorded ('R', 'L' or 'LR')
@@ -760,27 +1415,22 @@ def _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, sc
     StampDF.blinks = int(blink_number)
         
     StampDF.eye = eyerec
-    StampDF.time = [int(line[0]) for line in stamplines]
+    time, values = _parseSamples(stamplines, eyerec)
+    StampDF.time = time
     if eyerec == 'L' or eyerec == 'R':
-        StampDF.x_pos1 = [line[1] for line in stamplines]; StampDF.loc[StampDF.x_pos1 == '.', 'x_pos1'] = _np.nan; StampDF.x_pos1 = StampDF.x_pos1.astype(float)
-        StampDF.y_pos1 = [line[2] for line in stamplines]; StampDF.loc[StampDF.y_pos1 == '.', 'y_pos1'] = _np.nan; StampDF.y_pos1 = StampDF.y_pos1.astype(float)
-        StampDF.pup_size1 = [line[3] for line in stamplines]; StampDF.loc[StampDF.pup_size1 == '.', 'pup_size1'] = _np.nan; StampDF.pup_size1 = StampDF.pup_size1.astype(float)
+        StampDF.x_pos1 = values[:,0]; StampDF.y_pos1 = values[:,1]; StampDF.pup_size1 = values[:,2]
         StampDF.x_pos2 = _np.nan; StampDF.y_pos2 = _np.nan 
         StampDF.pup_size2 = _np.nan
     elif eyerec == 'LR':
-        StampDF.x_pos1 = [line[1] for line in stamplines]; StampDF.loc[StampDF.x_pos1 == '.', 'x_pos1'] = _np.nan; StampDF.x_pos1 = StampDF.x_pos1.astype(float)
-        StampDF.y_pos1 = [line[2] for line in stamplines]; StampDF.loc[StampDF.y_pos1 == '.', 'y_pos1'] = _np.nan; StampDF.y_pos1 = StampDF.y_pos1.astype(float)
-        StampDF.pup_size1 = [line[3] for line in stamplines]; StampDF.loc[StampDF.pup_size1 == '.', 'pup_size1'] = _np.nan; StampDF.pup_size1 = StampDF.pup_size1.astype(float)
-        StampDF.x_pos2 = [line[4] for line in stamplines]; StampDF.loc[StampDF.x_pos2 == '.', 'x_pos2'] = _np.nan; StampDF.x_pos2 = StampDF.x_pos2.astype(float)
-        StampDF.y_pos2 = [line[5] for line in stamplines]; StampDF.loc[StampDF.y_pos2 == '.', 'y_pos2'] = _np.nan; StampDF.y_pos2 = StampDF.y_pos2.astype(float)
-        StampDF.pup_size2 = [line[6] for line in stamplines]; StampDF.loc[StampDF.pup_size2 == '.', 'pup_size2'] = _np.nan; StampDF.pup_size2 = StampDF.pup_size2.astype(float)
+        StampDF.x_pos1 = values[:,0]; StampDF.y_pos1 = values[:,1]; StampDF.pup_size1 = values[:,2]
+        StampDF.x_pos2 = values[:,3]; StampDF.y_pos2 = values[:,4]; StampDF.pup_size2 = values[:,5]
        
     StampDF.line_no = _np.nan; StampDF.gaze_region_no = _np.nan; StampDF.label = _np.nan; StampDF.error_free = error_free; StampDF.Fix_Sac = _np.nan
     
     return StampDF
 
         
-def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, rec_lastFix, lump_Fix, ln, zn, mn):
+def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, rec_lastFix, lump_Fix, ln, zn, mn, lump_method='ARRAY'):
     """
     get fixation data from trials
     arguments:
@@ -814,11 +1464,15 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
                       1.5 character (12/8s)
         mn          : in lumping, minimum legal fixation duration; default 
                       = 50 ms
+        lump_method : lumping engine: 'ARRAY', numpy arrays (_lumpFixArr);
+                      'DF', data frame cells (_lumpFix); both give the 
+                      same results; default = 'ARRAY'
     return:
         FixDF : fixation data of the trial
     """            
     blink_number, fix_number = len(blinklines), len(fixlines)
     addtime = 1/float(sampfreq) * 1000
+    lumpFix = _lumpFixArr if lump_method == 'ARRAY' else _lumpFix
     
     # First, record and lump fixations 
     if eyerec == 'L' or eyerec == 'R':
@@ -840,26 +1494,21 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
         if lump_Fix:
             # lump fixations
             # get indices of candidate fixations for lumping, whose durations <= ln
-            short_index = []
-            for ind in range(fix_number):
-                if FixDF.loc[ind,'duration'] <= ln and FixDF.loc[ind,'valid'] == 'yes':
-                    short_index.append(ind)        
+            short_index = list(_np.where((FixDF.duration <= ln) & (FixDF.valid == 'yes'))[0])
             # check each short fixation for lumping        
             if not rec_lastFix:
                 endindex = fix_number - 2   # the upperbound of searching range, excluding the last one!
             else:
                 endindex = fix_number - 1   # the upperbound of searching range
             # lump data    
-            FixDF = _lumpFix(FixDF, endindex, short_index, addtime, ln, zn)       
+            FixDF = lumpFix(FixDF, endindex, short_index, addtime, ln, zn)       
 
     elif eyerec == 'LR':
         # both eyes data are recorded
-        numLeft, numRight = 0, 0
-        for line in fixlines:
-            if line[1] == 'L':
-                numLeft += 1
-            if line[1] == 'R':
-                numRight += 1
+        # partition fixations by eye in one go
+        eyes = _np.array([line[1] for line in fixlines], dtype=str)
+        fixlines1 = [fixlines[ind] for ind in _np.where(eyes == 'L')[0]]; fixlines2 = [fixlines[ind] for ind in _np.where(eyes == 'R')[0]]
+        numLeft, numRight = len(fixlines1), len(fixlines2)
         # print some necessary warnings!            
         if numLeft == 0:
             print 'Warning! No left eye Fix under both eyes Fix!'
@@ -880,12 +1529,8 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
             FixDF1.trialstart = trialstart; FixDF1.trialend = trialend; FixDF1.tdur = tdur; FixDF1.recstart = recstart; FixDF1.recend = recend
             FixDF1.blinks = int(blink_number)
             
-            cur = 0
-            for line in fixlines:
-                if line[1] == 'L':
-                    FixDF1.loc[cur,'eye'] = line[1]; FixDF1.loc[cur,'start_time'] = float(line[2]); FixDF1.loc[cur,'end_time'] = float(line[3]); FixDF1.loc[cur,'duration'] = float(line[4])
-                    FixDF1.loc[cur,'x_pos'] = float(line[5]); FixDF1.loc[cur,'y_pos'] = float(line[6]); FixDF1.loc[cur,'pup_size'] = float(line[7])
-                    cur += 1
+            FixDF1.eye = [line[1] for line in fixlines1]; FixDF1.start_time = [float(line[2]) for line in fixlines1]; FixDF1.end_time = [float(line[3]) for line in fixlines1]; FixDF1.duration = [float(line[4]) for line in fixlines1]
+            FixDF1.x_pos = [float(line[5]) for line in fixlines1]; FixDF1.y_pos = [float(line[6]) for line in fixlines1]; FixDF1.pup_size = [float(line[7]) for line in fixlines1]
             
             FixDF1['valid'] = 'yes'
             if not rec_lastFix and lastLR == 'L':
@@ -893,10 +1538,7 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
             
             if lump_Fix:
                 # lump fixations
-                short_index1 = []
-                for ind in range(numLeft):
-                    if FixDF1.loc[ind,'duration'] <= ln and FixDF1.loc[ind,'valid'] == 'yes':
-                        short_index1.append(ind)
+                short_index1 = list(_np.where((FixDF1.duration <= ln) & (FixDF1.valid == 'yes'))[0])
                 # check each short fixation for lumping        
                 if not rec_lastFix:
                     if numLeft == fix_number:
@@ -906,7 +1548,7 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
                 else:
                     endindex1 = numLeft - 1
                 # lump data        
-                FixDF1 = _lumpFix(FixDF1, endindex1, short_index1, addtime, ln, zn)               
+                FixDF1 = lumpFix(FixDF1, endindex1, short_index1, addtime, ln, zn)               
         
         if numRight != 0:
             FixDF2 = _pd.DataFrame(_np.zeros((numRight, 23)))
@@ -917,12 +1559,8 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
             FixDF2.trialstart = trialstart; FixDF2.trialend = trialend; FixDF2.tdur = tdur; FixDF2.recstart = recstart; FixDF2.recend = recend
             FixDF2.blinks = int(blink_number)
 
-            cur = 0        
-            for line in fixlines:
-                if line[1] == 'R':
-                    FixDF2.loc[cur,'eye'] = line[1]; FixDF2.loc[cur,'start_time'] = float(line[2]); FixDF2.loc[cur,'end_time'] = float(line[3]); FixDF2.loc[cur,'duration'] = float(line[4])
-                    FixDF2.loc[cur,'x_pos'] = float(line[5]); FixDF2.loc[cur,'y_pos'] = float(line[6]); FixDF2.loc[cur,'pup_size'] = float(line[7])
-                    cur += 1
+            FixDF2.eye = [line[1] for line in fixlines2]; FixDF2.start_time = [float(line[2]) for line in fixlines2]; FixDF2.end_time = [float(line[3]) for line in fixlines2]; FixDF2.duration = [float(line[4]) for line in fixlines2]
+            FixDF2.x_pos = [float(line[5]) for line in fixlines2]; FixDF2.y_pos = [float(line[6]) for line in fixlines2]; FixDF2.pup_size = [float(line[7]) for line in fixlines2]
             
             FixDF2['valid'] = 'yes'
             if not rec_lastFix and lastLR == 'R':
@@ -930,10 +1568,7 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
         
             if lump_Fix:            
                 # lump fixation
-                short_index2 = []
-                for ind in range(numRight):
-                    if FixDF2.loc[ind,'duration'] <= ln and FixDF2.loc[ind,'valid'] == 'yes':
-                        short_index2.append(ind)
+                short_index2 = list(_np.where((FixDF2.duration <= ln) & (FixDF2.valid == 'yes'))[0])
                 # check each short fixation for lumping        
                 if not rec_lastFix:
                     if numRight == fix_number:                     
@@ -943,20 +1578,18 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
                 else:
                     endindex2 = numRight - 1                
                 # lump data        
-                FixDF2 = _lumpFix(FixDF2, endindex2, short_index2, addtime, ln, zn) 
+                FixDF2 = lumpFix(FixDF2, endindex2, short_index2, addtime, ln, zn) 
         
         # merge all data
         FixDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid', 'line_no', 'region_no'))
-        if numLeft != 0:
-            FixDF = FixDF.append(FixDF1, ignore_index=True)
-        if numRight != 0:
-            FixDF = FixDF.append(FixDF2, ignore_index=True)
+        FixDFlist = []
+        if numLeft != 0: FixDFlist.append(FixDF1)
+        if numRight != 0: FixDFlist.append(FixDF2)
+        FixDF = _concatDF(FixDF, FixDFlist)
     
     if lump_Fix:
         # check validity of fixations after possible lumping
-        for ind in range(len(FixDF)):
-            if FixDF.loc[ind,'duration'] < mn:
-                FixDF.loc[ind,'valid'] = 'no'
+        FixDF.loc[FixDF.duration < mn, 'valid'] = 'no'
     
     FixDF.line_no = _np.nan
     FixDF.region_no = _np.nan
@@ -966,28 +1599,25 @@ def _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, se
 
 def _mergeSacLines(startline, endline, Df):
     """
-    merge continuous rightward and leftward fixations
+    merge continuous rightward and leftward saccades
     arguments:
         startline : search starting line
         endline   : search ending line
-        Df        : fixation data frame
+        Df        : saccade data frame
+    return:
+        mergelines : list of turples (start, end, x distance, direction), 
+                     direction 0 is rightward, 1 is leftward
     """
-    mergelines = []
-    ind = startline
-    while ind < endline:
-        if Df.loc[ind,'x2_pos'] - Df.loc[ind,'x1_pos'] > 0:
-            # rightward fixations
-            mergelines.append((ind, ind, Df.loc[ind,'x2_pos'] - Df.loc[ind,'x1_pos'], 0))  # rightward fixations
-            nextl = ind + 1
-        elif Df.loc[ind,'x2_pos'] - Df.loc[ind,'x1_pos'] <= 0:
-            # leftward fixations
-            # keep searching till it becomes a rightward fixations
-            nextl = ind + 1; edl = nextl - 1
-            while nextl < endline and Df.loc[nextl,'x2_pos'] - Df.loc[nextl,'x1_pos'] <= 0:
-                edl = nextl; nextl += 1
-            mergelines.append((ind, edl, Df.loc[edl,'x2_pos'] - Df.loc[ind,'x1_pos'], 1))  # leftward fixations
-        ind = nextl
-    return mergelines
+    x1, x2 = Df.x1_pos.values.astype(float)[startline:endline], Df.x2_pos.values.astype(float)[startline:endline]
+    diff = x2 - x1
+    # each rightward saccade is a merged line by itself
+    right = _np.where(diff > 0)[0]
+    mergelines = [(startline + k, startline + k, diff[k], 0) for k in right]
+    # each run of leftward (or still) saccades is merged into one line
+    starts, ends = _runBounds(diff <= 0)
+    mergelines += [(startline + st, startline + ed, x2[ed] - x1[st], 1) for st, ed in zip(starts, ends)]
+    mergelines.sort(key=lambda line: line[0])
+    return [(int(line[0]), int(line[1]), line[2], line[3]) for line in mergelines]
     
     
 def _getCrosslineSac(CrossLineInfo, startline, endline, Df, diff_ratio, frontrange_ratio):
@@ -1012,41 +1642,33 @@ def _getCrosslineSac(CrossLineInfo, startline, endline, Df, diff_ratio, frontran
     """
     # merge rightward fixations and leftward fixations
     lines = []; mergelines = _mergeSacLines(startline, endline, Df)    
+    x1, x2 = Df.x1_pos.values.astype(float), Df.x2_pos.values.astype(float)
+    y1, y2 = Df.y1_pos.values.astype(float), Df.y2_pos.values.astype(float)
     curline, ind = 0, 0 # curline records the current mergeline Fix data, ind records the current CrossLineInfo
     while ind < len(CrossLineInfo):
         curCross = CrossLineInfo[ind]; FixDistThres = diff_ratio*(curCross['p_x'] - curCross['n_x'])    # set up the maximum fixation distance to be identified as a cross-line fixation
-        if mergelines[curline][3] == 0 and mergelines[curline][2] >= FixDistThres and Df.loc[mergelines[curline][0],'x1_pos'] <= curCross['n_x'] + frontrange_ratio*(curCross['p_x'] - curCross['n_x']):
+        stl, edl = mergelines[curline][0], mergelines[curline][1]
+        if mergelines[curline][3] == 0 and mergelines[curline][2] >= FixDistThres and x1[stl] <= curCross['n_x'] + frontrange_ratio*(curCross['p_x'] - curCross['n_x']):
             if ind != 0:
                 # rightward backward crossline fixation
                 # move curCross to the back
                 if ind > 0:
                     ind -= 1; curCross = CrossLineInfo[ind]; FixDistThres = diff_ratio*(curCross['p_x'] - curCross['n_x'])
                 # record backward cross-line fixation using previous curCross
-                lines.append((-1, curCross['n'], curCross['p'], mergelines[curline][1]))
+                lines.append((-1, curCross['n'], curCross['p'], edl))
         if mergelines[curline][3] == 1 and mergelines[curline][2] <= -FixDistThres:
             # leftward forward crossline fixation
             # further check which fixation is the start of the next line
             # two criteria:
             # first, if one saccade has a big jump in x value bigger than FixDistThres, that saccade is identified as the cross line saccade
-            FindOne = False            
-            stl1 = mergelines[curline][0]
-            for nextl in range(mergelines[curline][0],mergelines[curline][1]+1):
-                if Df.loc[nextl,'x2_pos'] - Df.loc[nextl,'x1_pos'] <= -FixDistThres:
-                    stl1 = nextl; FindOne = True
-                    break
-            if FindOne:
-                lines.append((1, curCross['p'], curCross['n'], stl1))
+            diffX = x2[stl:edl+1] - x1[stl:edl+1]; jump = _np.where(diffX <= -FixDistThres)[0]
+            if len(jump) != 0:
+                lines.append((1, curCross['p'], curCross['n'], stl + int(jump[0])))
             else:
                 # second, 1) find the first fixation having the biggest x value change 
-                stl1 = mergelines[curline][0]; bigX = 0
-                for nextl in range(mergelines[curline][0],mergelines[curline][1]+1):
-                    if Df.loc[nextl,'x1_pos'] - Df.loc[nextl,'x2_pos'] > bigX:
-                        bigX = Df.loc[nextl,'x1_pos'] - Df.loc[nextl,'x2_pos']; stl1 = nextl
+                stl1 = _bigJump(-diffX, stl, stl)
                 # 2) find the fixation having the biggest y value change     
-                stl2 = mergelines[curline][0]; bigY = 0
-                for nextl in range(mergelines[curline][0],mergelines[curline][1]+1):
-                    if Df.loc[nextl,'y2_pos'] - Df.loc[nextl,'y1_pos'] > bigY:
-                        bigY = Df.loc[nextl,'y2_pos'] - Df.loc[nextl,'y1_pos']; stl2 = nextl
+                stl2 = _bigJump(y2[stl:edl+1] - y1[stl:edl+1], stl, stl)
                 # compare stline1 and stline2
                 lines.append((1, curCross['p'], curCross['n'], max(stl1,stl2)))
             # move curCross to the next
@@ -1111,16 +1733,8 @@ def _getSacLine(RegDF, SacDF, diff_ratio, frontrange_ratio, y_range):
                 curline += 1
             if curline < len(SacDF):
                 endline = curline                
-        # mark crossline saccade as prevline_nextline
-        curlow = 0    
-        for ind in range(len(lines)):
-            curline = lines[ind]
-            for line in range(curlow, curline[3]):
-                SacDF.loc[line,'line_no'] = curline[1]
-            SacDF.loc[curline[3],'line_no'] = str(curline[1])+'_'+str(curline[2])    
-            curlow = curline[3]+1
-        for line in range(curlow, endline):
-            SacDF.loc[line,'line_no'] = lines[-1][2]
+        # mark crossline saccade with prevline and nextline
+        _fillSacLine(SacDF, _lineSegments(lines, 0, endline, crossline=True))
     else:
         # double eye saccade data
         numLeft = len(SacDF[SacDF.eye == 'L']); numRight = len(SacDF[SacDF.eye == 'R'])        
@@ -1135,21 +1749,6 @@ def _getSacLine(RegDF, SacDF, diff_ratio, frontrange_ratio, y_range):
                 curline_Left += 1
             if curline_Left < numLeft:
                 endline_Left = curline_Left
-        # mark crossline saccade as prevline_nextline
-        curlow = 0    
-        for ind in range(len(lines_Left)):
-            curline = lines_Left[ind]
-            for line in range(curlow, curline[3]):
-                SacDF.loc[line,'line_no'] = curline[1]
-            SacDF.loc[curline[3],'line_no'] = str(curline[1])+'_'+str(curline[2])    
-            curlow = curline[3]+1
-        for line in range(curlow, endline_Left):
-            SacDF.loc[line,'line_no'] = lines_Left[-1][2]
-        # mark crossline saccade as prevline_nextline    
-        for ind in range(len(lines_Left)):
-            curline = lines_Left[ind]
-            crossline = str(curline[1])+'_'+str(curline[2])
-            SacDF.loc[curline[3],'line_no'] = crossline
         
         # second, right eye saccade
         lines_Right, curline_Right, ques2 = _getCrosslineSac(CrossLineInfo, numLeft, numLeft + numRight, SacDF, diff_ratio, frontrange_ratio)
@@ -1162,22 +1761,14 @@ def _getSacLine(RegDF, SacDF, diff_ratio, frontrange_ratio, y_range):
                 curline_Right += 1
             if curline_Right < numLeft + numRight:
                 endline_Right = curline_Right                
-        # mark crossline saccade as prevline_nextline        
-        curlow = numLeft
-        for ind in range(len(lines_Right)):
-            curline = lines_Right[ind]
-            for line in range(curlow, curline[3]):
-                SacDF.loc[line,'line_no'] = curline[1]
-            SacDF.loc[curline[3],'line_no'] = str(curline[1])+'_'+str(curline[2])    
-            curlow = curline[3]+1
-        for line in range(curlow, endline_Right):
-            SacDF.loc[line,'line_no'] = lines_Right[-1][2]
+        # mark crossline saccade with prevline and nextline of both eyes
+        _fillSacLine(SacDF, _lineSegments(lines_Left, 0, endline_Left, crossline=True) + _lineSegments(lines_Right, numLeft, endline_Right, crossline=True))
         
         lines = lines_Left + lines_Right
         if ques1 or ques2:
             question = True
     
-    return lines, question        
+    return lines, question
 
 
 def _getcrlSac(RegDF, SacDF, diff_ratio, frontrange_ratio, y_range):
@@ -1243,26 +1834,25 @@ def _recSac(ExpType, trialID, blinklines, saclines, sampfreq, eyerec, script, se
         recstart   : starting time of recording
         recend     : ending time of recording
     return:
-        SacDF : saccade data of the trial
+        SacDF : saccade data of the trial; column 'dropsacs' counts the
+                saccades of the trial dropped for missing data
     """    
     # calculate blinks
-    blink_number, sac_number = len(blinklines), len(saclines)
-    # remove saclines having '.' at start, end, duration, x1_pos, y1_pos, x2_pos, or y2_pos
-    saclinestemp = saclines[:]    
-    for line in saclinestemp:
-        validData = True
-        for ind in range(2,11):
-            if line[ind] == '.':
-                validData = False; break
-        if validData == False:
-            saclines.remove(line); sac_number -= 1
-    
-    SacDF = _pd.DataFrame(_np.zeros((sac_number, 24)))
-    SacDF.columns = ['subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no']
+    blink_number = len(blinklines)
+    # remove saclines having '.' at start, end, duration, x1_pos, y1_pos, x2_pos, or y2_pos;
+    # the validity mask is built in one pass and the caller's list is left untouched
+    validSac = ['.' not in line[2:11] for line in saclines]
+    saclines = [line for line, valid in zip(saclines, validSac) if valid]
+    sac_number = len(saclines); drop_number = len(validSac) - sac_number
+    if drop_number > 0:
+        print 'Warning! Trial ' + str(trialID) + ': ' + str(drop_number) + ' saccade(s) with missing data are dropped!'
+    
+    SacDF = _pd.DataFrame(_np.zeros((sac_number, 28)))
+    SacDF.columns = ['subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'dropsacs', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no', 'from_line', 'to_line', 'crossline']
     SacDF.subj = srcfile.split('.')[0]; SacDF.trial_id = int(trialID); SacDF.trial_type = trial_type
     SacDF.sampfreq = int(sampfreq); SacDF.script = script; SacDF.sessdate = sessdate; SacDF.srcfile = srcfile
     SacDF.trialstart = trialstart; SacDF.trialend = trialend; SacDF.tdur = tdur; SacDF.recstart = recstart; SacDF.recend = recend
-    SacDF.blinks = int(blink_number)
+    SacDF.blinks = int(blink_number); SacDF.dropsacs = int(drop_number)
 
     if eyerec == 'L' or eyerec == 'R':
         # single eye saccade
@@ -1272,35 +1862,22 @@ def _recSac(ExpType, trialID, blinklines, saclines, sampfreq, eyerec, script, se
         SacDF.ampl = [float(line[9]) for line in saclines]; SacDF.pk = [float(line[10]) for line in saclines]
     elif eyerec == 'LR':
         # double eye saccade
-        numLeft, numRight = 0, 0
-        for line in saclines:
-            if line[1] == 'L':
-                numLeft += 1
-            elif line[1] == 'R':
-                numRight += 1                
+        # partition saccades by eye in one go: left eye ones first, then right eye ones
+        eyes = _np.array([line[1] for line in saclines], dtype=str)
+        numLeft, numRight = int(_np.sum(eyes == 'L')), int(_np.sum(eyes == 'R'))
+        saclinesLR = [saclines[ind] for ind in _np.concatenate((_np.where(eyes == 'L')[0], _np.where(eyes == 'R')[0]))]
         # print some necessary warnings!            
         if numLeft == 0:
             print 'Warning! Both eyes" fixations are recorded, but no left eye fixation data!'
         if numRight == 0:
             print 'Warning! Both eyes" fixations are recorded, but no right eye fixation data!'
         # record data
-        cur = 0    
-        for line in saclines:
-            if line[1] == 'L':
-                SacDF.loc[cur,'eye'] = line[1]; SacDF.loc[cur,'start_time'] = float(line[2]); SacDF.loc[cur,'end_time'] = float(line[3]); SacDF.loc[cur,'duration'] = float(line[4])
-                SacDF.loc[cur,'x1_pos'] = float(line[5]); SacDF.loc[cur,'y1_pos'] = float(line[6])
-                SacDF.loc[cur,'x2_pos'] = float(line[7]); SacDF.loc[cur,'y2_pos'] = float(line[8])
-                SacDF.loc[cur,'ampl'] = float(line[9]); SacDF.loc[cur,'pk'] = float(line[10])
-                cur += 1
-        for line in saclines:
-            if line[1] == 'R':
-                SacDF.loc[cur,'eye'] = line[1]; SacDF.loc[cur,'start_time'] = float(line[2]); SacDF.loc[cur,'end_time'] = float(line[3]); SacDF.loc[cur,'duration'] = float(line[4])
-                SacDF.loc[cur,'x1_pos'] = float(line[5]); SacDF.loc[cur,'y1_pos'] = float(line[6])
-                SacDF.loc[cur,'x2_pos'] = float(line[7]); SacDF.loc[cur,'y2_pos'] = float(line[8])
-                SacDF.loc[cur,'ampl'] = float(line[9]); SacDF.loc[cur,'pk'] = float(line[10])
-                cur += 1                   
-    
-    SacDF.line_no = _np.nan
+        SacDF.eye = [line[1] for line in saclinesLR]; SacDF.start_time = [float(line[2]) for line in saclinesLR]; SacDF.end_time = [float(line[3]) for line in saclinesLR]; SacDF.duration = [float(line[4]) for line in saclinesLR]
+        SacDF.x1_pos = [float(line[5]) for line in saclinesLR]; SacDF.y1_pos = [float(line[6]) for line in saclinesLR]
+        SacDF.x2_pos = [float(line[7]) for line in saclinesLR]; SacDF.y2_pos = [float(line[8]) for line in saclinesLR]
+        SacDF.ampl = [float(line[9]) for line in saclinesLR]; SacDF.pk = [float(line[10]) for line in saclinesLR]
+    
+    SacDF.line_no = _np.nan; SacDF.from_line = _np.nan; SacDF.to_line = _np.nan; SacDF.crossline = False
     
     return SacDF            
 
@@ -1315,19 +1892,16 @@ def _modRegDF(RegDF, addCharSp):
                     catching overshoot fixations
         RegDF, as a data frame, is mutable, so no return is needed    
     """
-    RegDF['mod_x1'] = RegDF.x1_pos; RegDF['mod_x2'] = RegDF.x2_pos
+    line_no = RegDF.line_no.values; num = len(RegDF)
     addDist = addCharSp*(RegDF.loc[0,'x2_pos'] - RegDF.loc[0,'x1_pos'])/_np.float(RegDF.loc[0,'length'])
-    for curEM in range(len(RegDF)):
-        if curEM == 0:            
-            RegDF.loc[curEM,'mod_x1'] -= addDist    # first word, add leftside!
-        elif curEM == len(RegDF) - 1:            
-            RegDF.loc[curEM,'mod_x2'] += addDist    # last word, add rightside!
-        else:
-            # check whether it is a line ending or line starting word
-            if RegDF.loc[curEM-1,'line_no'] == RegDF.loc[curEM,'line_no'] - 1:
-                RegDF.loc[curEM,'mod_x1'] -= addDist    # current region is a line starting, add leftside!
-            elif RegDF.loc[curEM+1,'line_no'] == RegDF.loc[curEM,'line_no'] + 1:
-                RegDF.loc[curEM,'mod_x2'] += addDist    # current region is a line ending, add rightside!
+    # first word and line starting words get space on the left; last word and line ending words get space on the right
+    middle = _np.zeros(num, dtype=bool); middle[1:num-1] = True
+    linestart = _np.zeros(num, dtype=bool); linestart[1:] = line_no[:-1] == line_no[1:] - 1
+    lineend = _np.zeros(num, dtype=bool); lineend[:-1] = line_no[1:] == line_no[:-1] + 1
+    addleft = middle & linestart; addleft[0] = True
+    addright = middle & ~linestart & lineend
+    if num > 1: addright[-1] = True
+    RegDF['mod_x1'] = RegDF.x1_pos - addDist*addleft; RegDF['mod_x2'] = RegDF.x2_pos + addDist*addright if addright.any() else RegDF.x2_pos
 
 
 def _crtASC_dic(sit, direct, subjID):
@@ -1404,6 +1978,90 @@ def _crtCSV_dic(sit, direct, subjID, csvfiletype):
     return csvfileExist, csvfileDic
 
 
+def _writeStampCache(csvfile, StampDF):
+    """
+    write a binary columnar cache of a time stamped csv file: one .npy file 
+    per column plus a meta file (csv size and modification time, column 
+    names, string columns and trial offset table), stored in the folder
+    <csvfile name>.npcache next to the csv file
+    arguments:
+        csvfile : time stamped csv file with directory
+        StampDF : time stamped data read from csvfile
+    return:
+        cacheOK : whether (True) or not (False) the cache is written
+    """
+    cachedir = _os.path.splitext(csvfile)[0] + '.npcache'
+    meta = {'csvsize': _os.path.getsize(csvfile), 'csvmtime': _os.path.getmtime(csvfile), 'nrows': len(StampDF), 
+            'columns': list(StampDF.columns), 'strcols': [], 'nullcols': [], 'trials': []}
+    arrays = {}
+    for col in StampDF.columns:
+        values = StampDF[col].values
+        if values.dtype == object:
+            nulls = _pd.isnull(values)
+            if not all(isinstance(value, basestring) for value in values[~nulls]): return False   # mixed column, not cached
+            values = _np.where(nulls, '', values).astype(str)
+            meta['strcols'].append(col)
+            if nulls.any(): meta['nullcols'].append(col); arrays[col + '.null'] = nulls
+        arrays[col] = values
+    if 'trial_id' in StampDF.columns and len(StampDF) > 0:
+        # trial offset table: runs of the same trial_id
+        trial_id = StampDF.trial_id.values
+        starts = [0] + list(_np.where(trial_id[1:] != trial_id[:-1])[0] + 1); ends = starts[1:] + [len(trial_id)]
+        meta['trials'] = [[trial_id[st].item(), int(st), int(ed)] for st, ed in zip(starts, ends)]
+    try:
+        if not _os.path.isdir(cachedir): _os.mkdir(cachedir)
+        for name in arrays: _np.save(_os.path.join(cachedir, name + '.npy'), arrays[name])
+        f = open(_os.path.join(cachedir, 'meta.json'), 'w'); _json.dump(meta, f); f.close()
+    except (IOError, OSError):
+        print 'Warning! Cannot write ' + cachedir + '!'
+        return False
+    return True
+
+
+def _readStampCSV(csvfile, columns=None, trialList=None):
+    """
+    read a time stamped csv file; if its binary columnar cache is valid, the
+    needed columns are memory-mapped from the cache and the csv file is 
+    skipped, otherwise the csv file is read and the cache is (re)built
+    arguments:
+        csvfile   : time stamped csv file with directory
+        columns   : list of columns to read; default = None, all columns
+        trialList : list of trial IDs to read; default = None, all trials;
+                    the index of the returned data keeps the row numbers
+                    of the csv file
+    return:
+        StampDF : time stamped data
+    """
+    cachedir = _os.path.splitext(csvfile)[0] + '.npcache'
+    metafile = _os.path.join(cachedir, 'meta.json'); meta = None
+    if _os.path.isfile(metafile):
+        f = open(metafile, 'r'); meta = _json.load(f); f.close()
+        if meta['csvsize'] != _os.path.getsize(csvfile) or meta['csvmtime'] != _os.path.getmtime(csvfile): meta = None
+    
+    if meta is None:
+        StampDF = _pd.read_csv(csvfile, sep=',')
+        _writeStampCache(csvfile, StampDF)
+        if trialList is not None: StampDF = StampDF[StampDF.trial_id.isin(trialList)]
+        if columns is not None: StampDF = StampDF[columns]
+        return StampDF
+    
+    if trialList is None: rows = _np.arange(meta['nrows'])
+    else: rows = _np.concatenate([_np.arange(0)] + [_np.arange(st, ed) for trialID, st, ed in meta['trials'] if trialID in trialList]).astype(int)
+    if columns is None: columns = meta['columns']
+    data = {}
+    for col in columns:
+        values = _np.load(_os.path.join(cachedir, col + '.npy'), mmap_mode='r')
+        if len(rows) == meta['nrows']: values = values[:]
+        elif len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows): values = values[rows[0]:rows[-1]+1]   # contiguous trials, no fancy indexing
+        else: values = values[rows]
+        if col in meta['strcols']:
+            values = _np.array(values, dtype=object)
+            if col in meta['nullcols']: values[_np.load(_os.path.join(cachedir, col + '.null.npy'), mmap_mode='r')[rows]] = _np.nan
+        data[col] = values
+    StampDF = _pd.DataFrame(data, index=rows, columns=columns)
+    return StampDF
+
+
 def _crtRegion_dic(direct, regfileNameList):
     """
     create region file dictionary
@@ -1477,6 +2135,28 @@ def _crtFixRepDic(sit, direct, subjID):
     return FixRepExist, FixRepDic
 
 
+def _joinIntervals(time, starts, ends):
+    """
+    find the samples falling in each event interval
+    arguments:
+        time   : time of samples
+        starts : starting time of events
+        ends   : ending time of events
+    return:
+        order  : None if time is sorted; otherwise, lines of samples in 
+                 sorted time
+        bounds : list of (lo, hi) turples; samples lo to hi-1 (in sorted 
+                 time) fall in [start, end] of each event
+    """
+    order = None
+    if not _np.all(time[1:] >= time[:-1]):
+        order = _np.argsort(time, kind='mergesort'); time = time[order]
+    starts, ends = _np.asarray(starts, dtype=float), _np.asarray(ends, dtype=float)
+    lo = _np.searchsorted(time, starts, side='left'); hi = _np.searchsorted(time, ends, side='right')
+    hi[_np.isnan(starts) | _np.isnan(ends)] = 0   # events missing time cover no samples
+    return order, zip(lo, hi)
+
+
 def _calTimeStamp(align_method, trial_type, trialstart, RegDF, StampDFtemp, FixRepDF, SacDF, FixDF):
     """
     assign line_no based on FixRep or Fix_Sac
@@ -1484,39 +2164,338 @@ def _calTimeStamp(align_method, trial_type, trialstart, RegDF, StampDFtemp, FixR
         align_method : 'FixRep': based on FixRepDF; 
                        'Fix_Sac': based on SacDF, FixDF
     """
+    time = StampDFtemp.time.values.astype(float)
     if align_method == 'FixRep':
         # use FixRepDF
         FixRep_cur = FixRepDF[FixRepDF.trial == trial_type].reset_index()          
         line_idx, line_time = _getLineInfo(FixRep_cur)            
-        for curind in range(len(line_idx)):
-            StampDFtemp.loc[(StampDFtemp.time >= line_time[curind][0] + trialstart) & (StampDFtemp.time <= line_time[curind][1] + trialstart), 'line_no'] = line_idx[curind]
-            StampDFtemp.loc[(StampDFtemp.time >= line_time[curind][0] + trialstart) & (StampDFtemp.time <= line_time[curind][1] + trialstart), 'Fix_Sac'] = 'Fix'
+        order, bounds = _joinIntervals(time, [item[0] + trialstart for item in line_time], [item[1] + trialstart for item in line_time])
+        _fillLineNo(StampDFtemp, [(lo, hi, line) for (lo, hi), line in zip(bounds, line_idx)], 'line_no', order)
+        _fillLineNo(StampDFtemp, [(lo, hi, 'Fix') for lo, hi in bounds], 'Fix_Sac', order)
     elif align_method == 'Fix_Sac':
         # use SacDF and FixDF
         SacDF_cur = SacDF[SacDF.trial_type == trial_type].reset_index()  
         FixDF_cur = FixDF[FixDF.trial_type == trial_type].reset_index()
-        for curind in range(len(SacDF_cur)):
-            starttime = SacDF_cur.start_time[curind]; endtime = SacDF_cur.end_time[curind]
-            StampDFtemp.loc[(StampDFtemp.time >= starttime) & (StampDFtemp.time <= endtime), 'line_no'] = SacDF_cur.line_no[curind]
-            StampDFtemp.loc[(StampDFtemp.time >= starttime) & (StampDFtemp.time <= endtime), 'Fix_Sac'] = 'Sac'
-        for curind in range(len(FixDF_cur)):
-            starttime = FixDF_cur.start_time[curind]; endtime = FixDF_cur.end_time[curind]
-            StampDFtemp.loc[(StampDFtemp.time >= starttime) & (StampDFtemp.time <= endtime), 'line_no'] = FixDF_cur.line_no[curind]
-            StampDFtemp.loc[(StampDFtemp.time >= starttime) & (StampDFtemp.time <= endtime), 'Fix_Sac'] = 'Fix'
+        # fixations are written after saccades, so they win where both cover a sample
+        order, bounds = _joinIntervals(time, _np.concatenate((SacDF_cur.start_time.values, FixDF_cur.start_time.values)), _np.concatenate((SacDF_cur.end_time.values, FixDF_cur.end_time.values)))
+        # time-stamped data keep crossline saccades as prevline_nextline
+        lines = list(_legacySacLine(SacDF_cur).line_no.values) + list(FixDF_cur.line_no.values); kinds = ['Sac']*len(SacDF_cur) + ['Fix']*len(FixDF_cur)
+        _fillLineNo(StampDFtemp, [(lo, hi, line) for (lo, hi), line in zip(bounds, lines)], 'line_no', order)
+        _fillLineNo(StampDFtemp, [(lo, hi, kind) for (lo, hi), kind in zip(bounds, kinds)], 'Fix_Sac', order)
         
-    # assign region_no in StampDFtemp
-    for curStamp in range(len(StampDFtemp)):
-        if not _np.isnan(StampDFtemp.loc[curStamp, 'x_pos1']) and StampDFtemp.loc[curStamp, 'Fix_Sac'] == 'Fix' and not _np.isnan(StampDFtemp.loc[curStamp, 'line_no']):
-            indlist = RegDF[(RegDF['line_no'] == StampDFtemp.loc[curStamp,'line_no']) & ((RegDF['mod_x1'] <= StampDFtemp.loc[curStamp,'x_pos1']) & (RegDF['mod_x2'] >= StampDFtemp.loc[curStamp,'x_pos1']))].index.tolist()
-            if len(indlist) == 1:
-                StampDFtemp.loc[curStamp,'gaze_region_no'] = int(RegDF.WordID[indlist[0]])
-                StampDFtemp.loc[curStamp,'label'] = RegDF.Word[indlist[0]]
-            else: StampDFtemp.loc[curStamp,'gaze_region_no'] = _np.nan
-        else: StampDFtemp.loc[curStamp,'gaze_region_no'] = _np.nan
+    # assign region_no in StampDFtemp: only fixation samples with valid x_pos1 and line_no are checked
+    x = StampDFtemp.x_pos1.values.astype(float)
+    fix = (StampDFtemp.Fix_Sac.values.astype(object) == 'Fix') & ~_np.isnan(x)
+    line_no = _np.full(len(StampDFtemp), _np.nan); line_no[fix] = StampDFtemp.line_no.values[fix].astype(float)
+    check = _np.where(fix & ~_np.isnan(line_no))[0]
+    rows = _np.full(len(StampDFtemp), -1, dtype=int); rows[check] = _findRegion(_regIndex(RegDF), line_no[check], x[check])
+    match = rows >= 0
+    StampDFtemp.gaze_region_no = _np.where(match, RegDF.WordID.values[rows].astype(float), _np.nan)
+    if match.any():
+        # label is only written for samples having a region
+        label = StampDFtemp.label.values.astype(object); label[match] = RegDF.Word.values[rows[match]]
+        StampDFtemp.label = label
+
+
+# helper functions for batch processing
+_logLock = None     # lock shared by pool workers for writing log.txt
+
+
+def _writeLog(direct, message):
+    """
+    append a message to log.txt in direct; writes from pool workers are 
+    serialized by the shared lock so that lines do not interleave
+    arguments:
+        direct  : directory storing log.txt
+        message : message to be written
+    """
+    if _logLock is not None: _logLock.acquire()
+    try:
+        logfile = open(_os.path.join(direct, 'log.txt'), 'a+')
+        logfile.write(message)
+        logfile.close()
+    finally:
+        if _logLock is not None: _logLock.release()
+
+
+def _initWorker(lock, atlasdir=None):
+    """
+    initialize a pool worker with the shared lock of log.txt and the
+    region atlas (if any, see _shareRegions) of the batch
+    """
+    global _logLock, _regAtlas
+    _logLock = lock
+    if atlasdir is not None: _regAtlas = _openRegAtlas(atlasdir)
+
+
+def _runSubj(task):
+    """
+    process a subject in a batch and catch its failure
+    argument:
+        task : (function, subjID, arguments of function)
+    return:
+        subjID : subject ID
+        error  : None if succeeded; otherwise, traceback of the failure
+    """
+    func, subjID, args = task
+    try:
+        func(*args)
+        return subjID, None
+    except Exception:
+        return subjID, _traceback.format_exc()
 
 
+def _runBatch(direct, func, subjIDs, argsList, workers=1, regions=None):
+    """
+    run func for each subject, serially (workers=1) or in a process pool;
+    a failed subject does not abort the batch, it is reported and recorded
+    in log.txt
+    arguments:
+        direct   : directory storing log.txt
+        func     : function processing a subject (and writing its files)
+        subjIDs  : list of subject IDs
+        argsList : list of arguments of func for each subject
+        workers  : number of worker processes; default = 1
+        regions  : (regfileDic, addCharSp) of the region files shared 
+                   with the workers (see _shareRegions); default = None
+    return:
+        failures : dictionary with key = subject ID, value = traceback of
+                   the failure
+    """
+    tasks = [(func, subjID, args) for subjID, args in zip(subjIDs, argsList)]
+    if workers > 1 and len(tasks) > 1:
+        lock = _mp.Lock()
+        atlasdir = _shareRegions(*regions) if regions is not None else None
+        try:
+            pool = _mp.Pool(processes=min(workers, len(tasks)), initializer=_initWorker, initargs=(lock, atlasdir))
+            try:
+                results = pool.map(_runSubj, tasks, chunksize=1)
+            finally:
+                pool.close(); pool.join()
+        finally:
+            if atlasdir is not None: _shutil.rmtree(atlasdir, True)
+    else:
+        results = map(_runSubj, tasks)
+    
+    failures = {}
+    for subjID, error in results:
+        if error is not None:
+            failures[subjID] = error
+            print 'Warning! Subj: ' + subjID + ' failed!'
+            _writeLog(direct, 'Subj: ' + subjID + ' failed in ' + func.__name__ + '!\n' + error)
+    return failures
+
+
+def _mapTrials(func, tasks, workers=1, regions=None):
+    """
+    apply func to the tasks of trials, serially (workers=1) or in a process
+    pool; results are returned in trial order
+    arguments:
+        func     : function processing a trial
+        tasks    : list of arguments of func for each trial
+        workers  : number of worker processes; default = 1
+        regions  : (regfileDic, addCharSp) of the region files shared 
+                   with the workers (see _shareRegions); default = None
+    return:
+        results : list of results of func, in the order of tasks
+    """
+    if workers > 1 and len(tasks) > 1:
+        atlasdir = _shareRegions(*regions) if regions is not None else None
+        try:
+            pool = _mp.Pool(processes=min(workers, len(tasks)), initializer=_initWorker, initargs=(None, atlasdir))
+            try:
+                results = pool.map(func, tasks, chunksize=1)
+            finally:
+                pool.close(); pool.join()
+        finally:
+            if atlasdir is not None: _shutil.rmtree(atlasdir, True)
+    else:
+        results = map(func, tasks)
+    return results
+
+
+def _crlSacFixTrial(RegDF, SacDFtemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range):
+    """
+    get crossline saccades and fixations of a trial and assign region_no
+    to its fixations
+    arguments:
+        RegDF     : region file of the trial
+        SacDFtemp : saccade data of the trial
+        FixDFtemp : fixation data of the trial (region_no is changed)
+        other arguments : see cal_crlSacFix
+    return:
+        crlSactemp  : crossline saccades of the trial
+        Sacquestion : whether the start/end of crossline saccades need check
+        crlFixtemp  : crossline fixations of the trial
+        Fixquestion : whether the start/end of crossline fixations need 
+                      check
+    """
+    crlSactemp, Sacquestion = _getcrlSac(RegDF, SacDFtemp, diff_ratio, frontrange_ratio, y_range)
+    crlFixtemp, Fixquestion = _getcrlFix(RegDF, crlSactemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range)
+    
+    # assign region_no in FixDFtemp
+    rows = _findRegion(_regIndex(RegDF), FixDFtemp.line_no.values, FixDFtemp.x_pos.values.astype(float))
+    FixDFtemp.region_no = _np.where(rows >= 0, RegDF.WordID.values[rows].astype(float), _np.nan)
+    
+    return crlSactemp, Sacquestion, crlFixtemp, Fixquestion
+
+
+def _calTrial(task):
+    """
+    process a trial in cal_crlSacFix
+    argument:
+        task : (trialID, trial_type, SacDFtemp, FixDFtemp, regfileDic, 
+               addCharSp, classify_method, diff_ratio, frontrange_ratio,
+               y_range)
+    return:
+        SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, 
+        Fixquestion : see _crlSacFixTrial
+    """
+    trialID, trial_type, SacDFtemp, FixDFtemp, regfileDic, addCharSp, classify_method, diff_ratio, frontrange_ratio, y_range = task
+    RegDF = _getRegDF(regfileDic, trial_type, addCharSp)  # get region file with mod_x1 and mod_x2 position of word regions
+    print "Get crlSac and crlFix: Trial ", str(trialID), " Type ", trial_type
+    crlSactemp, Sacquestion, crlFixtemp, Fixquestion = _crlSacFixTrial(RegDF, SacDFtemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range)
+    return SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, Fixquestion
+
+
+def _readCalTrial(task):
+    """
+    process a trial in read_cal_SRRasc
+    argument:
+        task : (trial, ExpType, script, sessdate, srcfile, regfileDic, 
+               addCharSp, classify_method, diff_ratio, frontrange_ratio,
+               y_range, rec_lastFix, lump_Fix, ln, zn, mn); trial is a 
+               per-trial dictionary from _readASC
+    return:
+        SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, 
+        Fixquestion : see _crlSacFixTrial
+    """
+    trial, ExpType, script, sessdate, srcfile, regfileDic, addCharSp, classify_method, diff_ratio, frontrange_ratio, y_range, rec_lastFix, lump_Fix, ln, zn, mn = task
+    trialID = trial['trialID']
+    blinklines, fixlines, saclines, sampfreq, eyerec = trial['blinklines'], trial['fixlines'], trial['saclines'], trial['sampfreq'], trial['eyerec']
+    trial_type, trialstart, trialend, tdur, recstart, recend = trial['trial_type'], trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend']
+    RegDF = _getRegDF(regfileDic, trial_type, addCharSp)  # get region file with mod_x1 and mod_x2 position of word regions
+    # read saccade and fixation data and get crossline saccade and fixation
+    print "Read Sac and Fix and Get crlSac and crlFix: Trial ", str(trialID), " Type ", trial_type
+    SacDFtemp = _recSac(ExpType, trialID, blinklines, saclines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend)
+    FixDFtemp = _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, rec_lastFix, lump_Fix, ln, zn, mn)        
+    crlSactemp, Sacquestion, crlFixtemp, Fixquestion = _crlSacFixTrial(RegDF, SacDFtemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range)
+    return SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, Fixquestion
+
+
+def _crlSacFix(direct, subjID, SacDF, FixDF, regfileDic, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, workers=1):
+    """
+    extract crossline saccades and fixations of a subject from saccade and
+    fixation data frames and update line numbers of original saccades and
+    fixations
+    arguments:
+        direct     : directory for storing log.txt (and the region atlas)
+        subjID     : subject ID
+        SacDF      : saccade data of the subject (from read_SRRasc or 
+                     _Sac.csv)
+        FixDF      : fixation data of the subject (from read_SRRasc or 
+                     _Fix.csv)
+        regfileDic : a dictionary of region file names and directories
+        other arguments : see cal_crlSacFix
+    output:
+        newSacDF, crlSac, newFixDF, crlFix : see cal_crlSacFix
+    """
+    newSacDF = _pd.DataFrame()
+    newFixDF = _pd.DataFrame()     
+    crlSac = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'SaclineIndex', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk'))
+    crlFix = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'FixlineIndex', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid'))
+    print "Subj: ", subjID
+    
+    # row numbers of the subject's data are not kept in the trials, so they are not written into the csv files
+    tasks = [(trialID, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0], SacDF[SacDF.trial_id==trialID].reset_index(drop=True), FixDF[FixDF.trial_id==trialID].reset_index(drop=True), 
+              regfileDic, addCharSp, classify_method, diff_ratio, frontrange_ratio, y_range) for trialID in _np.unique(map(int,SacDF.trial_id))]
+    results = _mapTrials(_calTrial, tasks, workers, (regfileDic, addCharSp))   # trials may run in worker processes sharing the prepared region files, results are in trial order
+    for task, (SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, Fixquestion) in zip(tasks, results):
+        trialID = task[0]
+        if recStatus and Sacquestion:
+            _writeLog(direct, 'Subj: ' + subjID + ' Trial ' + str(trialID) + ' crlSac start/end need check!\n')
+        if recStatus and Fixquestion:
+            _writeLog(direct, 'Subj: ' + subjID + ' Trial ' + str(trialID) + ' crlFix start/end need check!\n')
+    newSacDF = _concatDF(newSacDF, [result[0] for result in results]); crlSac = _concatDF(crlSac, [result[1] for result in results])
+    newFixDF = _concatDF(newFixDF, [result[3] for result in results]); crlFix = _concatDF(crlFix, [result[4] for result in results])
+    
+    return newSacDF, crlSac, newFixDF, crlFix
+
+
+_sweepTrials = None     # trials of sweep_crlSacFix shared by pool workers
+
+
+def _initSweep(trials):
+    """
+    initialize a pool worker of sweep_crlSacFix with the trials to sweep
+    """
+    global _sweepTrials
+    _sweepTrials = trials
+
+
+def _sweepSetting(setting):
+    """
+    evaluate a parameter setting of sweep_crlSacFix on all trials
+    argument:
+        setting : (classify_method, diff_ratio, frontrange_ratio, y_range,
+                  addCharSp)
+    return:
+        numcrlSac   : number of crossline saccades
+        numcrlFix   : number of crossline fixations
+        numSacCheck : number of trials whose crossline saccades need check
+        numFixCheck : number of trials whose crossline fixations need check
+    """
+    classify_method, diff_ratio, frontrange_ratio, y_range, addCharSp = setting
+    numcrlSac, numcrlFix, numSacCheck, numFixCheck = 0, 0, 0, 0
+    for regfileDic, trial_type, SacDFtemp, FixDFtemp in _sweepTrials:
+        RegDF = _getRegDF(regfileDic, trial_type, addCharSp)  # get region file with mod_x1 and mod_x2 position of word regions
+        # line numbers are reassigned in each setting, so work on copies
+        crlSactemp, Sacquestion, crlFixtemp, Fixquestion = _crlSacFixTrial(RegDF, SacDFtemp.copy(), FixDFtemp.copy(), classify_method, diff_ratio, frontrange_ratio, y_range)
+        numcrlSac += len(crlSactemp); numcrlFix += len(crlFixtemp)
+        numSacCheck += int(Sacquestion); numFixCheck += int(Fixquestion)
+    return numcrlSac, numcrlFix, numSacCheck, numFixCheck
+
 # user functions obtaining basic information from data files
-def read_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50):
+def read_ASCidx(direct, subjID):
+    """
+    read the sidecar index of a subject's ascii file (built on first use)
+    and get the trial inventory, without parsing the data lines
+    arguments:
+        direct : directory for storing output files
+        subjID : subject ID
+    output:
+        IdxDF : one row per trial, storing header information, trial 
+                timing, sampling information and numbers of fixations,
+                saccades, blinks and samples
+    """
+    # first, check whether ascii file is there:
+    ascfileExist, ascfileDic = _crtASC_dic(0, direct, subjID)
+    
+    # second, load or build the index
+    if ascfileExist:
+        ASCidx = _loadASCidx(ascfileDic[subjID])
+        IdxDF = _pd.DataFrame([[subjID, ASCidx['script'], ASCidx['sessdate'], ASCidx['srcfile'], trial['trialID'], trial['trial_type'], trial['sampfreq'], trial['eyerec'], 
+                                trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend'], trial['fixations'], trial['saccades'], trial['blinks'], trial['samples']] for trial in ASCidx['trials']],
+                              columns=('subj', 'script', 'sessdate', 'srcfile', 'trial_id', 'trial_type', 'sampfreq', 'eyerec', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'fixations', 'saccades', 'blinks', 'samples'))
+        return IdxDF
+
+
+def read_ASCidx_b(direct):
+    """
+    get the trial inventory of all subjects from the sidecar indices of 
+    their ascii files
+    argument:
+        direct : directory containing all asc files
+    output:
+        IdxDF : one row per trial of each subject, see read_ASCidx
+    """
+    ascfileExist, ascfileDic = _crtASC_dic(1, direct, '')
+    if ascfileExist:
+        IdxDF = _pd.concat([read_ASCidx(direct, subjID) for subjID in sorted(ascfileDic)], ignore_index=True)
+        return IdxDF
+
+
+def read_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, trialList=None):
     """
     read SRR ascii file and extract saccades and fixations
     arguments:
@@ -1537,6 +2516,10 @@ def read_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50
                       roughly 1.5 character (12/8s)
         mn          : for lumping fixations, minimum legal fixation
                       duration; default = 50 ms
+        trialList   : trial IDs (int) and/or trial types (str, e.g., 
+                      'story01') to be read; only the indexed byte spans 
+                      of these trials are parsed from the ascii file; 
+                      default = None, read all trials
     output:
         SacDF : saccade data in different trials
         FixDF : fixation data in different trials
@@ -1546,33 +2529,36 @@ def read_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50
     
     # second, process the files
     if ascfileExist:
-        f = open(ascfileDic[subjID], 'r'); print "Read ASC: ", f.name; lines = f.readlines(); f.close()   # read EMF file    
-        script, sessdate, srcfile = _getHeader(lines)    # get header lines    
-        T_idx, T_lines = _getTrialReg(lines) # get trial regions
+        script, sessdate, srcfile, trials = _readASC(ascfileDic[subjID], 0, trialList)   # read EMF file once and get trial event buffers
     
-        SacDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no'))
+        SacDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'dropsacs', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no', 'from_line', 'to_line', 'crossline'))
         FixDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid', 'line_no', 'region_no'))        
     
-        for ind in range(len(T_lines)):
-            triallines = lines[T_lines[ind,0]+1:T_lines[ind,1]]; trialID = int(T_idx[ind,0].split(' ')[-1])
-            blinklines, fixlines, saclines, sampfreq, eyerec = _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, 0)
-            trial_type, trialstart, trialend, tdur, recstart, recend = _gettdur(triallines)
+        SacDFlist, FixDFlist = [], []   # per-trial blocks, concatenated once after the loop
+        for trial in trials:
+            trialID = trial['trialID']
+            blinklines, fixlines, saclines, sampfreq, eyerec = trial['blinklines'], trial['fixlines'], trial['saclines'], trial['sampfreq'], trial['eyerec']
+            trial_type, trialstart, trialend, tdur, recstart, recend = trial['trial_type'], trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend']
             # read saccade data
             print "Read Sac: Trial ", str(trialID), " Type ", trial_type
             SacDFtemp = _recSac(ExpType, trialID, blinklines, saclines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend)
-            SacDF = SacDF.append(SacDFtemp, ignore_index=True)
+            SacDFlist.append(SacDFtemp)
             # read fixation data
             print "Read Fix: Trial ", str(trialID), " Type ", trial_type
             FixDFtemp = _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, rec_lastFix, lump_Fix, ln, zn, mn)        
-            FixDF = FixDF.append(FixDFtemp, ignore_index=True)
+            FixDFlist.append(FixDFtemp)
+        SacDF = _concatDF(SacDF, SacDFlist); FixDF = _concatDF(FixDF, FixDFlist)
                 
         return SacDF, FixDF
 
 
-def write_Sac_Report(direct, subjID, SacDF):
+def write_Sac_Report(direct, subjID, SacDF, legacy=False):
     """
-    write SacDF to csv file
+    write SacDF to csv file; if legacy is True, crossline saccades are 
+    marked as prevline_nextline in line_no as in earlier versions, 
+    without from_line, to_line and crossline
     """
+    if legacy: SacDF = _legacySacLine(SacDF)
     SacDF.to_csv(_os.path.join(direct, subjID, subjID + '_Sac.csv'), index=False)
 
 
@@ -1590,7 +2576,7 @@ def write_TimeStamp_Report(direct, subjID, StampDF):
     StampDF.to_csv(_os.path.join(direct, subjID, subjID + '_Stamp.csv'), index=False)
 
 
-def read_write_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50):
+def read_write_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, legacy=False):
     """
     processing a subject's saccades and fixations, read them from ascii 
     files and write them into csv files
@@ -1613,17 +2599,19 @@ def read_write_SRRasc(direct, subjID, ExpType, rec_lastFix=False, lump_Fix=True,
                       roughly 1.5 character (12/8s)
         mn          : for lumping fixations, minimum legal fixation
                       duration; default = 50 ms
+        legacy      : whether (True) or not (False) write saccades in the
+                      legacy format, see write_Sac_Report; default = False
     output:
         SacDF : saccade data in different trials
         FixDF : fixation data in different trials   
         All these data frames are stored into csv files    
     """
     SacDF, FixDF = read_SRRasc(direct, subjID, ExpType, rec_lastFix, lump_Fix, ln, zn, mn)
-    write_Sac_Report(direct, subjID, SacDF)
+    write_Sac_Report(direct, subjID, SacDF, legacy)
     write_Fix_Report(direct, subjID, FixDF)
 
     
-def read_write_SRRasc_b(direct, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50):
+def read_write_SRRasc_b(direct, ExpType, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, workers=1, legacy=False):
     """
     processing all subjects' saccades and fixations, read them from ascii 
     files and write them into csv files
@@ -1645,47 +2633,57 @@ def read_write_SRRasc_b(direct, ExpType, rec_lastFix=False, lump_Fix=True, ln=50
                       default = 50, roughly 1.5 character (12/8s)
         mn          : for lumping fixations, minimum legal fixation 
                       duration; default = 50 ms
+        workers     : number of worker processes; subjects are processed 
+                      in parallel if workers > 1; default = 1 (on Windows, 
+                      call it under if __name__ == '__main__':)
+        legacy      : whether (True) or not (False) write saccades in the
+                      legacy format, see write_Sac_Report; default = False
     output:
         SacDF : saccade data in different trials
         FixDF : fixation data in different trials
         All these data frames are stored into csv files    
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     ascfileExist, ascfileDic = _crtASC_dic(1, direct, '')
     if ascfileExist:            
-        for subjID in ascfileDic:
-            SacDF, FixDF = read_SRRasc(direct, subjID, ExpType, rec_lastFix, lump_Fix, ln, zn, mn)
-            write_Sac_Report(direct, subjID, SacDF); write_Fix_Report(direct, subjID, FixDF)
+        subjIDs = ascfileDic.keys()
+        return _runBatch(direct, read_write_SRRasc, subjIDs, [(direct, subjID, ExpType, rec_lastFix, lump_Fix, ln, zn, mn, legacy) for subjID in subjIDs], workers)
 
 
 # user function for getting time-stamped data
-def read_TimeStamp(direct, subjID, ExpType):
+def read_TimeStamp(direct, subjID, ExpType, trialList=None):
     """
     read SRR ascii file and extract time stamped eye movements
     arguments:
-        direct  : directory for storing output files
-        subjID  : subject ID
-        ExpType : type of experiments: 'RAN', 'RP'
+        direct    : directory for storing output files
+        subjID    : subject ID
+        ExpType   : type of experiments: 'RAN', 'RP'
+        trialList : trial IDs (int) and/or trial types (str, e.g., 
+                    'story01') to be read; only the indexed byte spans 
+                    of these trials are parsed from the ascii file; 
+                    default = None, read all trials
     output:
-        StampDF : time stamped eye movement data in different trials
+        StampDF   : time stamped eye movement data in different trials
     """    
     # first, check whether ascii file is there:
     ascfileExist, ascfileDic = _crtASC_dic(0, direct, subjID)
     
     # second, process the files
     if ascfileExist:
-        f = open(ascfileDic[subjID], 'r'); print "Read ASC: ", f.name; lines = f.readlines(); f.close()   # read EMF file    
-        script, sessdate, srcfile = _getHeader(lines)    # get header lines    
-        T_idx, T_lines = _getTrialReg(lines) # get trial regions
+        script, sessdate, srcfile, trials = _readASC(ascfileDic[subjID], 1, trialList)   # read EMF file once and get trial event buffers
     
         StampDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'time', 'x_pos1', 'y_pos1', 'pup_size1', 'x_pos2', 'y_pos2', 'pup_size2', 'line_no', 'gaze_region_no', 'label', 'error_free', 'Fix_Sac'))        
-        for ind in range(len(T_lines)):
-            triallines = lines[T_lines[ind,0]+1:T_lines[ind,1]]; trialID = int(T_idx[ind,0].split(' ')[-1])
-            blinklines, stamplines, sampfreq, eyerec = _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, 1)
-            trial_type, trialstart, trialend, tdur, recstart, recend = _gettdur(triallines)
+        StampDFlist = []   # per-trial blocks, concatenated once after the loop
+        for trial in trials:
+            trialID = trial['trialID']
+            blinklines, stamplines, sampfreq, eyerec = trial['blinklines'], trial['stamplines'], trial['sampfreq'], trial['eyerec']
+            trial_type, trialstart, trialend, tdur, recstart, recend = trial['trial_type'], trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend']
             # read time stamped eye-movement data
             print "Read Stamped Eye Movements: Trial ", str(trialID), "; Type ", trial_type
             StampDFtemp = _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend)        
-            StampDF = StampDF.append(StampDFtemp, ignore_index=True)
+            StampDFlist.append(StampDFtemp)
+        StampDF = _concatDF(StampDF, StampDFlist)
                 
         return StampDF
 
@@ -1712,20 +2710,20 @@ def read_Stamp(direct, subjID, ExpType):
     
     # second, process the files
     if ascfileExist and ETRANfileExist:
-        f = open(ascfileDic[subjID], 'r'); print "Read ASC: ", f.name; lines = f.readlines(); f.close()   # read EMF file    
-        script, sessdate, srcfile = _getHeader(lines)    # get header lines    
-        T_idx, T_lines = _getTrialReg(lines) # get trial regions
+        script, sessdate, srcfile, trials = _readASC(ascfileDic[subjID], 1)   # read EMF file once and get trial event buffers
     
         StampDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'time', 'x_pos1', 'y_pos1', 'pup_size1', 'x_pos2', 'y_pos2', 'pup_size2', 'line_no', 'gaze_region_no', 'label', 'error_free', 'Fix_Sac'))        
-        for ind in range(len(T_lines)):
-            triallines = lines[T_lines[ind,0]+1:T_lines[ind,1]]; trialID = int(T_idx[ind,0].split(' ')[-1])
-            blinklines, stamplines, sampfreq, eyerec = _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, 1)
-            trial_type, trialstart, trialend, tdur, recstart, recend = _gettdur(triallines)
+        StampDFlist = []   # per-trial blocks, concatenated once after the loop
+        for trial in trials:
+            trialID = trial['trialID']
+            blinklines, stamplines, sampfreq, eyerec = trial['blinklines'], trial['stamplines'], trial['sampfreq'], trial['eyerec']
+            trial_type, trialstart, trialend, tdur, recstart, recend = trial['trial_type'], trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend']
             error_free = _getErrorFree(ETRANDF, subjID, trial_type)
             # read time stamped eye-movement data
             print "Read Stamped Eye Movements: Trial ", str(trialID), "; Type ", trial_type
             StampDFtemp = _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, error_free)        
-            StampDF = StampDF.append(StampDFtemp, ignore_index=True)
+            StampDFlist.append(StampDFtemp)
+        StampDF = _concatDF(StampDF, StampDFlist)
                 
         return StampDF
 
@@ -1747,25 +2745,29 @@ def read_write_TimeStamp(direct, subjID, ExpType):
     write_TimeStamp_Report(direct, subjID, StampDF)
 
 
-def read_write_TimeStamp_b(direct, ExpType):
+def read_write_TimeStamp_b(direct, ExpType, workers=1):
     """
     processing all subjects' time stamped data, read them from ascii files
     and write them into csv files
     arguments:
         direct  : directory containing all asc files
         ExpType : type of experiments: 'RAN', 'RP'
+        workers : number of worker processes; subjects are processed in 
+                  parallel if workers > 1; default = 1 (on Windows, call 
+                  it under if __name__ == '__main__':)
     output:
         StampDF : time stamped data in different trials
         The data frames are stored into csv files    
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     ascfileExist, ascfileDic = _crtASC_dic(1, direct, '')    
     if ascfileExist:
-        for subjID in ascfileDic.keys():
-            StampDF = read_TimeStamp(direct, subjID, ExpType)
-            write_TimeStamp_Report(direct, subjID, StampDF)
+        subjIDs = ascfileDic.keys()
+        return _runBatch(direct, read_write_TimeStamp, subjIDs, [(direct, subjID, ExpType) for subjID in subjIDs], workers)
 
 
-def cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1):
+def cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, workers=1):
     """
     read csv data file of subj and extract crossline saccades and
     fixations and update line numbers of original saccades and 
@@ -1801,6 +2803,11 @@ def cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIF
         addCharSp          : number of single character space added to 
                              EMF for catching overshoot fixations; 
                              default = 1
+        workers            : number of worker processes; trials are 
+                             processed in parallel if workers > 1 and 
+                             reassembled in trial order; default = 1 (on 
+                             Windows, call it under if __name__ == 
+                             '__main__':)
     output:
         newSacDF : saccade data in different trials with updated line
                    numbers
@@ -1816,51 +2823,12 @@ def cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIF
     
     # second, process the files
     if SacfileExist and FixfileExist and regfileExist:
-        SacDF = _pd.read_csv(SacfileDic[subjID], sep=',')
-        FixDF = _pd.read_csv(FixfileDic[subjID], sep=',')    
-        newSacDF = _pd.DataFrame()
-        newFixDF = _pd.DataFrame()     
-        crlSac = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'SaclineIndex', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk'))
-        crlFix = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'FixlineIndex', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid'))
-        print "Subj: ", subjID
-    
-        for trialID in _np.unique(map(int,SacDF.trial_id)):
-            RegDF = _getRegDF(regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0])  # get region file
-            _modRegDF(RegDF, addCharSp) # modify mod_x1 and mod_x2 position of word regions
-            # get saccade data and crossline saccade data
-            print "Get crlSac: Trial ", str(trialID), " Type ", _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0]
-            SacDFtemp = SacDF[SacDF.trial_id==trialID].reset_index(); crlSactemp, question = _getcrlSac(RegDF, SacDFtemp, diff_ratio, frontrange_ratio, y_range)
-            newSacDF = newSacDF.append(SacDFtemp, ignore_index=True); crlSac = crlSac.append(crlSactemp, ignore_index=True)
-            if recStatus and question:
-                logfile = open(_os.path.join(direct, 'log.txt'), 'a+')
-                logfile.write('Subj: ' + subjID + ' Trial ' + str(trialID) + ' crlSac start/end need check!\n')
-                logfile.close()        
-            
-            # get fixation data and crossline fixation data
-            print "Get Fix: Trial ", str(trialID), " Type ", _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0]
-            FixDFtemp = FixDF[FixDF.trial_id==trialID].reset_index(); crlFixtemp, question = _getcrlFix(RegDF, crlSactemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range)
-            
-            # assign region_no in FixDFtemp
-            for curFix in range(len(FixDFtemp)):
-                if not _np.isnan(FixDFtemp.loc[curFix, 'line_no']):
-                    indlist = RegDF[(RegDF['line_no'] == FixDFtemp.loc[curFix,'line_no']) & ((RegDF['mod_x1'] <= FixDFtemp.loc[curFix,'x_pos']) & (RegDF['mod_x2'] >= FixDFtemp.loc[curFix,'x_pos']))].index.tolist()
-                    if len(indlist) == 1:
-                        FixDFtemp.loc[curFix,'region_no'] = int(RegDF.WordID[indlist[0]])
-                    else:
-                        FixDFtemp.loc[curFix,'region_no'] = _np.nan
-                else:
-                    FixDFtemp.loc[curFix,'region_no'] = _np.nan
-            
-            newFixDF = newFixDF.append(FixDFtemp, ignore_index=True); crlFix = crlFix.append(crlFixtemp, ignore_index=True)
-            if recStatus and question:
-                logfile = open(_os.path.join(direct, 'log.txt'), 'a+')
-                logfile.write('Subj: ' + subjID + ' Trial ' + str(trialID) + ' crlFix start/end need check!\n')  
-                logfile.close()
-            
-        return newSacDF, crlSac, newFixDF, crlFix
+        SacDF = _pd.read_csv(SacfileDic[subjID], sep=',', float_precision='round_trip')    # exact floats, as kept in memory by run.Subject
+        FixDF = _pd.read_csv(FixfileDic[subjID], sep=',', float_precision='round_trip')    
+        return _crlSacFix(direct, subjID, SacDF, FixDF, regfileDic, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, workers)
     
 
-def write_Sac_crlSac(direct, subjID, SacDF, crlSac):
+def write_Sac_crlSac(direct, subjID, SacDF, crlSac, legacy=False):
     """
     write modified saccades and crossline saccades to csv files
     arguments:
@@ -1869,7 +2837,12 @@ def write_Sac_crlSac(direct, subjID, SacDF, crlSac):
         SacDF  : saccade data in different trials with updated line
                  numbers
         crlSac : crossline saccade data in different trials
+        legacy : whether (True) or not (False) write SacDF in the legacy
+                 format: crossline saccades are marked as 
+                 prevline_nextline (e.g., '3_4') in line_no, without 
+                 from_line, to_line and crossline; default = False
     """            
+    if legacy: SacDF = _legacySacLine(SacDF)
     SacDF.to_csv(_os.path.join(direct, subjID, subjID + '_Sac.csv'), index=False)
     crlSac.to_csv(_os.path.join(direct, subjID, subjID + '_crlSac.csv'), index=False)
 
@@ -1888,7 +2861,7 @@ def write_Fix_crlFix(direct, subjID, FixDF, crlFix):
     crlFix.to_csv(_os.path.join(direct, subjID, subjID + '_crlFix.csv'), index=False)
 
 
-def cal_write_SacFix_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1):
+def cal_write_SacFix_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, workers=1, legacy=False):
     """
     processing a subject's saccades and fixations, read them from csv
     files and store them into csv files
@@ -1921,6 +2894,14 @@ def cal_write_SacFix_crlSacFix(direct, subjID, regfileNameList, ExpType, classif
                            between two lines); default = 60
         addCharSp        : number of single character space added to EMF
                            for catching overshoot fixations; default = 1
+        workers          : number of worker processes; trials are 
+                           processed in parallel if workers > 1 and 
+                           reassembled in trial order; default = 1 (on 
+                           Windows, call it under if __name__ == 
+                           '__main__':)
+        legacy           : whether (True) or not (False) write saccades in
+                           the legacy format, see write_Sac_crlSac; 
+                           default = False
     output:
         SacDF  : saccade data in different trials with updated line 
                  numbers of different subjects
@@ -1932,11 +2913,11 @@ def cal_write_SacFix_crlSacFix(direct, subjID, regfileNameList, ExpType, classif
                  subjects
         All these data frames are stored in csv files
     """
-    SacDF, crlSac, FixDF, crlFix = cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp)
-    write_Sac_crlSac(direct, subjID, SacDF, crlSac); write_Fix_crlFix(direct, subjID, FixDF, crlFix)
+    SacDF, crlSac, FixDF, crlFix = cal_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, workers)
+    write_Sac_crlSac(direct, subjID, SacDF, crlSac, legacy); write_Fix_crlFix(direct, subjID, FixDF, crlFix)
 
 
-def cal_write_SacFix_crlSacFix_b(direct, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1):
+def cal_write_SacFix_crlSacFix_b(direct, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, workers=1, legacy=False):
     """
     processing all subjects' saccades and fixations, read them from csv 
     files and store them into csv files
@@ -1968,6 +2949,13 @@ def cal_write_SacFix_crlSacFix_b(direct, regfileNameList, ExpType, classify_meth
                            between two lines); default = 60
         addCharSp        : number of single character space added to EMF 
                            for catching overshoot fixations; default = 1
+        workers          : number of worker processes; subjects are 
+                           processed in parallel if workers > 1; default = 
+                           1 (on Windows, call it under if __name__ == 
+                           '__main__':)
+        legacy           : whether (True) or not (False) write saccades in
+                           the legacy format, see write_Sac_crlSac; 
+                           default = False
     output:
         SacDF  : saccade data in different trials with updated line 
                  numbers of different subjects
@@ -1977,16 +2965,93 @@ def cal_write_SacFix_crlSacFix_b(direct, regfileNameList, ExpType, classify_meth
                  numbers of different subjects
         crlFix : crossline fixation data in different trials of different
                  subjects
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     SacfileExist, SacfileDic = _crtCSV_dic(1, direct, '', '_Sac')
     FixfileExist, FixfileDic = _crtCSV_dic(1, direct, '', '_Fix')
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
     if SacfileExist and FixfileExist and regfileExist:
-        for subjID in SacfileDic.keys():
-            cal_write_SacFix_crlSacFix(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp)
+        subjIDs = SacfileDic.keys()
+        return _runBatch(direct, cal_write_SacFix_crlSacFix, subjIDs, [(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, 1, legacy) for subjID in subjIDs], workers, (regfileDic, addCharSp))
+
+
+def sweep_crlSacFix(direct, regfileNameList, ExpType, paramGrid, subjIDs=None, workers=1):
+    """
+    evaluate a grid of parameter settings of cal_crlSacFix on all (or 
+    some) subjects, for tuning the classification of saccades and 
+    fixations into text lines; saccade, fixation and region files are read
+    only once and nothing is written
+    arguments:
+        direct          : directory containing all csv files
+        regfileNameList : a list of region file names (trial_id will help
+                          select corresponding region files)
+        ExpType         : type of experiments: 'RAN', 'RP'
+        paramGrid       : dictionary with key = parameter name 
+                          ('classify_method', 'diff_ratio', 
+                          'frontrange_ratio', 'y_range', 'addCharSp'), 
+                          value = list of values of that parameter (see 
+                          cal_crlSacFix); all combinations are evaluated,
+                          missing parameters use their defaults
+        subjIDs         : list of subject IDs to use; default = None (all
+                          subjects having saccade and fixation files)
+        workers         : number of worker processes; settings are 
+                          evaluated in parallel if workers > 1; default = 
+                          1 (on Windows, call it under if __name__ == 
+                          '__main__':)
+    output:
+        SweepDF : one row per setting, with the parameters and crlSac 
+                  (number of crossline saccades), crlFix (number of 
+                  crossline fixations), Sac_check and Fix_check (number of
+                  trials whose crossline saccades or fixations need check)
+    """
+    params = ['classify_method', 'diff_ratio', 'frontrange_ratio', 'y_range', 'addCharSp']
+    defaults = {'classify_method': 'DIFF', 'diff_ratio': 0.6, 'frontrange_ratio': 0.2, 'y_range': 60, 'addCharSp': 1}
+    for param in paramGrid.keys():
+        if param not in params: raise ValueError('Unknown parameter ' + str(param) + '!')
+    # all combinations of parameter values, in the order of params
+    settings = [()]
+    for param in params:
+        settings = [setting + (value,) for setting in settings for value in paramGrid.get(param, [defaults[param]])]
+    
+    SacfileExist, SacfileDic = _crtCSV_dic(1, direct, '', '_Sac')
+    FixfileExist, FixfileDic = _crtCSV_dic(1, direct, '', '_Fix')
+    regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
+    if SacfileExist and FixfileExist and regfileExist:
+        if subjIDs is None: subjIDs = sorted(SacfileDic.keys())
+        # read saccades and fixations once and split them into trials
+        trials = []
+        for subjID in subjIDs:
+            if subjID not in SacfileDic or subjID not in FixfileDic:
+                print 'Warning! Subj: ' + subjID + ' has no saccade or fixation file!'; continue
+            print "Read Sac and Fix: Subj: ", subjID
+            SacDF = _pd.read_csv(SacfileDic[subjID], sep=',', float_precision='round_trip')
+            FixDF = _pd.read_csv(FixfileDic[subjID], sep=',', float_precision='round_trip')
+            for trialID in _np.unique(map(int,SacDF.trial_id)):
+                trials.append((regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0], SacDF[SacDF.trial_id==trialID].reset_index(drop=True), FixDF[FixDF.trial_id==trialID].reset_index(drop=True)))
+        # prepare region files once for each addCharSp; forked workers share them
+        for addCharSp in sorted(set(setting[4] for setting in settings)):
+            for regfileName in regfileDic.keys(): _loadRegion(regfileDic[regfileName], addCharSp)
+        
+        print "Sweep: ", len(settings), " settings on ", len(trials), " trials"
+        if workers > 1 and len(settings) > 1:
+            pool = _mp.Pool(processes=min(workers, len(settings)), initializer=_initSweep, initargs=(trials,))
+            try:
+                results = pool.map(_sweepSetting, settings, chunksize=1)
+            finally:
+                pool.close(); pool.join()
+        else:
+            _initSweep(trials)
+            try:
+                results = map(_sweepSetting, settings)
+            finally:
+                _initSweep(None)
+        
+        SweepDF = _pd.DataFrame([setting + result for setting, result in zip(settings, results)], columns=params + ['crlSac', 'crlFix', 'Sac_check', 'Fix_check'])
+        return SweepDF
     
     
-def read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50):
+def read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, trialList=None, workers=1):
     """
     read ASC file and extract the fixation and saccade data and calculate
     crossline saccades and fixations
@@ -2036,6 +3101,16 @@ def read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='D
                              default = 50, roughly 1.5 character (12/8s)
         mn                 : for lumping fixations, minimum legal fixation
                              duration; default = 50 ms
+        trialList          : trial IDs (int) and/or trial types (str, 
+                             e.g., 'story01') to be read; only the 
+                             indexed byte spans of these trials are 
+                             parsed from the ascii file; default = None,
+                             read all trials
+        workers            : number of worker processes; trials are 
+                             processed in parallel if workers > 1 and 
+                             reassembled in trial order; default = 1 (on 
+                             Windows, call it under if __name__ == 
+                             '__main__':)
     output:
         SacDF    : saccade data in different trials
         crlSacDF : crossline saccade data in different trials
@@ -2049,57 +3124,28 @@ def read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='D
     # second, process the files
     if ascfileExist and regfileExist:
         # read EMF file
-        f = open(ascfileDic[subjID], 'r'); print "Read ASC: ", f.name; lines = f.readlines(); f.close()   # read EMF file    
-        script, sessdate, srcfile = _getHeader(lines)    # get header lines    
-        T_idx, T_lines = _getTrialReg(lines) # get trial regions
+        script, sessdate, srcfile, trials = _readASC(ascfileDic[subjID], 0, trialList)   # read EMF file once and get trial event buffers
     
-        SacDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no'))
+        SacDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'dropsacs', 'eye', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk', 'line_no', 'from_line', 'to_line', 'crossline'))
         FixDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid', 'line_no', 'region_no'))        
         crlSac = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'SaclineIndex', 'start_time', 'end_time', 'duration', 'x1_pos', 'y1_pos', 'x2_pos', 'y2_pos', 'ampl', 'pk'))
         crlFix = _pd.DataFrame(columns=('subj', 'trial_id', 'eye', 'startline', 'endline', 'FixlineIndex', 'start_time', 'end_time', 'duration', 'x_pos', 'y_pos', 'pup_size', 'valid'))
     
-        for ind in range(len(T_lines)):
-            triallines = lines[T_lines[ind,0]+1:T_lines[ind,1]]; trialID = int(T_idx[ind,0].split(' ')[-1])
-            blinklines, fixlines, saclines, sampfreq, eyerec = _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, 0)
-            trial_type, trialstart, trialend, tdur, recstart, recend = _gettdur(triallines)
-            RegDF = _getRegDF(regfileDic, trial_type)  # get region file
-            _modRegDF(RegDF, addCharSp) # modify mod_x1 and mod_x2 position of word regions
-            # read saccade data and get crossline saccade
-            print "Read Sac and Get crlSac: Trial ", str(trialID), " Type ", trial_type
-            SacDFtemp = _recSac(ExpType, trialID, blinklines, saclines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend)
-            crlSactemp, question = _getcrlSac(RegDF, SacDFtemp, diff_ratio, frontrange_ratio, y_range)
-            SacDF = SacDF.append(SacDFtemp, ignore_index=True); crlSac = crlSac.append(crlSactemp, ignore_index=True)
-            if recStatus and question:
-                logfile = open(_os.path.join(direct, 'log.txt'), 'a+')
-                logfile.write('Subj: ' + SacDFtemp.subj[0] + ' Trial ' + str(trialID) + ' crlSac start/end need check!\n')
-                logfile.close()
-
-            # read fixation data and get crossline fixation
-            print "Read Fix and Get crlFix: Trial ", str(trialID), " Type ", trial_type
-            FixDFtemp = _recFix(ExpType, trialID, blinklines, fixlines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, rec_lastFix, lump_Fix, ln, zn, mn)        
-            crlFixtemp, question = _getcrlFix(RegDF, crlSactemp, FixDFtemp, classify_method, diff_ratio, frontrange_ratio, y_range)
-            
-            # assign region_no in FixDFtemp
-            for curFix in range(len(FixDFtemp)):
-                if not _np.isnan(FixDFtemp.loc[curFix, 'line_no']):
-                    indlist = RegDF[(RegDF['line_no'] == FixDFtemp.loc[curFix,'line_no']) & ((RegDF['mod_x1'] <= FixDFtemp.loc[curFix,'x_pos']) & (RegDF['mod_x2'] >= FixDFtemp.loc[curFix,'x_pos']))].index.tolist()
-                    if len(indlist) == 1:
-                        FixDFtemp.loc[curFix,'region_no'] = int(RegDF.WordID[indlist[0]])
-                    else:
-                        FixDFtemp.loc[curFix,'region_no'] = _np.nan
-                else:
-                    FixDFtemp.loc[curFix,'region_no'] = _np.nan
-            
-            FixDF = FixDF.append(FixDFtemp, ignore_index=True); crlFix = crlFix.append(crlFixtemp, ignore_index=True)
-            if recStatus and question:
-                logfile = open(_os.path.join(direct, 'log.txt'), 'a+')
-                logfile.write('Subj: ' + FixDFtemp.subj[0] + ' Trial ' + str(trialID) + ' crlFix start/end need check!\n')
-                logfile.close()
+        tasks = [(trial, ExpType, script, sessdate, srcfile, regfileDic, addCharSp, classify_method, diff_ratio, frontrange_ratio, y_range, rec_lastFix, lump_Fix, ln, zn, mn) for trial in trials]
+        results = _mapTrials(_readCalTrial, tasks, workers, (regfileDic, addCharSp))   # trials may run in worker processes sharing the prepared region files, results are in trial order
+        for trial, (SacDFtemp, crlSactemp, Sacquestion, FixDFtemp, crlFixtemp, Fixquestion) in zip(trials, results):
+            trialID = trial['trialID']
+            if recStatus and Sacquestion:
+                _writeLog(direct, 'Subj: ' + SacDFtemp.subj[0] + ' Trial ' + str(trialID) + ' crlSac start/end need check!\n')
+            if recStatus and Fixquestion:
+                _writeLog(direct, 'Subj: ' + FixDFtemp.subj[0] + ' Trial ' + str(trialID) + ' crlFix start/end need check!\n')
+        SacDF = _concatDF(SacDF, [result[0] for result in results]); crlSac = _concatDF(crlSac, [result[1] for result in results])
+        FixDF = _concatDF(FixDF, [result[3] for result in results]); crlFix = _concatDF(crlFix, [result[4] for result in results])
     
         return SacDF, crlSac, FixDF, crlFix
         
 
-def read_cal_write_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50):
+def read_cal_write_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, workers=1, legacy=False):
     """
     processing a subject's fixation and saccade data
     arguments:
@@ -2146,6 +3192,14 @@ def read_cal_write_SRRasc(direct, subjID, regfileNameList, ExpType, classify_met
                            default = 50, roughly 1.5 character (12/8s)
         mn               : for lumping fixations, minimum legal fixation
                            duration; default = 50 ms
+        workers          : number of worker processes; trials are 
+                           processed in parallel if workers > 1 and 
+                           reassembled in trial order; default = 1 (on 
+                           Windows, call it under if __name__ == 
+                           '__main__':)
+        legacy           : whether (True) or not (False) write saccades in
+                           the legacy format, see write_Sac_crlSac; 
+                           default = False
     output:
         SacDF    : saccade data in different trials of different subjects
         crlSacDF : crossline saccade data in different trials of different
@@ -2155,12 +3209,12 @@ def read_cal_write_SRRasc(direct, subjID, regfileNameList, ExpType, classify_met
                    subjects
         All these data frames are stored into csv files    
     """
-    SacDF, crlSac, FixDF, crlFix = read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, rec_lastFix, lump_Fix, ln, zn, mn)
-    write_Sac_crlSac(direct, subjID, SacDF, crlSac)
+    SacDF, crlSac, FixDF, crlFix = read_cal_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, rec_lastFix, lump_Fix, ln, zn, mn, workers=workers)
+    write_Sac_crlSac(direct, subjID, SacDF, crlSac, legacy)
     write_Fix_crlFix(direct, subjID, FixDF, crlFix)
 
   
-def read_cal_write_SRRasc_b(direct, regfileNameList, ExpType, classify_method='DIFF', rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1):
+def read_cal_write_SRRasc_b(direct, regfileNameList, ExpType, classify_method='DIFF', rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, addCharSp=1, workers=1, legacy=False):
     """
     processing all subjects' fixation and saccade data
     arguments:
@@ -2205,6 +3259,13 @@ def read_cal_write_SRRasc_b(direct, regfileNameList, ExpType, classify_method='D
                            between two lines); default = 60
         addCharSp        : number of single character space added to RegDF
                            for catching overshoot fixations; default = 1
+        workers          : number of worker processes; subjects are 
+                           processed in parallel if workers > 1; default = 
+                           1 (on Windows, call it under if __name__ == 
+                           '__main__':)
+        legacy           : whether (True) or not (False) write saccades in
+                           the legacy format, see write_Sac_crlSac; 
+                           default = False
     output:
         SacDF    : saccade data in different trials of different subjects
         crlSacDF : crossline saccade data in different trials of different
@@ -2213,12 +3274,14 @@ def read_cal_write_SRRasc_b(direct, regfileNameList, ExpType, classify_method='D
         crlFixDF : crossline fixation data in different trials of different
                    subjects
         All these data frames are stored into csv files    
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     ascfileExist, ascfileDic = _crtASC_dic(1, direct, '')
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
     if ascfileExist and regfileExist:
-        for subjID in ascfileDic.keys():
-            read_cal_write_SRRasc(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, rec_lastFix, lump_Fix, ln, zn, mn)
+        subjIDs = ascfileDic.keys()
+        return _runBatch(direct, read_cal_write_SRRasc, subjIDs, [(direct, subjID, regfileNameList, ExpType, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, addCharSp, rec_lastFix, lump_Fix, ln, zn, mn, 1, legacy) for subjID in subjIDs], workers, (regfileDic, addCharSp))
 
 
 def cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCharSp=1):
@@ -2253,7 +3316,7 @@ def cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCha
 
     # second, process the files
     if StampfileExist and regfileExist and ((align_method == 'FixRep' and FixRepExist) or (align_method == 'Fix_Sac' and SacfileExist and FixfileExist)):
-        StampDF = _pd.read_csv(StampfileDic[subjID], sep=',')    
+        StampDF = _readStampCSV(StampfileDic[subjID])   # memory-mapped from the binary cache if it is valid
         newStampDF = _pd.DataFrame()     
         print "Subj: ", subjID
         
@@ -2265,17 +3328,18 @@ def cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCha
             SacDF = _pd.read_csv(SacfileDic[subjID], sep=',')
             FixDF = _pd.read_csv(FixfileDic[subjID], sep=',')     
 
+        StampDFlist = []   # per-trial blocks, concatenated once after the loop
         for trialID in _np.unique(map(int,StampDF.trial_id)):
             trial_type = _np.unique(StampDF.trial_type[StampDF.trial_id == trialID])[0]
             trialstart = _np.unique(StampDF.trialstart[StampDF.trial_id == trialID])[0]
-            RegDF = _getRegDF(regfileDic, trial_type)  # get region file
-            _modRegDF(RegDF, addCharSp) # modify mod_x1 and mod_x2 position of word regions
+            RegDF = _getRegDF(regfileDic, trial_type, addCharSp)  # get region file with mod_x1 and mod_x2 position of word regions
             # get time stamped data and crossline time stamped data
             print "Get crlStamp: Trial ", str(trialID), " Type ", _np.unique(StampDF.trial_type[StampDF.trial_id == trialID])[0]  
             StampDFtemp = StampDF[StampDF.trial_id==trialID].reset_index()
             _calTimeStamp(align_method, trial_type, trialstart, RegDF, StampDFtemp, FixRepDF, SacDF, FixDF)
 
-            newStampDF = newStampDF.append(StampDFtemp, ignore_index=True)
+            StampDFlist.append(StampDFtemp)
+        newStampDF = _concatDF(newStampDF, StampDFlist)
                         
         return newStampDF
 
@@ -2303,7 +3367,7 @@ def cal_write_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method,
     write_TimeStamp_Report(direct, subjID, StampDF)
 
 
-def cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, addCharSp=1):
+def cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, addCharSp=1, workers=1):
     """
     processing all subjects' time stamped data, read them from csv files
     and store them into csv files
@@ -2316,18 +3380,23 @@ def cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, addCha
                           'Fix_Sac': based on SacDF, FixDF
         addCharSp       : number of single character space added to EMF
                           for catching overshoot fixations; default = 1
+        workers         : number of worker processes; subjects are 
+                          processed in parallel if workers > 1; default = 
+                          1 (on Windows, call it under if __name__ == 
+                          '__main__':)
     output:
         StampDF    : time stamped data in different trials with updated
                      line numbers of different subjects
         crlStampDF : crossline time stamped data in different trials of
                      different subjects
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     StampfileExist, StampfileDic = _crtCSV_dic(1, direct, '', '_Stamp')
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
     if StampfileExist and regfileExist:
-        for subjID in StampfileDic.keys():
-            StampDF = cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCharSp)
-            write_TimeStamp_Report(direct, subjID, StampDF)
+        subjIDs = StampfileDic.keys()
+        return _runBatch(direct, cal_write_TimeStamp, subjIDs, [(direct, subjID, regfileNameList, ExpType, align_method, addCharSp) for subjID in subjIDs], workers, (regfileDic, addCharSp))
 
 
 def read_cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCharSp=1):
@@ -2369,9 +3438,7 @@ def read_cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, a
     # second, process the files
     if ascfileExist and regfileExist and ETRANfileExist and ((align_method == 'FixRep' and FixRepExist) or (align_method == 'Fix_Sac' and SacfileExist and FixfileExist)):
         # read EMF file
-        f = open(ascfileDic[subjID], 'r'); print "Read ASC: ", f.name; lines = f.readlines(); f.close()   # read EMF file    
-        script, sessdate, srcfile = _getHeader(lines)    # get header lines    
-        T_idx, T_lines = _getTrialReg(lines) # get trial regions
+        script, sessdate, srcfile, trials = _readASC(ascfileDic[subjID], 1)   # read EMF file once and get trial event buffers
     
         StampDF = _pd.DataFrame(columns=('subj', 'trial_id', 'trial_type', 'sampfreq', 'script', 'sessdate', 'srcfile', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'time', 'x_pos1', 'y_pos1', 'pup_size1', 'x_pos2', 'y_pos2', 'pup_size2', 'line_no', 'gaze_region_no', 'label', 'error_free', 'Fix_Sac'))
         
@@ -2383,20 +3450,21 @@ def read_cal_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, a
             SacDF = _pd.read_csv(SacfileDic[subjID], sep=',')
             FixDF = _pd.read_csv(FixfileDic[subjID], sep=',')          
             
-        for ind in range(len(T_lines)):
-            triallines = lines[T_lines[ind,0]+1:T_lines[ind,1]]; trialID = int(T_idx[ind,0].split(' ')[-1])
-            blinklines, stamplines, sampfreq, eyerec = _getBlink_Fix_Sac_SampFreq_EyeRec(triallines, 1)
-            trial_type, trialstart, trialend, tdur, recstart, recend = _gettdur(triallines)
+        StampDFlist = []   # per-trial blocks, concatenated once after the loop
+        for trial in trials:
+            trialID = trial['trialID']
+            blinklines, stamplines, sampfreq, eyerec = trial['blinklines'], trial['stamplines'], trial['sampfreq'], trial['eyerec']
+            trial_type, trialstart, trialend, tdur, recstart, recend = trial['trial_type'], trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend']
             error_free = 1
      #      error_free = _getErrorFree(ETRANDF, subjID, trial_type)            
-            RegDF = _getRegDF(regfileDic, trial_type)  # get region file
-            _modRegDF(RegDF, addCharSp) # modify mod_x1 and mod_x2 position of word regions
+            RegDF = _getRegDF(regfileDic, trial_type, addCharSp)  # get region file with mod_x1 and mod_x2 position of word regions
             # read saccade data and get crossline saccade
             print "Read Time Stamped Data: Trial ", str(trialID), " Type ", trial_type
             StampDFtemp = _recTimeStamp(ExpType, trialID, blinklines, stamplines, sampfreq, eyerec, script, sessdate, srcfile, trial_type, trialstart, trialend, tdur, recstart, recend, error_free)        
             _calTimeStamp(align_method, trial_type, trialstart, RegDF, StampDFtemp, FixRepDF, SacDF, FixDF)
             
-            StampDF = StampDF.append(StampDFtemp, ignore_index=True)
+            StampDFlist.append(StampDFtemp)
+        StampDF = _concatDF(StampDF, StampDFlist)
 
         return StampDF
 
@@ -2424,7 +3492,7 @@ def read_cal_write_TimeStamp(direct, subjID, regfileNameList, ExpType, align_met
     write_TimeStamp_Report(direct, subjID, StampDF)
 
 
-def read_cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, addCharSp=1):
+def read_cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, addCharSp=1, workers=1):
     """
     processing all subjects' time stamped data
     arguments:
@@ -2437,16 +3505,22 @@ def read_cal_write_TimeStamp_b(direct, regfileNameList, ExpType, align_method, a
                           aligned automatically
         addCharSp       : number of single character space added to RegDF
                           for catching overshoot fixations; default = 1
+        workers         : number of worker processes; subjects are 
+                          processed in parallel if workers > 1; default = 
+                          1 (on Windows, call it under if __name__ == 
+                          '__main__':)
     output:
         StampDF    : time stamped data in different trials of different
                      subjects
         crlStampDF : crossline time stamped data in different trials of
                      different subjects
         All these data frames are stored into csv files    
+        Subjects that failed are returned as a dictionary (key = subject ID,
+        value = traceback) and recorded in log.txt
     """
     ascfileExist, ascfileDic = _crtASC_dic(1, direct, '')  
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
     if ascfileExist and regfileExist:
-        for subjID in ascfileDic.keys():
-            read_cal_write_TimeStamp(direct, subjID, regfileNameList, ExpType, align_method, addCharSp)
+        subjIDs = ascfileDic.keys()
+        return _runBatch(direct, read_cal_write_TimeStamp, subjIDs, [(direct, subjID, regfileNameList, ExpType, align_method, addCharSp) for subjID in subjIDs], workers, (regfileDic, addCharSp))
 
@@ -34,6 +34,7 @@ import time as _time
 import winsound as _ws
 import pandas as _pd
 import numpy as _np
+from pyemread import ext as _ext
 from PIL import Image, ImageDraw, ImageFont
 import matplotlib.font_manager as _font_manager
 import codecs as _codecs
@@ -158,11 +159,7 @@ def _getRegDF(regfileDic, trial_type):
     return:
         RegDF : region file data frame
     """
-    regfileName = trial_type + '.region.csv'
-    if not (regfileName in regfileDic.keys()):
-        raise ValueError("invalid trial_type!")
-    RegDF = _pd.read_csv(regfileDic[regfileName], sep=',')
-    return RegDF
+    return _ext._getRegDF(regfileDic, trial_type)     # read through the region cache shared with ext
 
 
 def _crtCSV_dic(sit, direct, subjID, csvfiletype):
@@ -1071,6 +1068,52 @@ def _image_SacFix(direct, subjID, bitmapNameList, Sac, crlSac, Fix, crlFix, RegD
         img2.save(_os.path.join(direct, subjID, subjID + '_crlFix_trial' + str(trialID) + '.png'), 'PNG') 
 
 
+def _chkBitmap(direct, bitmapNameList):
+    """
+    gather all png bitmaps in direct into an empty bitmapNameList, or 
+    check whether the bitmaps in bitmapNameList exist
+    arguments:
+        direct         : directory storing the bitmaps
+        bitmapNameList : a list of png bitmaps (changed if empty)
+    return:
+        bitmapExist : whether (True) or not (False) all bitmaps exist
+    """
+    bitmapExist = True
+    if len(bitmapNameList) == 0:
+        # automatically gather all bitmaps in direct
+        for file in _os.listdir(direct):
+            if _fnmatch.fnmatch(file, '*.png'):
+                bitmapNameList.append(str(file))
+    else:
+        # check whether particular bitmap exists!
+        for bitmapfile in bitmapNameList:
+            bitmapfileName = _os.path.join(direct, bitmapfile)
+            if not _os.path.isfile(bitmapfileName):
+                print bitmapfile + ' does not exist!'; bitmapExist = False
+    return bitmapExist
+
+
+def _drawSacFix(direct, subjID, regfileDic, bitmapNameList, SacDF, crlSacDF, FixDF, crlFixDF, drawType, max_FixRadius, drawFinal, showFixDur, PNGopt):
+    """
+    draw saccade and fixation data frames of a subject, trial by trial
+    arguments:
+        direct     : directory storing drawn figures
+        subjID     : subject ID
+        regfileDic : a dictionary of region file names and directories
+        SacDF      : saccade data of the subject
+        crlSacDF   : crossline saccade data of the subject
+        FixDF      : fixation data of the subject
+        crlFixDF   : crossline fixation data of the subject
+        other arguments : see draw_SacFix
+    """
+    for trialID in range(len(regfileDic)):
+        RegDF = _getRegDF(regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0])  # get region file
+        print "Draw Sac and Fix: Subj: " + subjID + ", Trial: " + str(_np.unique(SacDF.trial_type[SacDF.trial_id == trialID]))
+        Sac = SacDF[SacDF.trial_id == trialID].reset_index(); crlSac = crlSacDF[crlSacDF.trial_id == trialID].reset_index()
+        Fix = FixDF[FixDF.trial_id == trialID].reset_index(); crlFix = crlFixDF[crlFixDF.trial_id == trialID].reset_index()    
+        _image_SacFix(direct, subjID, bitmapNameList, Sac, crlSac, Fix, crlFix, RegDF, trialID, drawType, max_FixRadius, drawFinal, showFixDur, PNGopt)
+
+
 # user functions for drawing saccades and fixations    
 def draw_SacFix(direct, subjID, regfileNameList, bitmapNameList, drawType, max_FixRadius=30, drawFinal=False, showFixDur=False, PNGopt=0):    
     """
@@ -1124,19 +1167,7 @@ def draw_SacFix(direct, subjID, regfileNameList, bitmapNameList, drawType, max_F
     
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
                 
-    if PNGopt == 0:
-        bitmapExist = True
-        if len(bitmapNameList) == 0:
-            # automatically gather all region files in direct
-            for file in _os.listdir(direct):
-                if _fnmatch.fnmatch(file, '*.png'):
-                    bitmapNameList.append(str(file))
-        else:
-            # check whether particular region file exists!
-            for bitmapfile in bitmapNameList:
-                bitmapfileName = _os.path.join(direct, bitmapfile)
-                if not _os.path.isfile(bitmapfileName):
-                    print bitmapfile + ' does not exist!'; bitmapExist = False 
+    if PNGopt == 0: bitmapExist = _chkBitmap(direct, bitmapNameList)
                        
     # second, process the files
     if SacfileExist and FixfileExist and crlSacfileExist and crlFixfileExist and regfileExist and ((PNGopt == 0 and bitmapExist) or PNGopt == 1):
@@ -1145,12 +1176,7 @@ def draw_SacFix(direct, subjID, regfileNameList, bitmapNameList, drawType, max_F
         FixDF = _pd.read_csv(FixfileDic[subjID], sep=','); crlFixDF = _pd.read_csv(crlFixfileDic[subjID], sep=',')
     
         # draw fixation and saccade data on a picture
-        for trialID in range(len(regfileDic)):
-            RegDF = _getRegDF(regfileDic, _np.unique(SacDF.trial_type[SacDF.trial_id == trialID])[0])  # get region file
-            print "Draw Sac and Fix: Subj: " + subjID + ", Trial: " + str(_np.unique(SacDF.trial_type[SacDF.trial_id == trialID]))
-            Sac = SacDF[SacDF.trial_id == trialID].reset_index(); crlSac = crlSacDF[crlSacDF.trial_id == trialID].reset_index()
-            Fix = FixDF[FixDF.trial_id == trialID].reset_index(); crlFix = crlFixDF[crlFixDF.trial_id == trialID].reset_index()    
-            _image_SacFix(direct, subjID, bitmapNameList, Sac, crlSac, Fix, crlFix, RegDF, trialID, drawType, max_FixRadius, drawFinal, showFixDur, PNGopt)
+        _drawSacFix(direct, subjID, regfileDic, bitmapNameList, SacDF, crlSacDF, FixDF, crlFixDF, drawType, max_FixRadius, drawFinal, showFixDur, PNGopt)
 
 
 def draw_SacFix_b(direct, regfileNameList, bitmapNameList, method, max_FixRadius=30, drawFinal=False, showNum=False, PNGmethod=0):
@@ -1202,19 +1228,7 @@ def draw_SacFix_b(direct, regfileNameList, bitmapNameList, method, max_FixRadius
 
     regfileExist, regfileDic = _crtRegion_dic(direct, regfileNameList)
 
-    if PNGmethod == 0:
-        bitmapExist = True
-        if len(bitmapNameList) == 0:
-            # automatically gather all region files in direct
-            for file in _os.listdir(direct):
-                if _fnmatch.fnmatch(file, '*.png'):
-                    bitmapNameList.append(str(file))
-        else:
-            # check whether particular region file exists!
-            for bitmapfile in bitmapNameList:
-                bitmapfileName = _os.path.join(direct, bitmapfile)
-                if not _os.path.isfile(bitmapfileName):
-                    print bitmapfile + ' does not exist!'; bitmapExist = False    
+    if PNGmethod == 0: bitmapExist = _chkBitmap(direct, bitmapNameList)
     
     if regfileExist and ((PNGmethod == 0 and bitmapExist) or PNGmethod == 1):
         for subjID in subjlist:
@@ -1610,7 +1624,8 @@ def animate_TimeStamp(direct, subjID, trialID):
     if not soundExist or not trialExist: print 'Sound data of ' + subjID + ' is missing!'
     
     if csvExist and bitmapExist and soundExist and trialExist:
-        csvStamp = _os.path.join(direct, subjID, csvfile_subj); StampDF = _pd.read_csv(csvStamp, sep=',')
+        csvStamp = _os.path.join(direct, subjID, csvfile_subj)
+        StampDF = _ext._readStampCSV(csvStamp, columns=['trial_id', 'eye', 'recstart', 'sampfreq', 'time', 'x_pos1', 'y_pos1', 'x_pos2', 'y_pos2'], trialList=[trialID])   # only the trial's rows and needed columns
         Stamp = StampDF[StampDF.trial_id == trialID].reset_index()
         if len(bitmapNameList) == 1: bitmapFile = _os.path.join(direct, bitmapNameList[0])
         else: bitmapFile = _os.path.join(direct, bitmapNameList[trialID])
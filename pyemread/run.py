@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Feb 22 09:21:44 2017
+
+__author__ = "Tao Gong and David Braze"
+__copyright__ = "Copyright 2017, The Pyemread Project"
+__credits__ = ["Tao Gong", "David Braze", "Jonathan Gordils", "Hosung Nam"]
+__license__ = "MIT"
+__version__ = "0.1.0"
+__maintainer__ = ["Tao Gong", "David Braze"]
+__email__ = ["gtojty@gmail.com", "davebraze@gmail.com"]
+__status__ = "Production"
+
+This is a class designed for running a subject's data through all steps
+of ext, cal and gen in memory: saccades and fixations are extracted from
+the ascii file once, and the data frames of each step are passed to the
+next one instead of being written to and read back from csv files. csv
+files are written only if required.
+
+For usage,
+In python code, use: from pyemread import run
+Then, one can use run.Subject to process a subject's data, e.g.,
+    subj = run.Subject(direct, subjID, [], 'RAN')
+    subj.read().classify(write=True).cal_EM(write=True)
+    subj.draw([], 'ALL')
+Or, one can use: import pyemread as pr,
+and then use pr.run to call the class in run.
+"""
+
+# import helper functions from _helperfunc_.py
+import sys as _sys
+from pyemread import ext as _ext
+from pyemread import cal as _cal
+from pyemread import gen as _gen
+
+
+# make the system default codeing as "utf-8"
+reload(_sys); _sys.setdefaultencoding("utf-8")
+
+
+# -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# class for processing a subject's data in memory
+class Subject(object):
+    """
+    a subject's saccades, fixations, crossline saccades and fixations, and
+    eye-movement measures; each step works on the data frames of the
+    previous step and returns the subject, so steps can be chained
+    """
+    def __init__(self, direct, subjID, regfileNameList, ExpType, addCharSp=1):
+        """
+        arguments:
+            direct          : directory containing the subject's folder
+                              (with the ascii file) and region files;
+                              output files are stored in the subject's
+                              folder
+            subjID          : subject ID
+            regfileNameList : a list of region file names (trial_id will
+                              help select corresponding region files)
+            ExpType         : type of experiments: 'RAN', 'RP'
+            addCharSp       : number of single character space added to
+                              EMF for catching overshoot fixations;
+                              default = 1
+        """
+        self.direct = direct; self.subjID = subjID; self.ExpType = ExpType; self.addCharSp = addCharSp
+        self.regfileExist, self.regfileDic = _ext._crtRegion_dic(direct, regfileNameList)
+        self.SacDF = None; self.FixDF = None     # saccade and fixation data
+        self.crlSac = None; self.crlFix = None   # crossline saccade and fixation data
+        self.EMList = None  # eye-movement measures: list of (trialID, eye, EMDF)
+
+    def _chkStep(self, data, step):
+        """
+        check whether the data of the previous step are there
+        """
+        if data is None:
+            raise ValueError('Subj: ' + self.subjID + ' has no data for ' + step + '!')
+        if not self.regfileExist:
+            raise ValueError('No region file for ' + step + '!')
+
+    def read(self, rec_lastFix=False, lump_Fix=True, ln=50, zn=50, mn=50, trialList=None, write=False, legacy=False):
+        """
+        read the subject's ascii file and extract saccades and fixations;
+        results of later steps are cleared
+        arguments:
+            write  : whether (True) or not (False) write _Sac.csv and
+                     _Fix.csv; default = False
+            legacy : whether (True) or not (False) write saccades in the
+                     legacy format, see ext.write_Sac_Report; default = 
+                     False
+            other arguments : see ext.read_SRRasc
+        """
+        result = _ext.read_SRRasc(self.direct, self.subjID, self.ExpType, rec_lastFix, lump_Fix, ln, zn, mn, trialList)
+        if result is None:
+            raise ValueError('Subj: ' + self.subjID + ' has no ascii file!')
+        self.SacDF, self.FixDF = result
+        self.crlSac = None; self.crlFix = None; self.EMList = None
+        if write:
+            _ext.write_Sac_Report(self.direct, self.subjID, self.SacDF, legacy); _ext.write_Fix_Report(self.direct, self.subjID, self.FixDF)
+        return self
+
+    def classify(self, classify_method='DIFF', recStatus=True, diff_ratio=0.6, frontrange_ratio=0.2, y_range=60, workers=1, write=False, legacy=False):
+        """
+        extract crossline saccades and fixations and update line numbers
+        of saccades and fixations; results of later steps are cleared
+        arguments:
+            write  : whether (True) or not (False) write _Sac.csv,
+                     _crlSac.csv, _Fix.csv and _crlFix.csv; default = False
+            legacy : whether (True) or not (False) write saccades in the
+                     legacy format, see ext.write_Sac_crlSac; default = 
+                     False
+            other arguments : see ext.cal_crlSacFix
+        """
+        self._chkStep(self.SacDF, 'classify')
+        self.SacDF, self.crlSac, self.FixDF, self.crlFix = _ext._crlSacFix(self.direct, self.subjID, self.SacDF, self.FixDF, self.regfileDic, classify_method, recStatus, diff_ratio, frontrange_ratio, y_range, self.addCharSp, workers)
+        self.EMList = None
+        if write:
+            _ext.write_Sac_crlSac(self.direct, self.subjID, self.SacDF, self.crlSac, legacy); _ext.write_Fix_crlFix(self.direct, self.subjID, self.FixDF, self.crlFix)
+        return self
+
+    def cal_EM(self, write=False, EMformat='trial'):
+        """
+        calculate eye-movement measures of each trial
+        arguments:
+            write    : whether (True) or not (False) write the measures;
+                       default = False
+            EMformat : format of the written measures, see cal.write_EM;
+                       default = 'trial'
+        """
+        self._chkStep(self.crlSac, 'cal_EM')
+        self.EMList = _cal._calSubjEM(self.subjID, self.SacDF, self.FixDF, self.regfileDic, self.addCharSp)
+        if write: _cal.write_EM(self.direct, self.subjID, self.EMList, EMformat)
+        return self
+
+    def draw(self, bitmapNameList, drawType, max_FixRadius=30, drawFinal=False, showFixDur=False, PNGopt=0):
+        """
+        draw saccades and fixations, and crossline saccades and fixations
+        of each trial
+        arguments: see gen.draw_SacFix
+        """
+        self._chkStep(self.crlSac, 'draw')
+        if PNGopt == 0 and not _gen._chkBitmap(self.direct, bitmapNameList): return self
+        _gen._drawSacFix(self.direct, self.subjID, self.regfileDic, bitmapNameList, self.SacDF, self.crlSac, self.FixDF, self.crlFix, drawType, max_FixRadius, drawFinal, showFixDur, PNGopt)
+        return self
+
+    def write(self, EMformat='trial', legacy=False):
+        """
+        write the data of all finished steps to csv files (eye-movement 
+        measures in EMformat, see cal.write_EM; default = 'trial'; 
+        saccades in the legacy format if legacy is True, see 
+        ext.write_Sac_crlSac; default = False)
+        """
+        if self.crlSac is not None:
+            _ext.write_Sac_crlSac(self.direct, self.subjID, self.SacDF, self.crlSac, legacy); _ext.write_Fix_crlFix(self.direct, self.subjID, self.FixDF, self.crlFix)
+        elif self.SacDF is not None:
+            _ext.write_Sac_Report(self.direct, self.subjID, self.SacDF, legacy); _ext.write_Fix_Report(self.direct, self.subjID, self.FixDF)
+        if self.EMList is not None:
+            _cal.write_EM(self.direct, self.subjID, self.EMList, EMformat)
+        return self
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+golden-output comparison of the eye-movement measures of cal:
+_calSubjEM must reproduce the bundled *_EM_trial*_{L,R}.csv files of the
+example subjects, and keep its behaviour at the edges of the fixation
+sweep
+
+run with: python -m unittest discover tests
+"""
+
+import os as _os
+import shutil as _shutil
+import tempfile as _tempfile
+import unittest as _unittest
+from StringIO import StringIO as _StringIO
+import numpy as _np
+import pandas as _pd
+from pyemread import cal as _cal
+
+
+_exampleDir = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)), '..', 'examples', 'oralReading')
+
+# made-up text: two lines, 5 word regions of 4, 6, 4, 6 and 6 characters;
+# with addCharSp = 1, mod_x1 of regions 1 and 4 is 90, mod_x2 of regions 3
+# and 5 is 250 and 230; chrOffset = [0, 4, 10, 14, 20, 26]
+_regions = [(1, 1, 100, 140, 4), (2, 1, 140, 200, 6), (3, 1, 200, 240, 4), (4, 2, 100, 160, 6), (5, 2, 160, 220, 6)]
+
+
+def _roundTrip(EMDF):
+    """
+    get EMDF as written to and read back from a csv file
+    """
+    buf = _StringIO(); EMDF.to_csv(buf, index=False); buf.seek(0)
+    return _pd.read_csv(buf)
+
+
+class CalEMTest(_unittest.TestCase):
+    """
+    _calSubjEM gives the bundled measures on the example subjects and the
+    expected measures on made-up trials
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = _tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        _shutil.rmtree(cls.tmpdir, True)
+
+    def calEM(self, fixations, regions=_regions):
+        """
+        get the measures of a made-up trial of the left eye
+        arguments:
+            fixations : list of (line_no, region_no, x_pos, duration) of
+                        valid fixations
+            regions   : list of (WordID, line_no, x1_pos, x2_pos, length)
+                        of word regions
+        return:
+            EMDF : eye-movement measures of the trial
+        """
+        regfile = _os.path.join(self.tmpdir, 'test.region.csv')
+        _pd.DataFrame([('test', 'English', wordID, 'w' * length, length, line_no, x1_pos, x2_pos) for wordID, line_no, x1_pos, x2_pos, length in regions],
+                      columns=['Name', 'Language', 'WordID', 'Word', 'length', 'line_no', 'x1_pos', 'x2_pos']).to_csv(regfile, index=False)
+        FixDF = _pd.DataFrame([(0, 'test', 0, 10000, 10000, 0, 10000, 0, 'L', line_no, x_pos, region_no, duration, 'yes') for line_no, region_no, x_pos, duration in fixations],
+                              columns=['trial_id', 'trial_type', 'trialstart', 'trialend', 'tdur', 'recstart', 'recend', 'blinks', 'eye', 'line_no', 'x_pos', 'region_no', 'duration', 'valid'])
+        SacDF = _pd.DataFrame([(0, 'test', 'L', 1.0, 110.0, 160.0, 1.0, 1.0, False)],
+                              columns=['trial_id', 'trial_type', 'eye', 'line_no', 'x1_pos', 'x2_pos', 'from_line', 'to_line', 'crossline'])
+        [(trialID, eye, EMDF)] = _cal._calSubjEM('test', SacDF, FixDF, {'test.region.csv': regfile}, 1)
+        return EMDF
+
+    def test_example_subjects(self):
+        regfileExist, regfileDic = _cal._crtRegion_dic(_exampleDir, [])
+        for subjID in ['1950138', '1950168']:
+            SacDF = _pd.read_csv(_os.path.join(_exampleDir, subjID, subjID + '_Sac.csv'))
+            FixDF = _pd.read_csv(_os.path.join(_exampleDir, subjID, subjID + '_Fix.csv'))
+            EMList = _cal._calSubjEM(subjID, SacDF, FixDF, regfileDic, 1)
+            self.assertEqual(len(EMList), 6)
+            for trialID, eye, EMDF in EMList:
+                EMDFold = _pd.read_csv(_os.path.join(_exampleDir, subjID, subjID + '_EM_trial' + str(trialID) + '_' + eye + '.csv'))
+                _pd.testing.assert_frame_equal(_roundTrip(EMDF), EMDFold)
+
+    def test_last_fixation(self):
+        # the first pass of region 3 is the last fixation of the trial: a forward first pass
+        EMDF = self.calEM([(1, 1, 110, 200), (1, 2, 160, 210), (1, 3, 220, 220)])
+        row = EMDF.loc[2]
+        self.assertEqual((row.fpurt, row.fpcount, row.ffos), (220, 1, 1))
+        self.assertEqual((row.fpregres, row.fpregreg, row.fpregchr), (0, 0, 26))
+        self.assertEqual((row.rpurt, row.rpcount, row.rpregreg, row.rpregchr), (220, 0, 0, 26))
+        self.assertTrue(_np.isnan(row.spilover))
+        self.assertEqual(EMDF.loc[1].spilover, 220)
+        self.assertTrue(_np.isnan(EMDF.loc[3].fpurt) and _np.isnan(EMDF.loc[4].fpurt))
+
+    def test_regression_to_first_region(self):
+        # regression from region 3 back to region 1 (row 0 of EMDF), then on to region 3 again
+        EMDF = self.calEM([(1, 1, 110, 200), (1, 2, 160, 210), (1, 3, 210, 220), (1, 1, 125, 230), (1, 3, 230, 240)])
+        row = EMDF.loc[2]
+        self.assertEqual((row.fpurt, row.spilover), (220, 230))
+        self.assertEqual((row.fpregres, row.fpregreg, row.fpregchr), (1, 1, 2))
+        self.assertEqual((row.rpurt, row.rpcount, row.rpregreg, row.rpregchr), (690, 2, 1, 2))
+        self.assertEqual((row.spurt, row.spcount), (240, 1))
+        self.assertEqual((EMDF.loc[0].spurt, EMDF.loc[0].spcount), (230, 1))
+
+    def test_offset_conventions(self):
+        # regression from region 3 back to region 2 (row 1): fpregchr and tffixos count the characters
+        # of the regions before the previous one, rpregchr those of the regions before the region
+        EMDF = self.calEM([(1, 1, 110, 200), (1, 2, 155, 210), (1, 3, 210, 220), (1, 2, 170, 230), (1, 3, 230, 240)])
+        self.assertEqual(list(EMDF.ffos[:3]), [1, 1, 0])
+        row = EMDF.loc[2]
+        self.assertEqual((row.fpregres, row.fpregreg, row.fpregchr), (1, 2, 2))     # chrOffset[0] + 2
+        self.assertEqual((row.rpregreg, row.rpregchr), (2, 6))     # chrOffset[1] + 2
+        self.assertEqual(row.tffixos, 6)     # chrOffset[0] + 1 + chrOffset[0] + 1 + chrOffset[1] + 0
+
+    def test_duplicate_regions(self):
+        # region 2 occurs twice on line 1: (line_no, region) of its fixations maps to row 0
+        regions = [(1, 1, 100, 140, 4), (2, 1, 140, 200, 6), (2, 1, 200, 240, 4), (3, 2, 100, 160, 6), (4, 2, 160, 220, 6)]
+        EMDF = self.calEM([(1, 1, 110, 200), (2, 3, 120, 210), (1, 2, 155, 220), (2, 3, 130, 230)], regions)
+        row = EMDF.loc[3]
+        self.assertEqual((row.fpurt, row.spilover), (210, 220))
+        # the first-pass regression looks the region up by region number alone: its first row
+        self.assertEqual((row.fpregres, row.fpregreg, row.fpregchr), (1, 2, 1))
+        # the regression path looks it up by (line_no, region): row 0, the first region
+        self.assertEqual((row.rpurt, row.rpcount, row.rpregreg, row.rpregchr), (660, 2, 1, 5))
+
+
+if __name__ == '__main__':
+    _unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+golden-output comparison of the two fixation lumping engines of ext: 
+_recFix with lump_method='ARRAY' (_lumpFixArr) must give the same fixation
+data as with lump_method='DF' (_lumpFix)
+
+run with: python -m unittest discover tests
+"""
+
+import os as _os
+import random as _random
+import unittest as _unittest
+import pandas as _pd
+from pyemread import ext as _ext
+
+
+_exampleDir = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)), '..', 'examples', 'oralReading')
+
+
+def _fixlines(rows, eye='L'):
+    """
+    make EFIX lines of a trial, as tokenized by ext._readASC
+    arguments:
+        rows : list of (start_time, duration, x_pos) of fixations
+        eye  : eye of the fixations
+    """
+    return [['EFIX', eye, str(start), str(start + dur), str(dur), str(x), '100.0', '800'] for start, dur, x in rows]
+
+
+def _recFix(fixlines, eyerec, rec_lastFix, ln, zn, mn, lump_method):
+    """
+    get fixation data of a made-up trial sampled at 250 Hz (addtime = 4 ms)
+    """
+    return _ext._recFix('RAN', 0, [], fixlines, 250, eyerec, 'script', 'sessdate', 'subj.edf', 'story01', 0, 10000, 10000, 0, 10000, rec_lastFix, True, ln, zn, mn, lump_method)
+
+
+class LumpFixTest(_unittest.TestCase):
+    """
+    _recFix gives identical frames with lump_method 'ARRAY' and 'DF'
+    """
+    def chkSame(self, fixlines, eyerec='L', rec_lastFix=False, ln=50, zn=50, mn=50):
+        FixArr = _recFix(fixlines, eyerec, rec_lastFix, ln, zn, mn, 'ARRAY')
+        FixDF = _recFix(fixlines, eyerec, rec_lastFix, ln, zn, mn, 'DF')
+        _pd.testing.assert_frame_equal(FixArr, FixDF)
+        return FixArr
+
+    def test_example_trials(self):
+        for subjID in ['1950138', '1950168']:
+            script, sessdate, srcfile, trials = _ext._readASC(_os.path.join(_exampleDir, subjID, subjID + '.asc'), 0)
+            for trial in trials:
+                for rec_lastFix, ln, zn, mn in [(False, 50, 50, 50), (True, 50, 50, 50), (False, 100, 80, 80), (True, 150, 30, 100)]:
+                    FixArr = _ext._recFix('RAN', trial['trialID'], trial['blinklines'], trial['fixlines'], trial['sampfreq'], trial['eyerec'], script, sessdate, srcfile, trial['trial_type'], 
+                                          trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend'], rec_lastFix, True, ln, zn, mn, 'ARRAY')
+                    FixDF = _ext._recFix('RAN', trial['trialID'], trial['blinklines'], trial['fixlines'], trial['sampfreq'], trial['eyerec'], script, sessdate, srcfile, trial['trial_type'], 
+                                         trial['trialstart'], trial['trialend'], trial['tdur'], trial['recstart'], trial['recend'], rec_lastFix, True, ln, zn, mn, 'DF')
+                    _pd.testing.assert_frame_equal(FixArr, FixDF)
+
+    def test_thresholds(self):
+        # duration == ln and distance == zn: lumped into the previous fixation
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 50, 150), (258, 200, 300), (462, 200, 500)]))
+        self.assertEqual(len(FixArr), 3)
+        # duration == mn is valid, duration < mn is not (ln < mn, so no lumping)
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 50, 300), (258, 49, 500), (311, 200, 700)]), ln=40, mn=50)
+        self.assertEqual(list(FixArr.valid), ['yes', 'yes', 'no', 'no'])
+
+    def test_equal_distances(self):
+        # previous and next fixation are equally near: the previous one is lumped first
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 20, 150), (228, 200, 200), (432, 200, 400)]), zn=60)
+        self.assertEqual(len(FixArr), 3)
+
+    def test_dropped_neighbours(self):
+        # the previous fixation is dropped (short and far from others), the next one is lumped
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 20, 400), (228, 20, 100), (252, 200, 120), (456, 200, 300)]))
+        self.assertEqual(len(FixArr), 3)
+        # a run of short fixations lumped together, then into the previous fixation
+        self.chkSame(_fixlines([(0, 200, 100), (204, 10, 120), (218, 10, 140), (232, 10, 300), (246, 200, 500), (450, 200, 700)]))
+
+    def test_first_last_fixation(self):
+        # the first fixation is short: only the next one is checked
+        FixArr = self.chkSame(_fixlines([(0, 20, 100), (24, 200, 120), (228, 200, 300)]))
+        self.assertEqual(len(FixArr), 2)
+        self.chkSame(_fixlines([(0, 10, 100), (14, 10, 110), (28, 200, 120), (232, 200, 300)]))
+        # the last fixation is short: only the previous one is checked if it is recorded
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 200, 300), (408, 20, 320)]), rec_lastFix=True)
+        self.assertEqual(len(FixArr), 2)
+        FixArr = self.chkSame(_fixlines([(0, 200, 100), (204, 200, 300), (408, 20, 320)]), rec_lastFix=False)
+        self.assertEqual(len(FixArr), 3)
+
+    def test_both_eyes(self):
+        rows = [(0, 200, 100), (204, 20, 130), (228, 200, 300), (432, 30, 310)]
+        self.chkSame(_fixlines(rows, 'L') + _fixlines(rows, 'R'), eyerec='LR')
+        self.chkSame(_fixlines(rows, 'L') + _fixlines(rows, 'R'), eyerec='LR', rec_lastFix=True)
+
+    def test_random_trials(self):
+        rand = _random.Random(9)
+        for it in range(300):
+            start, rows = 0, []
+            for ind in range(rand.randint(1, 12)):
+                dur = rand.choice([8, 10, 20, 40, 50, 60, 200]); rows.append((start, dur, rand.choice([100, 120, 140, 150, 160, 200, 300])))
+                start += dur + 4
+            self.chkSame(_fixlines(rows), rec_lastFix=rand.choice([True, False]), ln=rand.choice([40, 50, 100]), zn=rand.choice([20, 50]), mn=rand.choice([40, 50]))
+
+
+if __name__ == '__main__':
+    _unittest.main()